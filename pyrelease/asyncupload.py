@@ -0,0 +1,132 @@
+# coding=utf-8
+from __future__ import print_function, absolute_import
+import os
+import asyncio
+import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from pyrelease.upload import (Uploader, UploadResult, file_digests, index_url,
+                              uploaded_files)
+
+logger = logging.getLogger('pyrelease')
+logger.setLevel(logging.DEBUG)
+
+# How many files are uploaded to one repository at the same time.
+UPLOAD_CONCURRENCY = 4
+
+
+class UploadScheduler(object):
+    """Uploads files to several repositories at the same time.
+
+     repositories maps a name to a dict with the `url`, `username` and
+     `password` of the repository, as from `repository_config`. Each one
+     gets a pool of up to `concurrency` `Uploader` connections, which
+     bounds how many of its uploads run at once, and each connection is
+     kept alive from one file to the next. The uploads are scheduled
+     with asyncio, the blocking requests run in a thread pool.
+
+     Files the index already has, with the same sha256, are skipped, as
+     are files an `UploadJournal` says were uploaded before. Failed
+     requests are retried `retries` times with a growing random delay
+     of about `backoff` seconds and up.
+     """
+
+    def __init__(self, repositories, concurrency=UPLOAD_CONCURRENCY, timeout=60,
+                 retries=3, backoff=0.5, journal=None):
+        self.repositories = OrderedDict(repositories)
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.journal = journal
+        # Every `Uploader` used by the last run.
+        self.uploaders = []
+
+    def run(self, paths, metadata):
+        """Uploads each file in paths to every repository. Returns an
+         OrderedDict mapping the repository names to their list of
+         `UploadResult`, in the order of paths."""
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(self.upload(paths, metadata))
+        finally:
+            loop.close()
+
+    async def upload(self, paths, metadata):
+        """The coroutine `run` runs."""
+        loop = asyncio.get_event_loop()
+        paths = list(paths)
+        fields = dict(metadata)
+        logger.info("Uploading %d files to %s", len(paths),
+                    ", ".join(self.repositories))
+        self.uploaders = []
+        repositories = OrderedDict()
+        for name, config in self.repositories.items():
+            pool = asyncio.Queue()
+            for _ in range(min(self.concurrency, len(paths))):
+                uploader = Uploader(config['url'], config.get('username'),
+                                    config.get('password'), self.timeout,
+                                    self.retries, self.backoff)
+                self.uploaders.append(uploader)
+                pool.put_nowait(uploader)
+            repositories[name] = dict(
+                url=config['url'], index=index_url(config['url']), pool=pool,
+                project=(fields['name'], fields['version']))
+
+        workers = len(self.uploaders) + len(repositories) + 1
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            try:
+                digests = await asyncio.gather(*[
+                    loop.run_in_executor(executor, file_digests, path)
+                    for path in paths])
+                digests = dict(zip(paths, digests))
+                results = await asyncio.gather(*[
+                    self._repository(loop, executor, repository, paths, digests, metadata)
+                    for repository in repositories.values()])
+            finally:
+                for uploader in self.uploaders:
+                    uploader.close()
+        return OrderedDict(zip(repositories, results))
+
+    async def _repository(self, loop, executor, repository, paths, digests, metadata):
+        journal = self.journal
+        repository['existing'] = {}
+        if journal is None or not all(journal.is_uploaded(
+                repository['url'], path, digests[path][1]) for path in paths):
+            existing = await loop.run_in_executor(
+                executor, uploaded_files, repository['index'],
+                repository['project'][0], repository['project'][1], self.timeout)
+            repository['existing'] = existing or {}
+        return await asyncio.gather(*[
+            self._upload(loop, executor, repository, path, digests[path], metadata)
+            for path in paths])
+
+    async def _upload(self, loop, executor, repository, path, digests, metadata):
+        url = repository['url']
+        sha256 = digests[1]
+        filename = os.path.basename(path)
+        if self.journal is not None and self.journal.is_uploaded(url, path, sha256):
+            logger.info("Skipping %s, the journal says it's on %s", filename, url)
+            return UploadResult(path, None, 'Already uploaded', skipped=True)
+        if repository['existing'].get(filename) == sha256:
+            logger.info("Skipping %s, it's already on %s", filename, url)
+            result = UploadResult(path, None, 'Already on the index', skipped=True)
+        else:
+            uploader = await repository['pool'].get()
+            try:
+                result = await loop.run_in_executor(
+                    executor, uploader.upload_file, path, metadata, digests)
+            finally:
+                repository['pool'].put_nowait(uploader)
+            if result.status in (400, 409):
+                # When the response to an upload was lost, the retry is
+                # refused as a duplicate. Check it's really the same file.
+                existing = await loop.run_in_executor(
+                    executor, uploaded_files, repository['index'],
+                    repository['project'][0], repository['project'][1], self.timeout)
+                if existing and existing.get(filename) == sha256:
+                    result = UploadResult(path, result.status, result.reason, skipped=True)
+        if result.ok and self.journal is not None:
+            self.journal.record(url, path, sha256)
+        return result
@@ -0,0 +1,100 @@
+# coding=utf-8
+from __future__ import print_function, absolute_import
+import os
+import time
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+from pyrelease.helpers import find_package
+
+logger = logging.getLogger('pyrelease')
+logger.setLevel(logging.DEBUG)
+
+# Directories that never hold releasable packages.
+SKIP_DIRS = {'__pycache__', 'build', 'dist', 'node_modules', 'venv', 'env'}
+
+
+def _skip_dir(dirpath, name):
+    if name.startswith('.') or name in SKIP_DIRS or name.endswith('.egg-info'):
+        return True
+    # Virtualenvs can have any name.
+    return os.path.exists(os.path.join(dirpath, name, 'pyvenv.cfg'))
+
+
+def discover_targets(root):
+    """Walks root and returns the absolute path of the target file of
+     every releasable package under it, found with the same rules as
+     `find_package`. Packages found through an `__init__.py` are not
+     searched for more packages.
+     """
+    targets = []
+    seen = set()
+    for dirpath, dirnames, _ in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if not _skip_dir(dirpath, d))
+        target = find_package(dirpath)
+        if target is None:
+            continue
+        target = os.path.abspath(target)
+        if target not in seen:
+            seen.add(target)
+            targets.append(target)
+            logger.info("Found target - %s -", target)
+        if os.path.basename(target) == '__init__.py':
+            package_dir = os.path.dirname(target)
+            if package_dir == os.path.abspath(dirpath):
+                dirnames[:] = []
+            else:
+                dirnames[:] = [d for d in dirnames
+                               if os.path.join(os.path.abspath(dirpath), d) != package_dir]
+    return targets
+
+
+def analyse_target(target, use_import=False, use_cache=True):
+    """Builds the `PyPackage` info for a single target. Returns a dict
+     of the package info, or of the error if it couldn't be read.
+
+     This runs in the worker processes so it only returns plain data.
+     """
+    from pyrelease.pyrelease import PyPackage
+    from pyrelease.cache import MetadataCache
+
+    start = time.time()
+    try:
+        cache = MetadataCache() if use_cache else None
+        package = PyPackage(target, use_import=use_import, cache=cache)
+        rv = package.jsonize()
+        rv['is_script'] = package.is_script
+        rv['error'] = None
+    except Exception as e:
+        logger.error("Error analysing %s", target, exc_info=True)
+        rv = dict(error="%s: %s" % (type(e).__name__, e))
+    rv['target'] = target
+    rv['elapsed'] = time.time() - start
+    return rv
+
+
+def analyse_targets(targets, workers=None, use_import=False, use_cache=True):
+    """Analyses every target on a process pool of `workers` processes
+     (one per core by default). Results are returned in target order.
+     """
+    if workers == 1 or len(targets) < 2:
+        return [analyse_target(t, use_import, use_cache) for t in targets]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(analyse_target, t, use_import, use_cache)
+                   for t in targets]
+        return [f.result() for f in futures]
+
+
+def batch_report(root, workers=None, use_import=False, use_cache=True):
+    """Discovers and analyses every package under root and returns a
+     combined report."""
+    start = time.time()
+    targets = discover_targets(root)
+    logger.info("Analysing %d targets.", len(targets))
+    packages = analyse_targets(targets, workers, use_import, use_cache)
+    return dict(
+        root=os.path.abspath(root),
+        packages=packages,
+        errors=len([p for p in packages if p['error']]),
+        elapsed=time.time() - start,
+    )
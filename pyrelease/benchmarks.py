@@ -0,0 +1,320 @@
+# coding=utf-8
+from __future__ import print_function, absolute_import
+import os
+import sys
+import time
+import shutil
+import platform
+import tempfile
+import statistics
+import logging
+from collections import OrderedDict
+
+from pyrelease.source import clear_sources
+
+logger = logging.getLogger('pyrelease')
+logger.setLevel(logging.DEBUG)
+
+# Bump this when results stop being comparable with older ones.
+FORMAT_VERSION = 1
+
+BENCHMARKS = OrderedDict()
+
+
+def benchmark(name):
+    """Registers a benchmark under name. A benchmark is a function that
+     takes a target file and a scratch folder, does any setup, and
+     returns the function to time."""
+    def decorator(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return decorator
+
+
+@benchmark('package')
+def bench_package(target, work_dir):
+    """Creating a `PyPackage` and working out all of its info."""
+    from pyrelease.pyrelease import PyPackage
+
+    def run():
+        PyPackage(target).jsonize()
+    return run
+
+
+@benchmark('get_dependencies')
+def bench_get_dependencies(target, work_dir):
+    from pyrelease.helpers import get_dependencies
+    from pyrelease.depindex import load_index
+
+    # The installed distributions are indexed once per process.
+    load_index()
+    return lambda: get_dependencies(target)
+
+
+@benchmark('has_main_func')
+def bench_has_main_func(target, work_dir):
+    from pyrelease.helpers import has_main_func
+    return lambda: has_main_func(target)
+
+
+@benchmark('migrate')
+def bench_migrate(target, work_dir):
+    """Rewriting the author and version of a copy of the target. The
+     copy is refreshed as part of each run."""
+    from pyrelease.helpers import migrate_author, migrate_version
+
+    copy = os.path.join(work_dir, os.path.basename(target))
+
+    def run():
+        shutil.copyfile(target, copy)
+        migrate_author(copy, "Benchmark Author")
+        migrate_version(copy, "9.9.9")
+    return run
+
+
+def _builder(target, build_dir):
+    from pyrelease.pyrelease import PyPackage
+    from pyrelease.builder import Builder
+
+    package = PyPackage(target)
+    # Read everything up front so only the build is timed.
+    package.jsonize()
+    return Builder(package, build_dir=build_dir)
+
+
+@benchmark('make_all')
+def bench_make_all(target, work_dir):
+    """Building the release folder, into a new folder each run."""
+    runs = [0]
+
+    def run():
+        runs[0] += 1
+        _builder(target, os.path.join(work_dir, 'release-%d' % runs[0])).make_all()
+    return run
+
+
+@benchmark('build_distros')
+def bench_build_distros(target, work_dir):
+    """Writing the sdist and wheel of a built release."""
+    builder = _builder(target, os.path.join(work_dir, 'release'))
+    builder.make_all()
+
+    def run():
+        builder.build_distros(suppress=True)
+        if builder.errors:
+            raise RuntimeError("; ".join(builder.errors))
+    return run
+
+
+def summarize(times):
+    """Returns the median, quartiles, IQR, min and max of a list of
+     times."""
+    times = sorted(times)
+    if len(times) > 1:
+        q1, median, q3 = statistics.quantiles(times, n=4, method='inclusive')
+    else:
+        q1 = median = q3 = times[0]
+    return OrderedDict([
+        ('median', median), ('q1', q1), ('q3', q3), ('iqr', q3 - q1),
+        ('min', times[0]), ('max', times[-1]), ('times', times)])
+
+
+def time_benchmark(run, runs=5, warmup=1):
+    """Times run, returning a list of `runs` timings in seconds. The
+     shared source cache is cleared before each run, so every run reads
+     and parses the target from scratch."""
+    times = []
+    for i in range(warmup + runs):
+        clear_sources()
+        start = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - start
+        if i >= warmup:
+            times.append(elapsed)
+    return times
+
+
+def default_targets():
+    """Returns the target file of each package in the examples folder of
+     a source checkout, if there is one."""
+    from pyrelease.batch import discover_targets
+
+    examples = os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'examples')
+    if not os.path.isdir(examples):
+        return []
+    return discover_targets(examples)
+
+
+def synthetic_targets(folder):
+    """Generates a package much bigger than the examples, with hundreds
+     of imports and functions and a 4MB data folder, into folder.
+     It's named apart from generated corpora so their results don't
+     share keys. Returns its target file."""
+    from pyrelease.corpus import generate_corpus
+
+    return generate_corpus(folder, packages=1, imports=500, functions=200,
+                           data_files=16, data_size=256 * 1024,
+                           prefix='synthetic_pkg')
+
+
+def input_name(target):
+    """A short name for a target, used in result keys."""
+    if os.path.basename(target) == '__init__.py':
+        target = os.path.dirname(target)
+    return os.path.splitext(os.path.basename(target))[0]
+
+
+def run_benchmarks(targets, names=None, runs=5, warmup=1, on_result=None,
+                   synthetic=False):
+    """Runs the benchmarks in names (all of them by default) on each
+     target, and on `synthetic_targets` if synthetic is set. Returns a
+     report dict holding the environment and a `results` dict mapping
+     `benchmark/input` to its `summarize` stats. A benchmark that fails
+     has an `error` instead.
+
+     `on_result(key, result)` is called as each one finishes.
+     """
+    names = list(names or BENCHMARKS)
+    unknown = set(names) - set(BENCHMARKS)
+    if unknown:
+        raise ValueError("Unknown benchmarks: %s" % ", ".join(sorted(unknown)))
+
+    results = OrderedDict()
+    scratch = tempfile.mkdtemp(prefix='pyrelease-bench-') if synthetic else None
+    try:
+        jobs = [(os.path.abspath(t), False) for t in targets]
+        if synthetic:
+            jobs.extend((t, True) for t in synthetic_targets(scratch))
+        for target, is_synthetic in jobs:
+            for name in names:
+                key = "%s/%s" % (name, input_name(target))
+                result = _run_one(name, key, target, runs, warmup)
+                if is_synthetic:
+                    result['synthetic'] = True
+                results[key] = result
+                if on_result is not None:
+                    on_result(key, result)
+    finally:
+        if scratch is not None:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+    return OrderedDict([
+        ('format', FORMAT_VERSION),
+        ('created', time.time()),
+        ('python', sys.version.split()[0]),
+        ('platform', platform.platform()),
+        ('runs', runs),
+        ('warmup', warmup),
+        ('results', results),
+    ])
+
+
+def _run_one(name, key, target, runs, warmup):
+    work_dir = tempfile.mkdtemp(prefix='pyrelease-bench-')
+    try:
+        run = BENCHMARKS[name](target, work_dir)
+        result = summarize(time_benchmark(run, runs, warmup))
+    except Exception as e:
+        logger.error("Benchmark %s failed", key, exc_info=True)
+        result = OrderedDict([('error', str(e))])
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    result['target'] = target
+    return result
+
+
+def rerun(baseline, runs=None, warmup=None, on_result=None):
+    """Runs the benchmarks recorded in a baseline report again, on the
+     same targets, with the baseline's runs and warmup unless given.
+     Returns the new report."""
+    runs = runs or baseline['runs']
+    warmup = baseline['warmup'] if warmup is None else warmup
+    names = []
+    targets = []
+    synthetic = False
+    for key, result in baseline['results'].items():
+        name = key.split('/', 1)[0]
+        if name not in BENCHMARKS:
+            logger.warning("Benchmark %s no longer exists.", name)
+            continue
+        if name not in names:
+            names.append(name)
+        if result.get('synthetic'):
+            synthetic = True
+        elif result['target'] not in targets:
+            targets.append(result['target'])
+
+    # Only keep the pairs the baseline has.
+    def keep(key, result):
+        if key in baseline['results'] and on_result is not None:
+            on_result(key, result)
+
+    report = run_benchmarks(targets, names, runs, warmup, keep, synthetic)
+    report['results'] = OrderedDict(
+        (k, v) for k, v in report['results'].items() if k in baseline['results'])
+    return report
+
+
+def compare_reports(baseline, current, threshold=0.1):
+    """Compares the median of each benchmark in two reports. Returns a
+     list of dicts with the `key`, `baseline` and `current` medians, the
+     relative `change` and a `status`:
+
+      regressed: the median is more than threshold slower and the
+        current and baseline interquartile ranges don't overlap, so it
+        isn't noise.
+      improved: the same, but faster.
+      ok: within threshold or noise.
+      missing: failed or not run this time.
+      new: not in the baseline.
+     """
+    rows = []
+    current_results = current['results']
+    for key, base in baseline['results'].items():
+        row = OrderedDict([('key', key), ('baseline', base.get('median')),
+                           ('current', None), ('change', None)])
+        new = current_results.get(key)
+        if 'error' in base:
+            row['status'] = 'new' if new and 'error' not in new else 'missing'
+        elif new is None or 'error' in new:
+            row['status'] = 'missing'
+        else:
+            row['current'] = new['median']
+            row['change'] = (new['median'] - base['median']) / base['median']
+            if row['change'] > threshold and new['q1'] > base['q3']:
+                row['status'] = 'regressed'
+            elif row['change'] < -threshold and new['q3'] < base['q1']:
+                row['status'] = 'improved'
+            else:
+                row['status'] = 'ok'
+        rows.append(row)
+    for key, new in current_results.items():
+        if key not in baseline['results']:
+            rows.append(OrderedDict([
+                ('key', key), ('baseline', None), ('current', new.get('median')),
+                ('change', None), ('status', 'new')]))
+    return rows
+
+
+def format_comparison(rows):
+    """Returns the rows of `compare_reports` as a table."""
+    def ms(value):
+        return "-" if value is None else "%.2f" % (value * 1000)
+
+    lines = ["%-36s %12s %12s %8s  %s" % (
+        "benchmark", "baseline ms", "current ms", "change", "status")]
+    for row in rows:
+        change = "-" if row['change'] is None else "%+.1f%%" % (row['change'] * 100)
+        lines.append("%-36s %12s %12s %8s  %s" % (
+            row['key'], ms(row['baseline']), ms(row['current']), change,
+            row['status']))
+    return "\n".join(lines)
+
+
+def format_result(key, result):
+    """Returns a line of the results table for a benchmark."""
+    if 'error' in result:
+        return "%-36s failed: %s" % (key, result['error'])
+    return "%-36s %10.2f ms  +- %8.2f ms IQR" % (
+        key, result['median'] * 1000, result['iqr'] * 1000)
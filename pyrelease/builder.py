@@ -1,17 +1,30 @@
 #!/usr/bin/env
 from __future__ import print_function, absolute_import
 import os
+import sys
+import getpass
 import datetime
+import tempfile
 import subprocess
 import logging
-from shutil import copy as copy_to_dir
-from shutil import copytree as copy_dir
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from shutil import rmtree
 
 from pyrelease.templates import readme_rst, manifest_in, setup_py, pypirc_ini
 from pyrelease.licenses import LICENSES
 from pyrelease.shelltools import execute_shell_command, ignore_stdout, dir_context
 from pyrelease.compat import devnull
 from pyrelease.helpers import migrate_author, migrate_version, migrate_license
+from pyrelease.graph import run_graph
+from pyrelease.incremental import (BuildRecord, text_digest, tree_digest,
+                                   stat_signature)
+from pyrelease.distwriter import write_sdist, write_wheel, metadata_text
+from pyrelease.staging import stage_file, stage_tree
+from pyrelease.tracing import span, traced
+from pyrelease.upload import (UploadJournal, JOURNAL_NAME, repository_config,
+                              metadata_fields, dist_files, index_url,
+                              version_exists, clear_version_cache)
 
 # ######## LOGGING #########
 logger = logging.getLogger('pyrelease')
@@ -31,15 +44,39 @@ class Builder(object):
         "python setup.py bdist_wheel --universal",
     ])
 
+    # Build commands pyrelease can do itself without running setup.py,
+    # mapped to the method that does it. Used when `native` is set.
+    native_builds = {
+        "python setup.py sdist": "build_sdist",
+        "python setup.py bdist_wheel --universal": "build_wheel",
+    }
+
+    # Generated files that go in the source distribution.
+    sdist_build_files = [
+        'README.rst', 'LICENSE.md', 'MANIFEST.in', 'requirements.txt', 'setup.py']
+
     workers = {}
 
+    # The stages run by `make_all`, each mapped to the stages that must
+    # finish before it starts. Stage `x` runs the `build_x` method.
+    build_stages = OrderedDict([
+        ('readme', ()),
+        ('license', ()),
+        ('manifest', ()),
+        ('requirements', ()),
+        ('setup', ('readme',)),
+        ('package', ()),
+    ])
+
     # TODO: This should be a mapping to then eh
     pypi_url = r"https://pypi.python.org/pypi"
     pypi_test_url = r"https://testpypi.python.org/pypi"
 
     # dists_folder = None
 
-    def __init__(self, package, build_dir=None, test=True):
+    def __init__(self, package, build_dir=None, test=True, incremental=False,
+                 native=True, artifact_cache=None, staging='link',
+                 archive_direct=False):
         self.package = package
         self.verbose = package.verbose
         self.file_name = package.target_file     # + ".py"
@@ -50,6 +87,30 @@ class Builder(object):
         # Mainly to keep track of Twine and setuptools error responses
         self.errors = []
 
+        # Errors raised by build stages, keyed on stage name.
+        self.stage_errors = {}
+
+        # Skip build stages whose inputs haven't changed since the last
+        # build into the same build_dir.
+        self.incremental = incremental
+        self._build_record = None
+
+        # Write distributions in process where possible, see native_builds.
+        self.native = native
+
+        # A `cache.ArtifactCache` to reuse distributions built from the
+        # same inputs before.
+        self.artifact_cache = artifact_cache
+
+        # How source and data files are put in the build dir, one of
+        # `staging.STAGING_MODES`. Linked files are only ever replaced.
+        self.staging = staging
+
+        # Leave the module and data folder where they are and have the
+        # distributions read them from there, so the build dir only
+        # holds generated files.
+        self.archive_direct = archive_direct
+
         # Where this stuff will end up.
         if build_dir is None:
             build_dir = os.path.join(
@@ -58,16 +119,20 @@ class Builder(object):
         self.built = False
         self.uploaded = False
 
+        # Upload to this url instead of the one in .pypirc, and with
+        # these credentials when set. Used by native uploads.
+        self.repository_url = None
+        self.username = None
+        self.password = None
+
+        # The `upload.UploadResult` of each file of the last upload.
+        self.upload_results = []
+
     def migrate_source_attributes(self):
         """This method updates all the magic attributes in the new
          source file. This way the original source remains unchanged.
          """
-        target_source = self.package.target_file
-        if target_source == '__init__.py':
-            target_dir = os.path.join(self.build_dir, self.package.name)
-            target = os.path.join(target_dir, target_source)
-        else:
-            target = os.path.join(self.build_dir, os.path.basename(target_source))
+        target = os.path.join(self.build_dir, self.module_file)
 
         logger.info("Migrating source attributes.")
         migrate_author(target, self.package.author)
@@ -84,22 +149,58 @@ class Builder(object):
          Should be run before other build stages if the build_dir has
          changed.
          """
-        if self.package.is_data_files:
+        data_folder = os.path.join(self.package.package_dir, 'data')
+        inputs = "%s:%s" % (tree_digest([self.package.resolved_path, data_folder]),
+                            self.archive_direct)
+        if self.incremental and self.build_record.is_fresh('package', inputs):
+            logger.info("Package files are up to date.")
+            self.built = True
+            return
+
+        outputs = []
+        if self.archive_direct:
+            logger.info("Archive direct build, package files stay in place.")
+        elif self.package.is_data_files:
             logger.info("Found data files.")
-            data_folder = os.path.join(self.package.package_dir, 'data')
             dest = os.path.join(self.build_dir, 'data')
             try:
-                copy_dir(data_folder, dest)
+                outputs.extend(stage_tree(data_folder, dest, self.staging))
                 logger.info("Copying: (%s) - To: (%s)", data_folder, dest)
             except Exception as e:
                 logger.error("File exists error in build_package: (%s)", exc_info=True)
 
-        self.copy_files()
+        if not self.archive_direct:
+            outputs.append(self.copy_files())
+        # Files staged last time that aren't in the package anymore, so
+        # they don't end up in the distributions.
+        kept = set(os.path.normpath(path) for path in outputs)
+        for path in self.build_record.outputs('package'):
+            if os.path.normpath(path) not in kept and os.path.lexists(path):
+                logger.info("Removing %s, it's no longer in the package.", path)
+                os.remove(path)
         # self.migrate_source_attributes()
+        self.build_record.record('package', inputs, outputs)
         self.built = True
 
-    def build_readme(self):
-        """Builds your projects README.rst file from a template."""
+    def write_build_file(self, stage, file_name, text):
+        """Writes a rendered file into the build dir, unless this is an
+         incremental build and the file is already there with the same
+         content. Returns the path to the file."""
+        path = os.path.join(self.build_dir, file_name)
+        inputs = text_digest(text)
+        if self.incremental and self.build_record.is_fresh(stage, inputs):
+            logger.info("%s is up to date.", file_name)
+            return path
+        if os.path.lexists(path):
+            # Never write through a link made while staging.
+            os.remove(path)
+        with open(path, 'w') as f:
+            f.write(text)
+        self.build_record.record(stage, inputs, [path])
+        return path
+
+    def render_readme(self):
+        """Returns the README.rst text."""
         rv = readme_rst.TEMPLATE.format(
             name=self.package.name,
             description=self.package.description,
@@ -111,25 +212,32 @@ class Builder(object):
             find_packages=self.package.find_packages,
             license=self.package.license)
         self.package.PACKAGE_FILES['readme_rst'] = rv
-        with open(os.path.join(self.build_dir, "README.rst"), 'w') as f:
-            f.write(rv)
-            logger.info("Readme built..")
         return rv
 
-    def build_manifest(self):
-        """Fills in your releases MANIFEST.in file """
+    def build_readme(self):
+        """Builds your projects README.rst file from a template."""
+        rv = self.render_readme()
+        self.write_build_file('readme', "README.rst", rv)
+        logger.info("Readme built..")
+        return rv
+
+    def render_manifest(self):
+        """Returns the MANIFEST.in text."""
         include_data_files = 'recursive-include data *' if self.package.is_data_files else ''
         include_docs_folder = 'include docs/*'
         rv = manifest_in.TEMPLATE.format(
             include_data_files=include_data_files,
             include_docs_folder=include_docs_folder)
         self.package.PACKAGE_FILES['manifest_in'] = rv
-        with open(os.path.join(self.build_dir, 'MANIFEST.in'), 'w') as f:
-            f.write(rv)
+        return rv
+
+    def build_manifest(self):
+        """Fills in your releases MANIFEST.in file """
+        self.write_build_file('manifest', 'MANIFEST.in', self.render_manifest())
         logger.info("MANIFEST built..")
 
-    def build_setup(self):
-        """Build out the setup.py file for the release."""
+    def render_setup(self):
+        """Returns the setup.py text."""
         console_scripts = ""
         if self.package.is_script:
             if os.path.basename(self.package.target_file) == '__init__.py':
@@ -167,12 +275,30 @@ class Builder(object):
             packages=packages,
             py_modules=py_modules,
             find_packages=self.package.find_packages,
-            long_description=self.package.PACKAGE_FILES['readme_rst'], )
+            long_description=(self.package.PACKAGE_FILES.get('readme_rst') or
+                              self.render_readme()), )
         self.package.PACKAGE_FILES['setup_py'] = rv
-        with open(os.path.join(self.build_dir, 'setup.py'), 'w') as f:
-            f.write(rv)
+        return rv
+
+    def build_setup(self):
+        """Build out the setup.py file for the release."""
+        self.write_build_file('setup', 'setup.py', self.render_setup())
         logger.info("setup.py built..")
 
+    def render_license(self):
+        """Returns the LICENSE.md text."""
+        template = LICENSES.get(self.package.license, None)
+        if template is None:
+            template = LICENSES['MIT']
+
+        rv = template.format(
+            name=self.package.name,
+            author=self.package.author,
+            year=str(datetime.datetime.now().year))
+
+        self.package.PACKAGE_FILES['license_md'] = rv
+        return rv
+
     def build_license(self):
         """ Creates a license file by looking in your script for a
          __license__ = 'something' line.. MIT is default
@@ -188,19 +314,7 @@ class Builder(object):
              default: MIT
              UNLICENSE
          """
-
-        template = LICENSES.get(self.package.license, None)
-        if template is None:
-            template = LICENSES['MIT']
-
-        rv = template.format(
-            name=self.package.name,
-            author=self.package.author,
-            year=str(datetime.datetime.now().year))
-
-        self.package.PACKAGE_FILES['license_md'] = rv
-        with open(os.path.join(self.build_dir, "LICENSE.md"), 'w') as f:
-            f.writelines(rv)
+        self.write_build_file('license', "LICENSE.md", self.render_license())
         logger.info("License built..")
 
     def build_pypirc(self, pypi_username):
@@ -225,42 +339,200 @@ class Builder(object):
     #               'w') as f:
     #         f.write(html)
 
+    def render_requirements(self):
+        """Returns the requirements.txt text."""
+        return "\n".join([i for i in self.package.requirements])
+
     def build_requirements(self):
         """Writes the requirements.txt file"""
-        with open(os.path.join(self.build_dir, "requirements.txt"), 'w') as f:
-            f.write("\n".join([i for i in self.package.requirements]))
+        self.write_build_file(
+            'requirements', "requirements.txt", self.render_requirements())
 
-    def build_distros(self, suppress=False):
+    @traced(category='distro')
+    def build_distros(self, suppress=False, workers=None):
         """Builds out project distros, console output can be suppressed
          by setting show_output to True.
+
+         The builds run at the same time on up to `workers` threads.
+         Shell commands each get a scratch copy of the release so their
+         build/ and egg-info folders don't collide, and whatever they
+         put in dist/ is moved into our dist/.
          """
         suppress = suppress or self.verbose
-        with dir_context(self.build_dir):
-            for cmd in self.commands:
-                # TODO: This needs to be better. Not enough info on the build.
-                logger.info("Executing command - %s", str(cmd))
-                execute_shell_command(cmd, suppress=suppress)
-                logger.info("Done.")
+        commands = list(self.commands)
+        cache_key = None
+        if self.artifact_cache is not None:
+            with span('artifact cache', category='distro'):
+                cache_key = self.artifact_key()
+                restored = self.artifact_cache.restore(cache_key, self.dist_dir)
+            if restored is not None:
+                logger.info("Distributions restored from the artifact cache.")
+                return
+            before = self.dist_signatures()
+            error_count = len(self.errors)
+
+        if len(commands) < 2:
+            for cmd in commands:
+                self.run_build_command(cmd, suppress=suppress)
+        else:
+            with ThreadPoolExecutor(max_workers=workers or len(commands)) as pool:
+                list(pool.map(lambda cmd: self.run_build_command(cmd, suppress=suppress),
+                              commands))
+
+        if cache_key is not None and len(self.errors) == error_count:
+            built = [path for path, signature in self.dist_signatures().items()
+                     if before.get(path) != signature]
+            if built:
+                self.artifact_cache.set(cache_key, built)
+
+    def artifact_key(self):
+        """Returns the artifact cache key of the distributions, a hash of
+         every file going into them, the package metadata and the build
+         commands."""
+        extra = [self.native, metadata_text(self.package, self.read_readme())]
+        extra.extend(self.commands)
+        return self.artifact_cache.key(self.sdist_files(), extra)
+
+    def dist_signatures(self):
+        """Returns a dict mapping each file in dist/ to its stat
+         signature."""
+        if not os.path.isdir(self.dist_dir):
+            return {}
+        rv = {}
+        for name in os.listdir(self.dist_dir):
+            path = os.path.join(self.dist_dir, name)
+            if os.path.isfile(path):
+                rv[path] = stat_signature(path)
+        return rv
+
+    def run_build_command(self, cmd, suppress=False):
+        """Runs one of the build commands, in process if it's one of the
+         `native_builds`. Errors are added to `errors` and returned."""
+        with span(cmd, category='distro'):
+            msg = self._run_build_command(cmd, suppress)
+        if msg:
+            logger.error(msg)
+            self.errors.append(msg)
+        logger.info("Done.")
+        return msg
+
+    def _run_build_command(self, cmd, suppress):
+        native = self.native_builds.get(cmd) if self.native else None
+        msg = None
+        if native is not None:
+            logger.info("Building in process - %s", str(cmd))
+            try:
+                getattr(self, native)()
+            except Exception as e:
+                msg = "(%s) - Build failed: %s" % (e, cmd)
+        else:
+            # TODO: This needs to be better. Not enough info on the build.
+            logger.info("Executing command - %s", str(cmd))
+            scratch = self.make_scratch_dir()
+            try:
+                rv = execute_shell_command(cmd, suppress=suppress, cwd=scratch)
+                if rv is False or rv != 0:
+                    msg = "(%s) - Build command failed: %s" % (rv, cmd)
+                else:
+                    self.collect_dists(scratch)
+            finally:
+                rmtree(scratch, ignore_errors=True)
+        return msg
+
+    def make_scratch_dir(self):
+        """Returns a new folder inside the build dir holding a copy of
+         the release, for a build command to run in."""
+        scratch = tempfile.mkdtemp(prefix='.scratch-', dir=self.build_dir)
+        for path, arcname in self.sdist_files():
+            dest = os.path.join(scratch, arcname)
+            if not os.path.isdir(os.path.dirname(dest)):
+                os.makedirs(os.path.dirname(dest))
+            stage_file(path, dest, self.staging)
+        return scratch
+
+    def collect_dists(self, scratch):
+        """Moves the distributions a build command wrote in its scratch
+         dir into dist/."""
+        scratch_dist = os.path.join(scratch, 'dist')
+        if not os.path.isdir(scratch_dist):
+            return
+        os.makedirs(self.dist_dir, exist_ok=True)
+        for name in os.listdir(scratch_dist):
+            os.replace(os.path.join(scratch_dist, name),
+                       os.path.join(self.dist_dir, name))
+
+    def sdist_files(self):
+        """Returns a `(path, arcname)` tuple for every file that goes
+         into the source distribution. These are in the build dir,
+         except for the module and data files of an archive direct
+         build."""
+        rv = [(os.path.join(self.build_dir, n), n)
+              for n in self.sdist_build_files
+              if os.path.isfile(os.path.join(self.build_dir, n))]
+        rv.extend(f for f in self.wheel_files() if os.path.isfile(f[0]))
+        if self.archive_direct:
+            base = self.package.package_dir
+        else:
+            base = self.build_dir
+        for root, dirs, files in os.walk(os.path.join(base, 'data')):
+            for name in files:
+                path = os.path.join(root, name)
+                rv.append((path, os.path.relpath(path, base).replace(os.sep, '/')))
+        return rv
+
+    def read_readme(self):
+        """Returns the text of the built README.rst, or "" if there
+         isn't one."""
+        readme = os.path.join(self.build_dir, 'README.rst')
+        if not os.path.isfile(readme):
+            return ""
+        with open(readme, 'r') as f:
+            return f.read()
+
+    def build_sdist(self):
+        """Writes the source distribution into dist/ directly from the
+         built files instead of running `setup.py sdist`. Returns the
+         path of the archive."""
+        return write_sdist(
+            self.package, self.sdist_files(), self.dist_dir, self.read_readme())
+
+    def wheel_files(self):
+        """Returns a `(path, arcname)` tuple for every file that goes
+         into the wheel. Like the generated setup.py, that's just the
+         module."""
+        if self.archive_direct:
+            path = os.path.abspath(self.package.target_file)
+        else:
+            path = os.path.join(self.build_dir, self.module_file)
+        return [(path, self.module_file.replace(os.sep, '/'))]
+
+    def build_wheel(self):
+        """Writes a universal wheel into dist/ directly from the package
+         info instead of running `setup.py bdist_wheel --universal`.
+         Returns the path of the wheel."""
+        script_module = None
+        if self.package.is_script:
+            # Same entry point as the generated setup.py.
+            script_module = os.path.splitext(self.module_file)[0].replace(os.sep, '.')
+        return write_wheel(
+            self.package, self.wheel_files(), self.dist_dir,
+            self.read_readme(), script_module)
 
     def copy_files(self):
         """Copies our package files into the new output folder.
+        Returns the path of the copy.
         """
         if not self.package.is_single_file:
             logger.error("Package is more than one file.")
             raise NotImplementedError('only single files supported')
         what_to_copy = self.package.target_file
-        if what_to_copy == '__init__.py':
-            target_dir = os.path.join(self.build_dir, self.package.name)
-            try:
-                os.mkdir(target_dir)
-            except OSError:
-                pass
-            else:
-                logger.info("%s folder is being copied to %s", what_to_copy, self.build_dir)
-                copy_to_dir(what_to_copy, target_dir)
-        else:
-            logger.info("%s file is being copied to %s", what_to_copy, self.build_dir)
-            copy_to_dir(what_to_copy, self.build_dir)
+        dest = os.path.join(self.build_dir, self.module_file)
+        target_dir = os.path.dirname(dest)
+        if not os.path.isdir(target_dir):
+            os.mkdir(target_dir)
+        logger.info("%s file is being copied to %s", what_to_copy, target_dir)
+        stage_file(what_to_copy, dest, self.staging)
+        return dest
 
     def create_build_dir(self):
         build_to = self.build_dir
@@ -285,21 +557,53 @@ class Builder(object):
             logger.info("Created dir - (%s)", build_to)
             return build_to
 
-    def make_all(self):
+    def make_all(self, workers=None, on_done=None):
         """ Help method to just giver and build the whole thing"""
         # self.build_docs() # Broken
         logger.info("Running make_all")
         self.create_build_dir()
-        self.build_readme()
-        self.build_license()
-        self.build_manifest()
-        self.build_requirements()
-        self.build_setup()
-        self.build_package()
-        # TODO: Keep track of progress and report errors..
+        self.build_all(workers=workers, on_done=on_done)
         logger.info("Finished running make_all.")
         return self.errors
 
+    def build_all(self, workers=None, on_done=None):
+        """Runs every stage in `build_stages`, each one as soon as the
+         stages it needs are done, so independent stages (like copying
+         the data folder and rendering the templates) overlap.
+
+         An error in a stage doesn't stop the others, it's kept in
+         `stage_errors` and `errors`, and stages that needed it are
+         skipped. `on_done(stage, error)` is called as each stage ends.
+         Returns `stage_errors`.
+         """
+        def done(stage, result, error):
+            if error is not None:
+                msg = "(%s) - Build stage failed: %s" % (stage, error)
+                logger.error(msg)
+                self.stage_errors[stage] = error
+                self.errors.append(msg)
+            if on_done is not None:
+                on_done(stage, error)
+
+        tasks = OrderedDict(
+            (stage, (self.run_stage, (stage,)))
+            for stage in self.build_stages)
+        # Loaded once here rather than racing to load it in the stages.
+        self.build_record
+        try:
+            self.package.load_all()
+        except Exception:
+            # The stages that need it hit the error again and record it.
+            pass
+        with ThreadPoolExecutor(max_workers=workers or len(tasks)) as pool:
+            run_graph(pool, tasks, self.build_stages, on_done=done)
+        return self.stage_errors
+
+    def run_stage(self, stage):
+        """Runs the `build_<stage>` method of a build stage."""
+        with span('build_' + stage, category='stage'):
+            return getattr(self, 'build_' + stage)()
+
     def parse_response(self, response):
         """Trying some things out to handle shell errors better while
          calling Twine.."""
@@ -320,6 +624,7 @@ class Builder(object):
             self.errors.append(msg)
         else:
             logger.warning("Unknown response code from PyPi. (%s)", response)
+        return msg
 
     # TODO: This could probably go somewhere else.
     def preview_readme(self):
@@ -333,6 +638,7 @@ class Builder(object):
                     "restview README.rst".split(" "), stdout=devnull)
             return shell
 
+    @traced(category='upload')
     def register_pypi_test_package(self, suppress=False):
         """Registers your package with the PyPi test site. This step doesn't
          seem to be necessary for the regular PyPi site though..
@@ -346,52 +652,190 @@ class Builder(object):
             # self.parse_response(response)
         return response
 
+    @traced(category='upload')
     def upload_to_pypi(self, suppress=False):
-        """Uploads package to PyPi using twine.
-        The advantage to using Twine is your package is uploaded
-        over HTTPS which prevents your private info from appearing
-        in the request header. (Apparently setuptools uploads over
-        https now as well, so find out more about that.
+        """Uploads package to PyPi, over HTTPS so your private info
+        doesn't appear in the request. Done in process unless `native`
+        is off, in which case twine is used.
         """
-        # TODO: This doesn't need to be twine anymore. ALTHOUGH, make sure ...
-        # the default pip or setuptools uses https _without_ needing to be
-        # upgraded first. Because if not, that makes twine the most secure
-        # way.
         suppress = suppress or self.verbose
-        if not os.path.exists(os.path.expanduser('~/.pypirc')):
-            msg = (
-                "No .pypirc found. Please see "
-                "https://docs.python.org/2/distutils/packageindex.html#pypirc "
-                "for more info.")
-            logger.warning(msg)
-            self.errors.append(msg)
+        if self.native:
+            results = self.upload_to_repositories(['pypi'])
+            return results and results['pypi']
+        if not self.has_pypirc():
             return
         logger.info("Uploading Project to the Pypi server..")
-        with dir_context(self.build_dir):
-            response = execute_shell_command(
-                "twine upload dist/*", suppress=suppress)
-            logger.info("Project has been uploaded to the Pypi server!")
-            logger.debug("Result: %s", repr(response))
-            self.parse_response(response)
+        response = self.twine_upload("twine upload dist/*", suppress)
+        logger.info("Project has been uploaded to the Pypi server!")
         self.uploaded = True
         return response
 
+    @traced(category='upload')
     def upload_to_pypi_test_site(self, suppress=False):
         """Uploads your package to the PyPi repository allowing others
         to download easily with pip"""
         suppress = suppress or self.verbose
+        if self.native:
+            results = self.upload_to_repositories(['testpypi'])
+            return results and results['testpypi']
+        logger.info("Uploading Project to the Pypi TESTING server..")
+        response = self.twine_upload("twine upload dist/* -r testpypi", suppress)
+        logger.info("Project has been uploaded to the Pypi TESTING server!")
+        self.uploaded = True
+        return response
+
+    @traced(category='upload')
+    def upload_to_repositories(self, repositories, concurrency=None):
+        """Uploads everything in dist/ to each of the named repository
+         sections of .pypirc at the same time, see
+         `asyncupload.UploadScheduler`. Files that fail are added to
+         errors. Returns a dict of each repository's list of
+         `upload.UploadResult`."""
+        from pyrelease.asyncupload import UploadScheduler, UPLOAD_CONCURRENCY
+
+        if not self.has_pypirc():
+            return
+        url = self.url_for(repositories)
+        configs = OrderedDict()
+        for name in repositories:
+            config = self.repository(name, url)
+            if config['url'] is None:
+                msg = "No repository url for %s in .pypirc." % name
+                logger.warning(msg)
+                self.errors.append(msg)
+            else:
+                configs[name] = config
+        if not configs:
+            return
+        logger.info("Uploading Project to %s..", ", ".join(configs))
+        metadata = metadata_fields(self.package, self.read_readme())
+        scheduler = UploadScheduler(configs, concurrency or UPLOAD_CONCURRENCY,
+                                    journal=self.upload_journal)
+        results = scheduler.run(dist_files(self.dist_dir), metadata)
+        # What's on the indexes has changed.
+        clear_version_cache()
+
+        self.upload_results = []
+        for name, files in results.items():
+            for result in files:
+                self.upload_results.append(result)
+                if result.ok:
+                    continue
+                if not self.parse_response(result.status):
+                    self.errors.append("(%s) - Uploading %s to %s failed: %s" % (
+                        result.status, os.path.basename(result.path), name,
+                        result.reason))
+        logger.info("Project has been uploaded to %s!", ", ".join(configs))
+        self.uploaded = True
+        return results
+
+    @traced(category='upload')
+    def check_version(self, repositories=None, warn_only=False):
+        """Checks the package's version isn't on the named repository
+         sections of .pypirc already, before anything is built. By
+         default the one `use_test_server` picks is checked. Adds an
+         error, or only logs it with warn_only, and returns False if it
+         is there. A repository that can't be reached is only warned
+         about.
+         """
+        if repositories is None:
+            repositories = ['testpypi' if self.use_test_server else 'pypi']
+        ok = True
+        override = self.url_for(repositories)
+        for name in repositories:
+            url = override or repository_config(name)['url']
+            if url is None:
+                continue
+            exists = version_exists(index_url(url), self.package.name,
+                                    self.package.version)
+            if exists is None:
+                logger.warning("Couldn't check if %s %s is on %s already.",
+                               self.package.name, self.package.version, name)
+            elif exists:
+                msg = "(400) - %s %s is already on %s, needs to upgrade version.." % (
+                    self.package.name, self.package.version, name)
+                logger.warning(msg)
+                if not warn_only:
+                    self.errors.append(msg)
+                ok = False
+        return ok
+
+    def twine_upload(self, cmd, suppress=False):
         with dir_context(self.build_dir):
-            logger.info("Uploading Project to the Pypi TESTING server..")
-            response = execute_shell_command(
-                "twine upload dist/* -r testpypi", suppress=suppress)
-            logger.info(
-                "Project has been uploaded to the Pypi TESTING server!")
+            response = execute_shell_command(cmd, suppress=suppress)
             logger.debug("Result: %s", repr(response))
             # TODO: This needs to be better..
             self.parse_response(response)
-        self.uploaded = True
         return response
 
+    def has_pypirc(self):
+        """Checks there's a .pypirc to upload with, adding an error if
+         not. Not needed with a `repository_url`."""
+        if self.repository_url is not None or \
+                os.path.exists(os.path.expanduser('~/.pypirc')):
+            return True
+        msg = (
+            "No .pypirc found. Please see "
+            "https://docs.python.org/2/distutils/packageindex.html#pypirc "
+            "for more info.")
+        logger.warning(msg)
+        self.errors.append(msg)
+        return False
+
+    def url_for(self, repositories):
+        """The `repository_url` to use instead of the .pypirc one for
+         repositories. Only one repository can be sent to it, so with
+         several it's left out and each one's own url is used."""
+        if self.repository_url is not None and len(repositories) > 1:
+            logger.warning("Not using %s for %s, it's only used for one "
+                           "repository.", self.repository_url,
+                           ", ".join(repositories))
+            return None
+        return self.repository_url
+
+    def repository(self, name, url=None):
+        """The `url`, `username` and `password` to upload to a
+         repository section of .pypirc with, overridden by url,
+         `username` and `password`. Asks for the password if it's still
+         missing."""
+        config = repository_config(name)
+        config['url'] = url or config['url']
+        config['username'] = self.username or config['username']
+        config['password'] = self.password or config['password']
+        if config['password'] is None and config['username'] is not None \
+                and sys.stdin.isatty():
+            config['password'] = getpass.getpass(
+                "%s password for %s: " % (name, config['username']))
+        return config
+
+    @property
+    def dist_dir(self):
+        """Where finished distributions are put."""
+        return os.path.join(self.build_dir, 'dist')
+
+    @property
+    def module_file(self):
+        """The path of the package's module inside the release, a
+         `name/__init__.py` package folder or a single file."""
+        base = os.path.basename(self.package.target_file)
+        if base == '__init__.py':
+            return os.path.join(self.package.name, base)
+        return base
+
+    @property
+    def build_record(self):
+        """The `incremental.BuildRecord` of the current build_dir."""
+        if self._build_record is None or \
+                self._build_record.build_dir != self.build_dir:
+            self._build_record = BuildRecord(self.build_dir)
+        return self._build_record
+
+    @property
+    def upload_journal(self):
+        """The `upload.UploadJournal` of the current build_dir, so an
+         interrupted upload only sends what's missing next time."""
+        return UploadJournal(os.path.join(self.build_dir, JOURNAL_NAME))
+
     @property
     def commands(self):
         """Returns the build commands to be used."""
@@ -0,0 +1,340 @@
+# coding=utf-8
+from __future__ import print_function, absolute_import
+import os
+import json
+import shutil
+import hashlib
+import tarfile
+import tempfile
+import logging
+
+from pyrelease.helpers import cache_dir, write_atomic
+from pyrelease.compat import Request, urlopen, HTTPError, URLError
+from pyrelease.staging import stage_file
+from pyrelease.depindex import site_dirs
+from pyrelease.source import get_source
+
+logger = logging.getLogger('pyrelease')
+logger.setLevel(logging.DEBUG)
+
+# Bump this when the meaning of cached data changes.
+CACHE_VERSION = 1
+
+# Config files that user info is read from.
+CONFIG_FILES = ('~/.gitconfig', '~/.pypirc', '~/.hgrc')
+
+
+def file_digest(path, algorithm='sha256', chunk_size=1 << 16):
+    """Returns the hex digest of a file's content, read in chunks."""
+    h = hashlib.new(algorithm)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def evict(folder, max_size):
+    """Removes the least recently used entries in folder until the
+     total size of what's left is under max_size bytes. Entries are
+     files or directories directly inside folder, and their mtime is
+     their last use. Returns the number of entries removed.
+
+     Entries still being written (named `*.tmp`) are left alone.
+     """
+    entries = []
+    total = 0
+    for name in os.listdir(folder):
+        if name.endswith('.tmp'):
+            continue
+        path = os.path.join(folder, name)
+        try:
+            size, used = _entry_size(path), os.stat(path).st_mtime
+        except OSError:
+            continue
+        entries.append((used, size, path))
+        total += size
+
+    removed = 0
+    for used, size, path in sorted(entries):
+        if total <= max_size:
+            break
+        logger.info("Evicting cache entry - %s -", path)
+        _remove(path)
+        total -= size
+        removed += 1
+    return removed
+
+
+def _entry_size(path):
+    if not os.path.isdir(path):
+        return os.path.getsize(path)
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+
+def _remove(path):
+    try:
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        else:
+            os.remove(path)
+    except OSError:
+        logger.warning("Couldn't remove cache entry %s", path)
+
+
+def touch(path):
+    """Marks a cache entry as just used."""
+    try:
+        os.utime(path, None)
+    except OSError:
+        pass
+
+
+class MetadataCache(object):
+    """Saves the info `PyPackage` works out about a target so repeat runs
+     on an unchanged source can skip reading it.
+
+     Entries are keyed on the content of the target file, the mtimes of
+     the user config files and the site directories (installing packages
+     changes how dependencies are named). Each entry is a small json
+     file, the least recently used are evicted once the cache grows past
+     `max_size` bytes.
+     """
+
+    FIELDS = ('name', 'version', 'license', 'description', 'author',
+              'requirements', 'is_script')
+
+    def __init__(self, path=None, max_size=4 * 1024 * 1024):
+        self.path = path or cache_dir('metadata')
+        self.max_size = max_size
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+
+    def key(self, target_file, use_import=False):
+        """Returns the cache key for a target file."""
+        h = hashlib.sha256()
+        h.update(("%s\0%s\0%s\0" % (
+            CACHE_VERSION, os.path.abspath(target_file), use_import)).encode('utf-8'))
+        # Hashing the shared source means a cache miss doesn't read it twice.
+        h.update(get_source(target_file).text.encode('utf-8'))
+        watched = [os.path.expanduser(p) for p in CONFIG_FILES]
+        for path in watched + sorted(site_dirs()):
+            try:
+                mtime = os.stat(path).st_mtime
+            except OSError:
+                mtime = None
+            h.update(("\0%s=%r" % (path, mtime)).encode('utf-8'))
+        return h.hexdigest()
+
+    def _entry(self, key):
+        return os.path.join(self.path, key + '.json')
+
+    def get(self, key):
+        """Returns the saved fields for key, or None."""
+        entry = self._entry(key)
+        try:
+            with open(entry, 'r') as f:
+                record = json.load(f)
+        except (IOError, OSError, ValueError):
+            return None
+        touch(entry)
+        logger.info("Metadata cache hit - %s -", key)
+        return record
+
+    def set(self, key, record):
+        """Saves the fields in record under key."""
+        record = dict((k, record[k]) for k in self.FIELDS if k in record)
+        try:
+            write_atomic(self._entry(key), json.dumps(record))
+        except (IOError, OSError):
+            logger.warning("Couldn't save metadata cache entry %s", key)
+            return
+        evict(self.path, self.max_size)
+
+    def clear(self):
+        for name in os.listdir(self.path):
+            _remove(os.path.join(self.path, name))
+
+
+class ArtifactCache(object):
+    """Keeps built distributions so a release whose build inputs are
+     byte for byte the same as an earlier one, in any build folder or
+     project, gets them back instead of building them again.
+
+     Entries are keyed on a hash of every file that goes into the build
+     plus anything else that changes the output, like the commands. Each
+     entry is a folder holding the distribution files, the least
+     recently used are evicted once the cache grows past `max_size`
+     bytes.
+
+     With a `RemoteArtifactCache` as `remote`, entries missing here are
+     fetched from it and new entries are pushed to it, so builds can be
+     shared between machines.
+     """
+
+    def __init__(self, path=None, max_size=512 * 1024 * 1024, remote=None):
+        self.path = path or cache_dir('artifacts')
+        self.max_size = max_size
+        self.remote = remote
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+
+    def key(self, files, extra=()):
+        """Returns the cache key for the `(path, arcname)` build inputs
+         in files and the strings in extra."""
+        h = hashlib.sha256()
+        h.update(("%s\0" % CACHE_VERSION).encode('utf-8'))
+        for value in extra:
+            h.update(("%s\0" % value).encode('utf-8'))
+        for path, arcname in sorted(files, key=lambda f: f[1]):
+            h.update(("%s=%s\0" % (arcname, file_digest(path))).encode('utf-8'))
+        return h.hexdigest()
+
+    def _entry(self, key):
+        return os.path.join(self.path, key)
+
+    def get(self, key):
+        """Returns the paths of the files saved under key, or None. An
+         empty entry is a miss."""
+        entry = self._entry(key)
+        if not os.path.isdir(entry) and self.remote is not None:
+            self._fetch(key)
+        try:
+            names = sorted(os.listdir(entry))
+        except OSError:
+            return None
+        if not names:
+            _remove(entry)
+            return None
+        touch(entry)
+        logger.info("Artifact cache hit - %s -", key)
+        return [os.path.join(entry, n) for n in names]
+
+    def restore(self, key, dest):
+        """Copies the files saved under key into dest, linking them where
+         possible. Returns their new paths, or None if there's no such
+         entry."""
+        files = self.get(key)
+        if files is None:
+            return None
+        os.makedirs(dest, exist_ok=True)
+        rv = []
+        for path in files:
+            target = os.path.join(dest, os.path.basename(path))
+            stage_file(path, target)
+            rv.append(target)
+        return rv
+
+    def _fetch(self, key):
+        """Copies the entry for key from the remote cache, if it has it."""
+        tmp = tempfile.mkdtemp(prefix=key, suffix='.tmp', dir=self.path)
+        try:
+            if self.remote.fetch(key, tmp):
+                os.rename(tmp, self._entry(key))
+                evict(self.path, self.max_size)
+        except (IOError, OSError):
+            pass
+        finally:
+            if os.path.isdir(tmp):
+                _remove(tmp)
+
+    def set(self, key, paths):
+        """Saves copies of the files in paths under key, and pushes them
+         to the remote cache if there is one."""
+        if not paths:
+            return
+        if self.remote is not None:
+            self.remote.push(key, paths)
+        entry = self._entry(key)
+        tmp = tempfile.mkdtemp(prefix=key, suffix='.tmp', dir=self.path)
+        try:
+            for path in paths:
+                stage_file(path, os.path.join(tmp, os.path.basename(path)))
+            os.rename(tmp, entry)
+        except (IOError, OSError):
+            # Most likely another build saved the same entry first.
+            _remove(tmp)
+            if not os.path.isdir(entry):
+                logger.warning("Couldn't save artifact cache entry %s", key)
+            return
+        evict(self.path, self.max_size)
+
+    def clear(self):
+        for name in os.listdir(self.path):
+            _remove(os.path.join(self.path, name))
+
+
+class RemoteArtifactCache(object):
+    """Client for an artifact cache shared over HTTP, like the one run
+     by `pyrelease-cache-server`.
+
+     An entry is a tar of the distribution files at `url/artifacts/key`.
+     It is fetched with GET, where 404 means a miss, and saved with PUT.
+     Network errors are logged and treated as misses so a build never
+     fails because the cache is down.
+     """
+
+    def __init__(self, url, timeout=30):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+
+    def _url(self, key):
+        return "%s/artifacts/%s" % (self.url, key)
+
+    def fetch(self, key, dest):
+        """Extracts the files saved under key into dest. Returns True on
+         a hit, an entry without any files is a miss."""
+        try:
+            response = urlopen(self._url(key), timeout=self.timeout)
+        except HTTPError as e:
+            if e.code != 404:
+                logger.warning("Remote cache error %s fetching %s", e.code, key)
+            return False
+        except (URLError, IOError, OSError) as e:
+            logger.warning("Remote cache unreachable (%s)", e)
+            return False
+        count = 0
+        try:
+            with response, tarfile.open(fileobj=response, mode='r|') as tar:
+                for member in tar:
+                    name = os.path.basename(member.name)
+                    if not member.isfile() or name != member.name:
+                        continue
+                    with open(os.path.join(dest, name), 'wb') as f:
+                        shutil.copyfileobj(tar.extractfile(member), f)
+                    os.utime(os.path.join(dest, name), (member.mtime, member.mtime))
+                    count += 1
+        except (tarfile.TarError, IOError, OSError) as e:
+            logger.warning("Bad remote cache entry %s (%s)", key, e)
+            for name in os.listdir(dest):
+                _remove(os.path.join(dest, name))
+            return False
+        if not count:
+            logger.warning("Empty remote cache entry %s", key)
+            return False
+        logger.info("Remote cache hit - %s -", key)
+        return True
+
+    def push(self, key, paths):
+        """Uploads the files in paths under key. Returns True if the
+         server took them."""
+        with tempfile.TemporaryFile() as body:
+            with tarfile.open(fileobj=body, mode='w') as tar:
+                for path in paths:
+                    tar.add(path, arcname=os.path.basename(path))
+            size = body.tell()
+            body.seek(0)
+            request = Request(self._url(key), data=body, headers={
+                'Content-Type': 'application/x-tar',
+                'Content-Length': str(size)})
+            request.get_method = lambda: 'PUT'
+            try:
+                urlopen(request, timeout=self.timeout).close()
+            except (URLError, IOError, OSError) as e:
+                logger.warning("Couldn't push %s to the remote cache (%s)", key, e)
+                return False
+        logger.info("Pushed - %s - to the remote cache", key)
+        return True
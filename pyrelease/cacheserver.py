@@ -0,0 +1,110 @@
+# coding=utf-8
+from __future__ import print_function, absolute_import
+import os
+import re
+import shutil
+import tempfile
+import threading
+import logging
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from pyrelease.cache import evict, touch
+
+logger = logging.getLogger('pyrelease')
+logger.setLevel(logging.DEBUG)
+
+KEY_PATH = re.compile(r'^/artifacts/([0-9a-f]{64})$')
+
+
+class CacheRequestHandler(BaseHTTPRequestHandler):
+    """Serves `GET`, `HEAD` and `PUT` for `/artifacts/<key>`, storing
+     each entry as a file named after its key in the server's root."""
+
+    server_version = 'pyrelease-cache/1'
+
+    def _entry(self):
+        match = KEY_PATH.match(self.path)
+        if match is None:
+            self.send_error(404)
+            return None
+        return os.path.join(self.server.root, match.group(1))
+
+    def do_HEAD(self):
+        self._send_entry(body=False)
+
+    def do_GET(self):
+        self._send_entry(body=True)
+
+    def _send_entry(self, body):
+        entry = self._entry()
+        if entry is None:
+            return
+        try:
+            f = open(entry, 'rb')
+        except (IOError, OSError):
+            self.send_error(404)
+            return
+        with f:
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/x-tar')
+            self.send_header('Content-Length', str(os.fstat(f.fileno()).st_size))
+            self.end_headers()
+            if body:
+                shutil.copyfileobj(f, self.wfile)
+        touch(entry)
+
+    def do_PUT(self):
+        entry = self._entry()
+        if entry is None:
+            return
+        length = self.headers.get('Content-Length')
+        if length is None:
+            self.send_error(411)
+            return
+        remaining = int(length)
+        fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=self.server.root)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                while remaining:
+                    chunk = self.rfile.read(min(remaining, 1 << 16))
+                    if not chunk:
+                        raise IOError("Client sent less than Content-Length")
+                    f.write(chunk)
+                    remaining -= len(chunk)
+            os.replace(tmp_path, entry)
+        except (IOError, OSError):
+            os.remove(tmp_path)
+            self.send_error(400)
+            return
+        with self.server.evict_lock:
+            evict(self.server.root, self.server.max_size)
+        self.send_response(201)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        logger.debug("cache server: " + format, *args)
+
+
+class CacheServer(ThreadingHTTPServer):
+    """A reference artifact cache server for `cache.RemoteArtifactCache`.
+
+     Entries are kept in `root`, the least recently used are evicted once
+     they add up to more than `max_size` bytes. There's no auth, so only
+     run it somewhere trusted like localhost or a private CI network.
+     """
+
+    daemon_threads = True
+
+    def __init__(self, address, root, max_size=4 * 1024 * 1024 * 1024):
+        self.root = os.path.abspath(root)
+        self.max_size = max_size
+        self.evict_lock = threading.Lock()
+        if not os.path.isdir(self.root):
+            os.makedirs(self.root)
+        ThreadingHTTPServer.__init__(self, address, CacheRequestHandler)
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return "http://%s:%s" % (host, port)
@@ -92,12 +92,35 @@ def create_pypirc(g, package, builder):
         create_pypirc(g, package, builder)
 
 
-def giver(g, package, target, test_pypi):
+def warn_if_uploaded(g, builder, repository):
+    """Warns if the version is already on the repository the next
+     upload goes to, where it would be refused."""
+    if not builder.check_version([repository], warn_only=True):
+        g.text(" ")
+        g.red_text("    %s %s has already been uploaded, the upload will fail "
+                   "unless you change the version." % (
+                       builder.package.name, builder.package.version))
+
+
+def giver(g, package, target, test_pypi, incremental=False, native=True,
+          artifact_cache=None, staging='link', archive_direct=False,
+          repository_url=None, repositories=()):
         import random
         from .builder import Builder
 
-        builder = Builder(package, build_dir=target)
+        builder = Builder(package, build_dir=target, incremental=incremental,
+                          native=native, artifact_cache=artifact_cache,
+                          staging=staging, archive_direct=archive_direct)
         builder.use_test_server = test_pypi
+        builder.repository_url = repository_url
+        if 'all' in repositories:
+            from .upload import pypirc_repositories
+            repositories = pypirc_repositories()
+
+        # No point building a version that can't be uploaded.
+        if not builder.check_version(list(repositories) or None):
+            g.abort("%s %s has already been uploaded, change the version "
+                    "and try again." % (package.name, package.version))
 
         g.cls()
 
@@ -113,21 +136,11 @@ def giver(g, package, target, test_pypi):
 
         g.text(" ")
         msg = random.choice(message)
-        with click.progressbar(length=7, label=msg) as bar:
+        with click.progressbar(length=len(builder.build_stages) + 1,
+                               label=msg) as bar:
             builder.create_build_dir()
             bar.update(1)
-            builder.build_readme()
-            bar.update(1)
-            builder.build_license()
-            bar.update(1)
-            builder.build_manifest()
-            bar.update(1)
-            builder.build_requirements()
-            bar.update(1)
-            builder.build_setup()
-            bar.update(1)
-            builder.build_package()
-            bar.update(1)
+            builder.build_all(on_done=lambda stage, error: bar.update(1))
             g.text(" ")
             g.text(" ")
             g.green_text("Done.")
@@ -142,13 +155,16 @@ def giver(g, package, target, test_pypi):
             register_package(g, builder)
 
         g.text(" ")
-        g.cyan_text("Starting twine.")
+        g.cyan_text("Starting upload.")
         g.text(" ")
-        g.green_text("Enter your PyPi %s password to begin the upload." %
-                     ("", "TEST SERVER")[test_pypi])
-        if builder.use_test_server:
+        if repositories:
+            g.green_text("Uploading to %s at once." % ", ".join(repositories))
+            builder.upload_to_repositories(repositories)
+        elif builder.use_test_server:
+            g.green_text("Enter your PyPi TEST SERVER password to begin the upload.")
             builder.upload_to_pypi_test_site()
         else:
+            g.green_text("Enter your PyPi password to begin the upload.")
             builder.upload_to_pypi()
         g.text(" ")
         g.green_text("Upload complete.")
@@ -169,20 +185,96 @@ def giver(g, package, target, test_pypi):
 pass_context = click.make_pass_decorator(Generator, ensure=True)
 
 
+def instrument(trace=None, profile=None):
+    """Records spans for the rest of the command. When it exits, a
+     summary is printed and the spans are written to the trace path as
+     a Chrome trace. With a profile folder each stage is also profiled,
+     see `profiling.Profiler`.
+     """
+    from .tracing import start_tracing, stop_tracing
+
+    if profile:
+        from .profiling import Profiler
+        start_tracing(Profiler(profile))
+    else:
+        start_tracing()
+
+    def finish():
+        tracer = stop_tracing()
+        if tracer is None:
+            return
+        click.echo(" ")
+        if profile:
+            tracer.finish()
+            click.echo(tracer.report())
+            click.echo("Profiles saved to %s" % profile)
+        click.echo(tracer.summary_text())
+        if trace:
+            tracer.write(trace)
+            click.echo("Trace saved to %s" % trace)
+
+    click.get_current_context().call_on_close(finish)
+
+
 @click.command()
 @click.option('-G', '--giver', is_flag=True,
               help="Enable this to just giver and build the whole thing in one go.")
 @click.option('-T', '--test-pypi', is_flag=True,
               help="Upload to the PyPi test site.")
+@click.option('--repository-url', default=None,
+              help="Upload to this package index url instead of the one "
+                   "in your .pypirc, like a local devpi. Can't be used "
+                   "with more than one --repository.")
+@click.option('-r', '--repository', 'repositories', multiple=True,
+              help="In giver mode, upload to this repository from your "
+                   ".pypirc instead, can be given more than once to upload "
+                   "to several at the same time. 'all' uploads to every "
+                   "one in index-servers.")
 @click.option('-V', '--verbose', is_flag=True,
               help="Enable to view Twine output.")
+@click.option('-I', '--use-import', is_flag=True,
+              help="Import the package to read its info instead of "
+                   "parsing the source.")
+@click.option('--no-cache', is_flag=True,
+              help="Always read the package info from the source and "
+                   "build the distributions instead of reusing what was "
+                   "found or built on a previous run.")
+@click.option('--remote-cache', default=None, envvar='PYRELEASE_REMOTE_CACHE',
+              help="URL of a shared artifact cache, like one run by "
+                   "pyrelease-cache-server.")
+@click.option('-i', '--incremental', is_flag=True,
+              help="Only rebuild the files in the build folder whose "
+                   "inputs changed since the last build.")
+@click.option('--use-setuptools', is_flag=True,
+              help="Build distributions by running setup.py instead of "
+                   "writing them directly.")
+@click.option('--staging', default='link',
+              type=click.Choice(['link', 'reflink', 'copy']),
+              help="How files are put in the build folder. 'link' hard "
+                   "links them, 'reflink' makes copy on write clones where "
+                   "the filesystem can, 'copy' always copies.")
+@click.option('--archive-direct', is_flag=True,
+              help="Leave your script and data folder out of the build "
+                   "folder and read them straight into the distributions.")
+@click.option('--trace', default=None,
+              type=click.Path(dir_okay=False, writable=True),
+              help="Time each step of the release, print a summary at the "
+                   "end and save a Chrome trace (chrome://tracing or "
+                   "ui.perfetto.dev) to this file.")
+@click.option('--profile', default=None,
+              type=click.Path(file_okay=False, writable=True),
+              help="Profile each step of the release with cProfile and "
+                   "tracemalloc, save the results in this folder and "
+                   "print the slowest functions and biggest allocations.")
 @click.option('-T', '-t', '--target', default=None,
               help="This is folder your package will be saved to.",
               type=click.Path(exists=False, file_okay=False,
                               writable=True, resolve_path=True, allow_dash=True))
 @click.argument('project', default=".")
 @pass_context
-def release(g, project, giver, test_pypi, verbose, target):
+def release(g, project, giver, test_pypi, repository_url, repositories, verbose,
+            use_import, no_cache, remote_cache, incremental, use_setuptools,
+            staging, archive_direct, trace, profile, target):
     """Releasing python code - an experiment in zero config releases.
 
     Pyrelease gathers info for package, fills out necessary files, builds,
@@ -190,8 +282,22 @@ def release(g, project, giver, test_pypi, verbose, target):
     """
     from .pyrelease import PyPackage
     from .builder import Builder
+    from .cache import MetadataCache, ArtifactCache, RemoteArtifactCache
+
+    if repository_url and (len(repositories) > 1 or 'all' in repositories):
+        raise click.UsageError("--repository-url can only be used with one "
+                               "--repository.")
+
+    if trace or profile:
+        instrument(trace, profile)
 
-    package = PyPackage(project, verbose=verbose)
+    cache = None if no_cache else MetadataCache()
+    artifact_cache = None
+    if not no_cache:
+        remote = RemoteArtifactCache(remote_cache) if remote_cache else None
+        artifact_cache = ArtifactCache(remote=remote)
+    package = PyPackage(project, verbose=verbose, use_import=use_import,
+                        cache=cache)
 
     if package is None:
         g.abort("Release failed, see the error log for more details.")
@@ -199,7 +305,9 @@ def release(g, project, giver, test_pypi, verbose, target):
     # ------------------------------------Giver mode
     # TODO: Move me into a click command group
     if giver:
-        giver(g, package, target, test_pypi)
+        giver(g, package, target, test_pypi, incremental, not use_setuptools,
+              artifact_cache, staging, archive_direct, repository_url,
+              repositories)
     #######################################
 
     # ---------------- Clear the screen and start wizard
@@ -351,7 +459,10 @@ def release(g, project, giver, test_pypi, verbose, target):
     # ----------------------- Load up the Builder.
     g.text(" ")
     g.green_text("Loading builder.")
-    builder = Builder(package, build_dir=target)
+    builder = Builder(package, build_dir=target, incremental=incremental,
+                      native=not use_setuptools, artifact_cache=artifact_cache,
+                      staging=staging, archive_direct=archive_direct)
+    builder.repository_url = repository_url
 
     # ---------------------------------- Go through config files
     g.text(' ')
@@ -424,24 +535,31 @@ def release(g, project, giver, test_pypi, verbose, target):
     g.text(" ")
     click.pause()
 
-    builds = [
-        (builder.create_build_dir, "Directories"),
-        (builder.build_readme, "README.rst"),
-        (builder.build_license, "LICENSE.md"),
-        (builder.build_manifest, "MANIFEST.in"),
-        (builder.build_requirements, "requirements.txt"),
-        (builder.build_setup, "setup.py"),
-        (builder.build_package, "Finished Release")
-    ]
+    labels = dict(
+        readme="README.rst",
+        license="LICENSE.md",
+        manifest="MANIFEST.in",
+        requirements="requirements.txt",
+        setup="setup.py",
+        package="Finished Release",
+    )
 
     g.text(" ")
-    with click.progressbar(builds,
-                           label="Status") as jobs:
-        for build in jobs:
-            g.green_text(" Building %s" % build[1])
-            build[0]()
+    with click.progressbar(length=len(builder.build_stages) + 1,
+                           label="Status") as bar:
+        g.green_text(" Building Directories")
+        builder.create_build_dir()
+        bar.update(1)
+
+        def stage_done(stage, error):
+            if error is None:
+                g.green_text(" Built %s" % labels.get(stage, stage))
+            else:
+                g.red_text(" Failed %s" % labels.get(stage, stage))
+            bar.update(1)
+        builder.build_all(on_done=stage_done)
 
-    errors = package.errors
+    errors = builder.stage_errors
     g.text(" ")
     if errors:
         g.red_text("Build completed with errors..!")
@@ -518,6 +636,7 @@ def release(g, project, giver, test_pypi, verbose, target):
         "Yes for test server or no for regular PyPi.")
 
     if builder.use_test_server:
+        warn_if_uploaded(g, builder, 'testpypi')
 
         g.text("")
         g.green_text("Registering Package")
@@ -552,6 +671,7 @@ def release(g, project, giver, test_pypi, verbose, target):
 
     if upload:
         # Upload to MAIN
+        warn_if_uploaded(g, builder, 'pypi')
         g.text("")
         proceed = g.prompt("You're really, really, sure?", True)
 
@@ -579,6 +699,272 @@ def release(g, project, giver, test_pypi, verbose, target):
     g.print_footer()
 
 
+@click.command()
+@click.option('-w', '--workers', default=None, type=int,
+              help="Number of worker processes, one per core by default.")
+@click.option('-I', '--use-import', is_flag=True,
+              help="Import the packages to read their info instead of "
+                   "parsing the source.")
+@click.option('--no-cache', is_flag=True,
+              help="Always read the package info from the source.")
+@click.option('--remote-cache', default=None, envvar='PYRELEASE_REMOTE_CACHE',
+              help="URL of a shared artifact cache, like one run by "
+                   "pyrelease-cache-server.")
+@click.option('-o', '--output', default=None,
+              type=click.Path(dir_okay=False, writable=True),
+              help="Write the report to this file as json.")
+@click.option('-b', '--build', is_flag=True,
+              help="Also build every package, packages required by others "
+                   "in the tree first.")
+@click.option('-T', '-t', '--target', default=None,
+              help="This is folder the releases will be saved to.",
+              type=click.Path(exists=False, file_okay=False,
+                              writable=True, resolve_path=True))
+@click.argument('root', default=".")
+def batch(root, workers, use_import, no_cache, remote_cache, output, build, target):
+    """Finds every package under ROOT and gathers their release info
+    in parallel.
+    """
+    import json
+    from .batch import batch_report
+    from .cache import MetadataCache
+    from .pyrelease import PyPackage
+    from .scheduler import BuildScheduler
+
+    report = batch_report(root, workers=workers, use_import=use_import,
+                          use_cache=not no_cache)
+    for package in report['packages']:
+        rel = os.path.relpath(package['target'], report['root'])
+        if package['error']:
+            click.secho("%-24s %s" % (rel, package['error']), fg='red')
+        else:
+            click.echo("%-24s %s %s [%s]" % (
+                rel, package['name'], package['version'],
+                ", ".join(package['requirements'])))
+    click.echo("%d packages, %d errors in %.2fs" % (
+        len(report['packages']), report['errors'], report['elapsed']))
+
+    if build:
+        # The analysis above filled the cache, so these are cheap.
+        cache = None if no_cache else MetadataCache()
+        packages = [PyPackage(p['target'], use_import=use_import, cache=cache)
+                    for p in report['packages'] if not p['error']]
+        scheduler = BuildScheduler(packages, workers=workers, build_root=target,
+                                   use_cache=not no_cache, remote_cache=remote_cache)
+        click.echo("Building %s" % ", ".join(scheduler.order()))
+
+        def built(name, error):
+            if error:
+                click.secho("%-24s %s" % (name, error), fg='red')
+            else:
+                click.echo("%-24s built" % name)
+
+        report['builds'] = scheduler.run(on_done=built)
+    if output:
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=4)
+
+
+@click.command()
+@click.option('--host', default='127.0.0.1',
+              help="Address to listen on.")
+@click.option('-p', '--port', default=8765, type=int,
+              help="Port to listen on.")
+@click.option('--max-size', default=4096, type=int,
+              help="Megabytes to keep before evicting the least recently "
+                   "used entries.")
+@click.argument('root', default=None, required=False,
+                type=click.Path(file_okay=False, resolve_path=True))
+def cache_server(host, port, max_size, root):
+    """Serves a shared artifact cache from ROOT for --remote-cache.
+
+    Builds on other machines given this server's URL reuse each other's
+    distributions.
+    """
+    from .cacheserver import CacheServer
+    from .helpers import cache_dir
+
+    server = CacheServer((host, port), root or cache_dir('server'),
+                         max_size=max_size * 1024 * 1024)
+    click.echo("Serving %s at %s" % (server.root, server.url))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+@click.command()
+@click.option('--host', default='127.0.0.1',
+              help="Address to listen on.")
+@click.option('-p', '--port', default=8766, type=int,
+              help="Port to listen on.")
+@click.argument('root', default=None, required=False,
+                type=click.Path(file_okay=False, resolve_path=True))
+def index_server(host, port, root):
+    """Serves a stand-in package index from ROOT to try uploads on.
+
+    Upload to it with --repository-url and the url it prints. Anyone can
+    upload, and files it already has are refused like PyPi does.
+    """
+    from .indexserver import IndexServer
+    from .helpers import cache_dir
+
+    server = IndexServer((host, port), root or cache_dir('index'))
+    click.echo("Serving %s at %s" % (server.root, server.upload_url))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+@click.group()
+def bench():
+    """Benchmarks for pyrelease itself."""
+
+
+@bench.command('run')
+@click.option('-n', '--runs', default=5, type=int,
+              help="Timed runs of each benchmark.")
+@click.option('--warmup', default=1, type=int,
+              help="Untimed runs before the timed ones.")
+@click.option('-b', '--benchmark', 'names', multiple=True,
+              help="Only run this benchmark, can be repeated.")
+@click.option('--synthetic/--no-synthetic', default=True,
+              help="Also run on a generated package much bigger than the "
+                   "examples.")
+@click.option('-c', '--corpus', multiple=True,
+              type=click.Path(exists=True, file_okay=False),
+              help="Also run on every package in this folder, like one "
+                   "made by `pyrelease-bench corpus`. Can be repeated.")
+@click.option('-o', '--output', default=None,
+              type=click.Path(dir_okay=False, writable=True),
+              help="Save the results to this file as json.")
+@click.argument('targets', nargs=-1, type=click.Path(exists=True))
+def bench_run(runs, warmup, names, synthetic, corpus, output, targets):
+    """Times reading and building each of TARGETS, the examples folder
+    of a source checkout by default.
+    """
+    import json
+    from .benchmarks import run_benchmarks, default_targets, format_result
+    from .batch import discover_targets
+    from .helpers import find_package
+
+    targets = [find_package(t) for t in targets]
+    for folder in corpus:
+        targets.extend(discover_targets(folder))
+    if not targets:
+        targets = default_targets()
+    if not targets and not synthetic:
+        raise click.UsageError("Nothing to benchmark.")
+    try:
+        report = run_benchmarks(
+            targets, names=names or None, runs=runs, warmup=warmup,
+            on_result=lambda key, result: click.echo(format_result(key, result)),
+            synthetic=synthetic)
+    except ValueError as e:
+        raise click.UsageError(str(e))
+
+    if output:
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+        click.echo("Results saved to %s" % output)
+
+
+
+@bench.command('compare')
+@click.option('-n', '--runs', default=None, type=int,
+              help="Timed runs of each benchmark, the baseline's by default.")
+@click.option('--threshold', default=10.0, type=float,
+              help="Percent slower a benchmark's median can get before it "
+                   "counts as a regression.")
+@click.option('--against', default=None,
+              type=click.Path(exists=True, dir_okay=False),
+              help="Compare with these saved results instead of running "
+                   "the benchmarks again.")
+@click.option('-o', '--output', default=None,
+              type=click.Path(dir_okay=False, writable=True),
+              help="Save the new results to this file as json.")
+@click.argument('baseline', type=click.Path(exists=True, dir_okay=False))
+def bench_compare(runs, threshold, against, output, baseline):
+    """Runs the benchmarks saved in BASELINE again and compares them.
+    Exits with status 1 if any benchmark regressed, or failed or is
+    missing when it had results in BASELINE, so it can gate CI.
+    """
+    import json
+    from .benchmarks import (FORMAT_VERSION, rerun, format_result,
+                             compare_reports, format_comparison)
+
+    with open(baseline) as f:
+        base = json.load(f)
+    if base.get('format') != FORMAT_VERSION:
+        raise click.UsageError("%s is from an incompatible version." % baseline)
+
+    if against:
+        with open(against) as f:
+            current = json.load(f)
+    else:
+        current = rerun(base, runs=runs, on_result=lambda key, result: click.echo(
+            format_result(key, result)))
+        click.echo(" ")
+    if output:
+        with open(output, 'w') as f:
+            json.dump(current, f, indent=2)
+
+    rows = compare_reports(base, current, threshold / 100.0)
+    click.echo(format_comparison(rows))
+    regressed = [r['key'] for r in rows if r['status'] == 'regressed']
+    # A benchmark that ran before and fails now broke what it measures.
+    missing = [r['key'] for r in rows
+               if r['status'] == 'missing' and r['baseline'] is not None]
+    if regressed:
+        click.secho("%d regressed: %s" % (len(regressed), ", ".join(regressed)),
+                    fg='red')
+    if missing:
+        click.secho("%d failed or missing: %s" % (len(missing), ", ".join(missing)),
+                    fg='red')
+    if regressed or missing:
+        click.get_current_context().exit(1)
+    click.secho("No regressions.", fg='green')
+
+
+@bench.command('corpus')
+@click.option('-p', '--packages', default=10, type=int,
+              help="Number of packages.")
+@click.option('-i', '--imports', default=100, type=int,
+              help="Imports in each package.")
+@click.option('-f', '--functions', default=50, type=int,
+              help="Functions in each package.")
+@click.option('--data-files', default=0, type=int,
+              help="Files in each package's data folder.")
+@click.option('--data-size', default=0, type=int,
+              help="Bytes in each data file.")
+@click.option('-s', '--shape', default='chain',
+              type=click.Choice(['none', 'chain', 'star', 'tree', 'random']),
+              help="How the packages import each other.")
+@click.option('-l', '--layout', default='module',
+              type=click.Choice(['module', 'package']),
+              help="Put the code in name/name.py or name/__init__.py.")
+@click.option('--seed', default=0, type=int,
+              help="Different seeds give different corpora.")
+@click.argument('root', type=click.Path(file_okay=False, writable=True))
+def bench_corpus(packages, imports, functions, data_files, data_size, shape,
+                 layout, seed, root):
+    """Generates a synthetic monorepo of packages into ROOT, to run the
+    benchmarks or pyrelease-batch against.
+    """
+    from .corpus import generate_corpus
+
+    targets = generate_corpus(
+        root, packages=packages, imports=imports, functions=functions,
+        data_files=data_files, data_size=data_size, shape=shape,
+        layout=layout, seed=seed)
+    click.echo("Generated %d packages in %s" % (len(targets), root))
+
+
 main = release
 
 if __name__ == '__main__':
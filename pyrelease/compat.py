@@ -8,6 +8,9 @@ except ImportError:
     # Python 2.x fallback
     import ConfigParser as configparser
 
+from urllib.request import Request, urlopen
+from urllib.error import HTTPError, URLError
+
 PY2 = sys.version_info[0] == 2
 
 if PY2:
@@ -0,0 +1,164 @@
+# coding=utf-8
+from __future__ import print_function, absolute_import
+import os
+import json
+import random
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger('pyrelease')
+logger.setLevel(logging.DEBUG)
+
+# Written at the root of each corpus.
+MANIFEST_NAME = 'corpus.json'
+
+LAYOUTS = ('module', 'package')
+
+DATA_BLOCK_SIZE = 1 << 16
+
+# Standard library modules the generated code imports. A fixed list so
+# corpora are the same on every Python version.
+STDLIB_IMPORTS = (
+    'abc', 'argparse', 'ast', 'base64', 'bisect', 'calendar', 'collections',
+    'contextlib', 'copy', 'csv', 'datetime', 'decimal', 'difflib', 'email',
+    'fnmatch', 'fractions', 'functools', 'glob', 'gzip', 'hashlib', 'heapq',
+    'hmac', 'io', 'itertools', 'json', 'logging', 'math', 'operator', 'os',
+    'pickle', 'random', 're', 'shutil', 'socket', 'sqlite3', 'string',
+    'struct', 'subprocess', 'sys', 'tarfile', 'tempfile', 'textwrap',
+    'threading', 'time', 'unittest', 'uuid', 'warnings', 'weakref', 'zipfile',
+    'zlib')
+
+
+def _chain(i, rng):
+    return [i - 1] if i else []
+
+
+def _star(i, rng):
+    return [0] if i else []
+
+
+def _tree(i, rng):
+    return [(i - 1) // 2] if i else []
+
+
+def _random(i, rng):
+    return sorted(rng.sample(range(i), min(i, rng.randint(0, 3))))
+
+
+# How the packages of a corpus require each other. Each maps the index
+# of a package to the indexes of the earlier packages it imports.
+SHAPES = OrderedDict([
+    ('none', lambda i, rng: []),
+    ('chain', _chain),
+    ('star', _star),
+    ('tree', _tree),
+    ('random', _random),
+])
+
+
+def package_name(index, prefix='corpus_pkg'):
+    return "%s_%04d" % (prefix, index)
+
+
+def module_text(name, imports=100, functions=50, requires=(), rng=None):
+    """Returns the source of a releasable module with `imports` import
+     statements, half stdlib and half unknown third party names, an
+     import of each package in requires, and `functions` functions."""
+    rng = rng or random.Random(0)
+    lines = ['"""%s, a synthetic package."""' % name,
+             '__version__ = "1.0.%d"' % rng.randint(0, 99),
+             '__author__ = "Corpus Author"',
+             '__license__ = "MIT"',
+             '__all__ = ["main"]',
+             '']
+    lines.extend("import %s" % r for r in requires)
+    for i in range(imports):
+        if i % 2:
+            lines.append("import %s" % rng.choice(STDLIB_IMPORTS))
+        else:
+            lines.append("import %s_dep_%d" % (name, i))
+    for i in range(functions):
+        lines.extend(['', '',
+                      'def func_%d(value):' % i,
+                      '    """Function %d of %s."""' % (i, name),
+                      '    return [value * %d for _ in range(%d)]' % (i, rng.randint(1, 9))])
+    lines.extend(['', '',
+                  'def main():',
+                  '    """Runs %s."""' % name,
+                  '    return func_0(1)' if functions else '    return None',
+                  ''])
+    return "\n".join(lines)
+
+
+def write_data(folder, files, size, rng):
+    """Writes `files` data files of `size` bytes each into folder. The
+     bytes are random, so they don't compress, but come from rng so the
+     same seed gives the same files."""
+    if not files:
+        return
+    os.makedirs(folder, exist_ok=True)
+    block_size = max(1, min(size, DATA_BLOCK_SIZE))
+    block = rng.getrandbits(8 * block_size).to_bytes(block_size, 'little')
+    for i in range(files):
+        sub = os.path.join(folder, "set_%02d" % (i % 10))
+        os.makedirs(sub, exist_ok=True)
+        header = ("file %d\n" % i).encode('ascii')
+        with open(os.path.join(sub, "data_%05d.bin" % i), 'wb') as f:
+            remaining = size
+            f.write(header[:remaining])
+            remaining -= len(header[:remaining])
+            while remaining > 0:
+                chunk = block[:remaining]
+                f.write(chunk)
+                remaining -= len(chunk)
+
+
+def generate_corpus(root, packages=10, imports=100, functions=50, data_files=0,
+                    data_size=0, shape='chain', layout='module', seed=0,
+                    prefix='corpus_pkg'):
+    """Writes a synthetic monorepo of releasable packages into root for
+     benchmarks and scale tests. The same arguments always give the
+     same files.
+
+     Each package gets a module with `imports` imports and `functions`
+     functions, and a data folder of `data_files` files of `data_size`
+     bytes. Packages import each other following `shape` (see
+     `SHAPES`), which `BuildScheduler` turns into build order. With the
+     'package' layout the code lives in `__init__.py` files. Packages
+     are named prefix and their number, like `corpus_pkg_0000`.
+
+     A `corpus.json` manifest of the arguments and packages is written
+     too. Returns the target file of each package.
+     """
+    if shape not in SHAPES:
+        raise ValueError("Unknown shape %r, use one of %s" % (shape, ", ".join(SHAPES)))
+    if layout not in LAYOUTS:
+        raise ValueError("Unknown layout %r, use one of %s" % (layout, ", ".join(LAYOUTS)))
+    rng = random.Random(seed)
+    os.makedirs(root, exist_ok=True)
+
+    targets = []
+    listing = []
+    for i in range(packages):
+        name = package_name(i, prefix)
+        requires = [package_name(d, prefix) for d in SHAPES[shape](i, rng)]
+        folder = os.path.join(root, name)
+        os.makedirs(folder, exist_ok=True)
+        if layout == 'package':
+            target = os.path.join(folder, '__init__.py')
+        else:
+            target = os.path.join(folder, name + '.py')
+        with open(target, 'w') as f:
+            f.write(module_text(name, imports, functions, requires, rng))
+        write_data(os.path.join(folder, 'data'), data_files, data_size, rng)
+        targets.append(target)
+        listing.append(OrderedDict([('name', name), ('requires', requires)]))
+
+    manifest = OrderedDict([
+        ('packages', packages), ('imports', imports), ('functions', functions),
+        ('data_files', data_files), ('data_size', data_size), ('shape', shape),
+        ('layout', layout), ('seed', seed), ('prefix', prefix), ('contents', listing)])
+    with open(os.path.join(root, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    logger.info("Generated a corpus of %d packages in - %s -", packages, root)
+    return targets
@@ -0,0 +1,195 @@
+# coding=utf-8
+from __future__ import print_function, absolute_import
+import os
+import sys
+import json
+import site
+import sysconfig
+import logging
+from importlib import metadata as importlib_metadata
+
+from pyrelease.helpers import cache_dir, write_atomic
+
+logger = logging.getLogger('pyrelease')
+logger.setLevel(logging.DEBUG)
+
+# Bump this when the layout of the saved index changes.
+INDEX_VERSION = 1
+
+# The index loaded by `load_index`, shared for the rest of the run.
+_INDEX = None
+
+
+class DistributionIndex(object):
+    """Maps top level import names to the name of the installed
+     distribution that provides them, and knows which names belong to
+     the standard library.
+
+     `sites` maps each directory distributions were found in to its
+     mtime when the index was built. Installing or removing anything
+     changes those mtimes, which is how a saved index goes stale.
+     """
+
+    def __init__(self, modules, stdlib, sites, executable=None):
+        self.modules = modules
+        self.stdlib = set(stdlib)
+        self.sites = sites
+        self.executable = executable or sys.executable
+
+    def is_stdlib(self, name):
+        return name in self.stdlib
+
+    def distribution(self, name):
+        """Returns the distribution name for the top level import
+         `name`, or None if no installed distribution provides it."""
+        return self.modules.get(name)
+
+    def is_stale(self):
+        if self.executable != sys.executable:
+            return True
+        for path, mtime in self.sites.items():
+            if _mtime(path) != mtime:
+                return True
+        return False
+
+    def jsonize(self):
+        return dict(
+            version=INDEX_VERSION,
+            executable=self.executable,
+            sites=self.sites,
+            modules=self.modules,
+            stdlib=sorted(self.stdlib),
+        )
+
+    def __repr__(self):
+        return "<DistributionIndex(%d modules)>" % len(self.modules)
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+def stdlib_module_names():
+    """Returns the set of top level module names in the standard library."""
+    names = set(sys.builtin_module_names)
+    if hasattr(sys, 'stdlib_module_names'):
+        names.update(sys.stdlib_module_names)
+        return names
+
+    # Python < 3.10, list the stdlib directories instead.
+    stdlib_dir = sysconfig.get_paths()['stdlib']
+    for folder in (stdlib_dir, os.path.join(stdlib_dir, 'lib-dynload')):
+        try:
+            entries = os.listdir(folder)
+        except OSError:
+            continue
+        for entry in entries:
+            if entry in ('site-packages', 'dist-packages'):
+                continue
+            name = entry.split('.')[0]
+            if entry.endswith(('.py', '.so', '.pyd')) or \
+                    os.path.isfile(os.path.join(folder, entry, '__init__.py')):
+                names.add(name)
+    return names
+
+
+def _top_level_from_files(files):
+    """Works out the top level import names from a distribution's
+     installed file list, for distributions without a top_level.txt"""
+    rv = set()
+    for path in files:
+        parts = str(path).replace('\\', '/').split('/')
+        first = parts[0]
+        if first in ('..', '__pycache__') or first.endswith(('.dist-info', '.egg-info', '.data')):
+            continue
+        if len(parts) > 1:
+            rv.add(first)
+        elif first.endswith(('.py', '.so', '.pyd')):
+            rv.add(first.split('.')[0])
+    return rv
+
+
+def _installed_distributions():
+    """Yields (distribution name, site dir, top level names) for every
+     installed distribution."""
+    for dist in importlib_metadata.distributions():
+        name = dist.metadata['Name']
+        if not name:
+            continue
+        top_level = dist.read_text('top_level.txt')
+        if top_level:
+            names = set(top_level.split())
+        else:
+            names = _top_level_from_files(dist.files or [])
+        yield name, str(dist.locate_file('')), names
+
+
+def site_dirs():
+    """Returns the site directories distributions get installed into.
+     The user site is included even if it doesn't exist yet, so a first
+     --user install is noticed."""
+    rv = set()
+    if hasattr(site, 'getsitepackages'):
+        rv.update(site.getsitepackages())
+    if hasattr(site, 'getusersitepackages'):
+        rv.add(site.getusersitepackages())
+    return rv
+
+
+def build_index():
+    """Builds a fresh `DistributionIndex` from installed metadata."""
+    logger.info("Building distribution index.")
+    modules = {}
+    watched = site_dirs()
+    for name, location, top_level in _installed_distributions():
+        watched.add(os.path.abspath(location))
+        for module in top_level:
+            # The first distribution on sys.path wins, like importing does.
+            modules.setdefault(module, name)
+    sites = dict((path, _mtime(path)) for path in watched)
+    return DistributionIndex(modules, stdlib_module_names(), sites)
+
+
+def load_index(path=None, rebuild=False):
+    """Returns the distribution index, loaded from `path` (by default
+     in the pyrelease cache directory) unless it's missing or stale,
+     in which case it's rebuilt and saved.
+
+     The loaded index is kept for the rest of the run.
+     """
+    global _INDEX
+    shared = path is None
+    if shared:
+        if _INDEX is not None and not rebuild:
+            return _INDEX
+        path = cache_dir('depindex.json')
+
+    index = None
+    if not rebuild and os.path.exists(path):
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+        except (IOError, OSError, ValueError):
+            logger.warning("Distribution index may be corrupted, rebuilding.")
+        else:
+            if data.get('version') == INDEX_VERSION:
+                index = DistributionIndex(
+                    data['modules'], data['stdlib'],
+                    data['sites'], data['executable'])
+                if index.is_stale():
+                    logger.info("Distribution index is stale.")
+                    index = None
+
+    if index is None:
+        index = build_index()
+        try:
+            write_atomic(path, json.dumps(index.jsonize()))
+        except (IOError, OSError):
+            logger.warning("Couldn't save distribution index to %s", path)
+
+    if shared:
+        _INDEX = index
+    return index
@@ -0,0 +1,211 @@
+# coding=utf-8
+from __future__ import print_function, absolute_import
+import os
+import io
+import re
+import gzip
+import time
+import base64
+import hashlib
+import tarfile
+import zipfile
+import tempfile
+import logging
+
+from pyrelease.templates import pkg_info, wheel
+
+logger = logging.getLogger('pyrelease')
+logger.setLevel(logging.DEBUG)
+
+CHUNK_SIZE = 1 << 16
+
+# Zip entries larger than this need zip64 headers.
+ZIP64_LIMIT = (1 << 31) - 1
+
+
+def metadata_text(package, long_description=""):
+    """Returns the core metadata (PKG-INFO / METADATA) of a package."""
+    optional = []
+    for key, value in (('Author', package.author),
+                       ('Author-email', package.author_email),
+                       ('License', package.license)):
+        if value:
+            optional.append("%s: %s" % (key, value))
+    optional.extend("Classifier: %s" % c for c in pkg_info.CLASSIFIERS)
+    optional.extend("Requires-Dist: %s" % r for r in package.requirements)
+    return pkg_info.TEMPLATE.format(
+        name=package.name,
+        version=package.version,
+        summary=" ".join((package.description or "").split()),
+        url=package.url,
+        optional="".join(line + "\n" for line in optional),
+        long_description=long_description)
+
+
+def source_date(mtime):
+    """Clamps a file mtime to $SOURCE_DATE_EPOCH, if set, so archives
+     can be reproduced."""
+    epoch = os.environ.get('SOURCE_DATE_EPOCH')
+    if epoch:
+        return min(int(mtime), int(epoch))
+    return int(mtime)
+
+
+def file_mode(path):
+    return 0o755 if os.stat(path).st_mode & 0o111 else 0o644
+
+
+def _parent_dirs(arcnames):
+    rv = set()
+    for name in arcnames:
+        parts = name.split('/')[:-1]
+        for i in range(1, len(parts) + 1):
+            rv.add('/'.join(parts[:i]))
+    return sorted(rv)
+
+
+def _open_output(dist_dir, name):
+    """Returns an open temporary file in dist_dir to write an archive
+     to, moved into place by `_finish_output`."""
+    os.makedirs(dist_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=name, suffix='.tmp', dir=dist_dir)
+    return os.fdopen(fd, 'wb'), tmp_path
+
+
+def _finish_output(tmp_path, path):
+    os.chmod(tmp_path, 0o644)
+    os.replace(tmp_path, path)
+    logger.info("Wrote - %s -", path)
+    return path
+
+
+def sdist_name(package):
+    return "%s-%s" % (package.name, package.version)
+
+
+def write_sdist(package, files, dist_dir, long_description=""):
+    """Writes `dist_dir/name-version.tar.gz` holding a PKG-INFO file and
+     each `(path, arcname)` in files, under a `name-version/` folder.
+
+     Files are streamed into the archive from disk, ownership is dropped
+     and the gzip header has no timestamp, so the same inputs give the
+     same archive. Returns the path of the archive.
+     """
+    base = sdist_name(package)
+    path = os.path.join(dist_dir, base + '.tar.gz')
+    files = sorted(files, key=lambda f: f[1])
+    meta = metadata_text(package, long_description).encode('utf-8')
+
+    raw, tmp_path = _open_output(dist_dir, base)
+    try:
+        with raw, gzip.GzipFile(filename='', mode='wb', fileobj=raw, mtime=0) as gz, \
+                tarfile.open(fileobj=gz, mode='w', format=tarfile.PAX_FORMAT) as tar:
+            newest = max([os.stat(p).st_mtime for p, _ in files] or [0])
+            for name in [''] + _parent_dirs(a for _, a in files):
+                info = tarfile.TarInfo((base + '/' + name).rstrip('/'))
+                info.type = tarfile.DIRTYPE
+                info.mode = 0o755
+                info.mtime = source_date(newest)
+                tar.addfile(info)
+
+            info = tarfile.TarInfo(base + '/PKG-INFO')
+            info.size = len(meta)
+            info.mode = 0o644
+            info.mtime = source_date(newest)
+            tar.addfile(info, io.BytesIO(meta))
+
+            for src, arcname in files:
+                st = os.stat(src)
+                info = tarfile.TarInfo(base + '/' + arcname)
+                info.size = st.st_size
+                info.mode = file_mode(src)
+                info.mtime = source_date(st.st_mtime)
+                with open(src, 'rb') as f:
+                    tar.addfile(info, f)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+    return _finish_output(tmp_path, path)
+
+
+def wheel_escape(value):
+    """Escapes a name or version for use in a wheel file name."""
+    return re.sub(r'[^\w\d.]+', '_', str(value), flags=re.UNICODE)
+
+
+def wheel_name(package):
+    return "%s-%s-py2.py3-none-any.whl" % (
+        wheel_escape(package.name), wheel_escape(package.version))
+
+
+def record_hash(digest):
+    """Formats a sha256 digest the way RECORD files want it."""
+    return 'sha256=' + base64.urlsafe_b64encode(digest).rstrip(b'=').decode('ascii')
+
+
+def _zip_info(arcname, mtime, mode=0o644):
+    date_time = time.gmtime(max(source_date(mtime), 315532800))[:6]
+    info = zipfile.ZipInfo(arcname, date_time=date_time)
+    info.external_attr = (0o100000 | mode) << 16
+    info.compress_type = zipfile.ZIP_DEFLATED
+    return info
+
+
+def write_wheel(package, files, dist_dir, long_description="", script_module=None):
+    """Writes a universal `py2.py3-none-any` wheel into dist_dir holding
+     each `(path, arcname)` in files and the `.dist-info` metadata.
+     If `script_module` is given a console script named after the
+     package runs its `main` function.
+
+     Files are streamed into the zip and hashed for the RECORD file as
+     they go. Returns the path of the wheel.
+     """
+    name = wheel_name(package)
+    path = os.path.join(dist_dir, name)
+    dist_info = "%s-%s.dist-info" % (
+        wheel_escape(package.name), wheel_escape(package.version))
+    files = sorted(files, key=lambda f: f[1])
+    newest = max([os.stat(p).st_mtime for p, _ in files] or [0])
+
+    top_level = sorted(set(arcname.split('/')[0].rsplit('.py', 1)[0]
+                           for _, arcname in files))
+    meta_files = [
+        ('METADATA', metadata_text(package, long_description)),
+        ('WHEEL', wheel.TEMPLATE),
+        ('top_level.txt', "".join(t + "\n" for t in top_level)),
+    ]
+    if script_module:
+        meta_files.append(('entry_points.txt', wheel.ENTRY_POINTS.format(
+            name=package.name, module=script_module)))
+
+    record = []
+    raw, tmp_path = _open_output(dist_dir, name)
+    try:
+        with raw, zipfile.ZipFile(raw, 'w', zipfile.ZIP_DEFLATED) as zf:
+            for src, arcname in files:
+                st = os.stat(src)
+                info = _zip_info(arcname, st.st_mtime, file_mode(src))
+                h = hashlib.sha256()
+                size = 0
+                with open(src, 'rb') as f, \
+                        zf.open(info, 'w', force_zip64=st.st_size > ZIP64_LIMIT) as out:
+                    for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                        h.update(chunk)
+                        out.write(chunk)
+                        size += len(chunk)
+                record.append((arcname, record_hash(h.digest()), str(size)))
+
+            for file_name, text in meta_files:
+                arcname = dist_info + '/' + file_name
+                data = text.encode('utf-8')
+                zf.writestr(_zip_info(arcname, newest), data)
+                record.append((arcname, record_hash(hashlib.sha256(data).digest()),
+                               str(len(data))))
+
+            record.append((dist_info + '/RECORD', '', ''))
+            zf.writestr(_zip_info(dist_info + '/RECORD', newest),
+                        "".join(",".join(r) + "\n" for r in record))
+    except Exception:
+        os.remove(tmp_path)
+        raise
+    return _finish_output(tmp_path, path)
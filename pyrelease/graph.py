@@ -0,0 +1,103 @@
+# coding=utf-8
+from __future__ import print_function, absolute_import
+import logging
+from concurrent.futures import wait, FIRST_COMPLETED
+
+logger = logging.getLogger('pyrelease')
+logger.setLevel(logging.DEBUG)
+
+
+class CycleError(Exception):
+    pass
+
+
+class SkippedError(Exception):
+    """Set as the error of a task that didn't run because one of its
+     dependencies failed."""
+    pass
+
+
+def toposort(dependencies):
+    """Returns the nodes of `dependencies` (a dict mapping each node to
+     the nodes it depends on) ordered so every node comes after its
+     dependencies. Ties keep the order of the dict.
+
+     Raises CycleError if the nodes depend on each other in a loop.
+     """
+    order = []
+    state = {}
+
+    def visit(node, path):
+        if state.get(node) == 'done':
+            return
+        if state.get(node) == 'visiting':
+            raise CycleError(" -> ".join(path + [node]))
+        state[node] = 'visiting'
+        for dep in dependencies.get(node, ()):
+            visit(dep, path + [node])
+        state[node] = 'done'
+        order.append(node)
+
+    for node in dependencies:
+        visit(node, [])
+    return order
+
+
+def run_graph(executor, tasks, dependencies=None, on_done=None):
+    """Runs each task in `tasks` (a dict mapping a name to a
+     `(function, args)` tuple) on `executor` as soon as all the tasks
+     it depends on have finished without error. Independent tasks run
+     at the same time.
+
+     `on_done(name, result, error)` is called in the calling thread as
+     each task finishes. If a task fails, the tasks depending on it are
+     skipped with a `SkippedError`.
+
+     Returns a `(results, errors)` tuple of dicts keyed on task name.
+     """
+    dependencies = dependencies or {}
+    waiting_on = dict((name, set(dependencies.get(name, ())) & set(tasks))
+                      for name in tasks)
+    toposort(waiting_on)
+
+    results = {}
+    errors = {}
+    running = {}
+
+    def finish(name, result, error):
+        if error is None:
+            results[name] = result
+        else:
+            errors[name] = error
+        if on_done is not None:
+            on_done(name, result, error)
+
+    def submit_ready():
+        # Loops as skipping one task can make its dependents skippable.
+        changed = True
+        while changed:
+            changed = False
+            for name in list(waiting_on):
+                deps = waiting_on[name]
+                failed = sorted(d for d in deps if d in errors)
+                if failed:
+                    del waiting_on[name]
+                    logger.warning("Skipping %s, %s failed.", name, ", ".join(failed))
+                    finish(name, None, SkippedError(", ".join(failed)))
+                    changed = True
+                elif not deps - set(results):
+                    del waiting_on[name]
+                    func, args = tasks[name]
+                    running[executor.submit(func, *args)] = name
+
+    submit_ready()
+    while running:
+        done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+        for future in done:
+            name = running.pop(future)
+            error = future.exception()
+            if error is not None:
+                logger.error("%s failed: %s", name, error)
+            finish(name, None if error else future.result(), error)
+        submit_ready()
+    return results, errors
@@ -4,9 +4,12 @@ import os
 import sys
 import re
 import ast
-import imp
+import types
+import tempfile
 import logging
 
+from pyrelease.source import get_source
+
 
 logger = logging.getLogger('pyrelease')
 logger.setLevel(logging.DEBUG)
@@ -20,6 +23,52 @@ class InvalidPackageName(Exception):
     pass
 
 
+class cached_property(object):
+    """Like `property`, but the value is worked out on first access and
+     then stored on the instance, so later lookups are plain attribute
+     lookups. Assigning to it replaces the value like any attribute.
+     """
+
+    def __init__(self, func):
+        self.func = func
+        self.__name__ = func.__name__
+        self.__doc__ = func.__doc__
+
+    def __get__(self, obj, cls):
+        if obj is None:
+            return self
+        value = obj.__dict__[self.__name__] = self.func(obj)
+        return value
+
+
+def cache_dir(*parts):
+    """Returns a path inside pyrelease's cache directory, which is
+     `$PYRELEASE_CACHE_DIR` if set, otherwise `pyrelease` in the user
+     cache directory. The directory itself is created if needed.
+     """
+    root = os.environ.get('PYRELEASE_CACHE_DIR')
+    if not root:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+        root = os.path.join(base, 'pyrelease')
+    if not os.path.isdir(root):
+        try:
+            os.makedirs(root)
+        except OSError:
+            pass
+    return os.path.join(root, *parts)
+
+
+def write_atomic(path, text):
+    """Writes text to path through a temporary file so readers never
+     see a half written file."""
+    fd, tmp_path = tempfile.mkstemp(
+        prefix=os.path.basename(path), suffix='.tmp',
+        dir=os.path.dirname(os.path.abspath(path)))
+    with os.fdopen(fd, 'w') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
 def find_package(what_to_package):
     """ Returns the path to the package file if found
      to be compatible with PyRelease.
@@ -68,20 +117,125 @@ def import_target_package(package_dir):
     logger.info("called with - %s - %s", name, package_dir)
     if name.endswith(".py"):
         name = name[:-3]
-    package_dir = os.path.abspath(os.path.dirname(package_dir))
+    path = os.path.abspath(package_dir)
+    package_dir = os.path.dirname(path)
+    is_package = name == '__init__'
+    if is_package:
+        # Import a package folder under its own name.
+        name = os.path.basename(package_dir)
+        package_dir = os.path.dirname(package_dir)
     logger.info("Importing module - %s -", name)
     logger.info("Importing module from dir - %s -", package_dir)
     sys.path.insert(0, package_dir)
     try:
-        mod = __import__(name)
-    except ImportError as e:
+        code = compile(get_source(path).tree, path, 'exec')
+    except (IOError, OSError, SyntaxError):
+        logger.warning(
+            "Error importing module %s", name)
+        return None
+
+    # Run the already parsed source rather than have the import
+    # machinery read and compile the file again.
+    mod = types.ModuleType(name)
+    mod.__file__ = path
+    if is_package:
+        mod.__path__ = [os.path.dirname(path)]
+        mod.__package__ = name
+    sys.modules[name] = mod
+    try:
+        exec(code, mod.__dict__)
+    except ImportError:
+        sys.modules.pop(name, None)
         logger.warning(
             "Error importing module %s", name)
         return None
+    except BaseException:
+        # Never leave a half run module behind for later imports.
+        sys.modules.pop(name, None)
+        raise
     else:
         return mod
 
 
+class StaticDefinition(object):
+    """A stand-in for a top level class or function found while parsing
+     a module. Only the name and docstring are kept.
+     """
+
+    def __init__(self, name, doc):
+        self.__name__ = name
+        self.__doc__ = doc
+
+    def __repr__(self):
+        return "<StaticDefinition(%s)>" % self.__name__
+
+
+class StaticModule(object):
+    """A stand-in for an imported module built by `parse_target_package`.
+
+     Module level assignments of literal values become attributes and
+     top level classes and functions become `StaticDefinition` objects,
+     so it can be used anywhere the imported module was used to look up
+     `__version__`, `__license__`, `__author__` and `__all__`.
+     """
+
+    def __init__(self, name, path, namespace):
+        self.__dict__.update(namespace)
+        self.__name__ = name
+        self.__file__ = path
+
+    def __repr__(self):
+        return "<StaticModule(%s)>" % self.__name__
+
+
+def _static_value(node, namespace):
+    """Returns the value of an assignment node if it can be worked out
+     without running any code, otherwise raises ValueError."""
+    if isinstance(node, ast.Name) and node.id in namespace:
+        return namespace[node.id]
+    return ast.literal_eval(node)
+
+
+def parse_target_package(target):
+    """Reads the module level metadata of the target file without
+     importing (and so executing) it. Returns a `StaticModule` or None
+     if the file couldn't be read or parsed.
+     """
+    name = os.path.basename(target)
+    if name.endswith(".py"):
+        name = name[:-3]
+    logger.info("Parsing module - %s -", name)
+    try:
+        tree = get_source(target).tree
+    except (IOError, OSError, SyntaxError, ValueError):
+        logger.warning("Error parsing module %s", name, exc_info=True)
+        return None
+
+    namespace = {'__doc__': ast.get_docstring(tree, clean=False)}
+    definitions = (ast.FunctionDef, ast.ClassDef,
+                   getattr(ast, 'AsyncFunctionDef', ast.FunctionDef))
+    for node in tree.body:
+        if isinstance(node, definitions):
+            namespace[node.name] = StaticDefinition(
+                node.name, ast.get_docstring(node, clean=False))
+            continue
+
+        if isinstance(node, ast.Assign):
+            targets = node.targets
+        elif isinstance(node, getattr(ast, 'AnnAssign', ())) and node.value:
+            targets = [node.target]
+        else:
+            continue
+        try:
+            value = _static_value(node.value, namespace)
+        except (ValueError, TypeError):
+            continue
+        for target_node in targets:
+            if isinstance(target_node, ast.Name):
+                namespace[target_node.id] = value
+    return StaticModule(name, os.path.abspath(target), namespace)
+
+
 def version_from_git():
     # TODO: Implement me!
     raise NotImplementedError
@@ -93,18 +247,15 @@ def migrate_source_attribute(attr, to_this, target_file, regex):
     new_file = []
     found = False
 
-    with open(target_file, 'r') as fp:
-        lines = fp.readlines()
-
-    for line in lines:
+    source = get_source(target_file)
+    for line in source.lines:
         if line.startswith(attr):
             found = True
             line = re.sub(change_this, to_this, line)
         new_file.append(line)
 
     if found:
-        with open(target_file, 'w') as fp:
-            fp.writelines(new_file)
+        source.write("".join(new_file))
 
 
 def migrate_author(target_file, new_author):
@@ -150,73 +301,75 @@ def get_name(path):
         return rv
 
 
+def normalize_name(name):
+    """Returns the PyPi normalized form of a package name, so that
+     'Py_YAML', 'py.yaml' and 'py-yaml' all compare equal."""
+    return re.sub(r'[-_.]+', '-', name).lower()
+
+
 def has_main_func(target):
-    """Looks for the text 'def main' in the target file and returns
-     True if found, else returns False
+    """Looks for a top level `main` function in the target file and
+     returns True if found, else returns False
      """
-    with open(target, 'r') as f:
-        if 'def main' in f.read():
+    try:
+        body = get_source(target).tree.body
+    except SyntaxError:
+        body = []
+    for node in body:
+        if isinstance(node, ast.FunctionDef) and node.name == 'main':
             logger.info("Package has a main function.")
             return True
-        else:
-            logger.info("Package does not have a main function.")
-            return False
+    logger.info("Package does not have a main function.")
+    return False
+
+
+def _imported_names(tree):
+    """Yields the top level name of every module imported at the top
+     level of the tree, skipping relative imports."""
+    for node in tree.body:
+        if type(node) is ast.Import:
+            for name in node.names:
+                yield name.name.split('.')[0]
+        if type(node) is ast.ImportFrom:
+            if node.level or not node.module:
+                continue
+            yield node.module.split('.')[0]
 
 
-def get_dependencies(target):
+def get_dependencies(target, index=None):
     """Try to find 3rd party dependencies in the past in .py file.
-     Some packages go by a different PyPi name so they are run through
-     a conversion first, if the dependency is found in the conversion
-     dict then it is swapped.
+     Each imported name is looked up in the distribution index, so
+     packages that go by a different PyPi name (yaml -> PyYAML) are
+     listed under the name they were installed with.
 
-     Conversion keys must be added manually here.
+     Imports from the standard library or from modules sitting next to
+     the target are skipped. Anything else that isn't installed is kept
+     under its import name.
 
      Returns a list of package names.
      """
+    if index is None:
+        # Imported here as depindex needs helpers.cache_dir
+        from pyrelease.depindex import load_index
+        index = load_index()
 
-    # So ast can import the target we must add it's
-    # directory to the system path.
-    abs_path = os.path.abspath(target)
-    sys.path.insert(0, abs_path)
-
-    module = ast.parse(open(target).read())
+    target_dir = os.path.dirname(os.path.abspath(target))
+    module = get_source(target).tree
     deps = []
-    for node in module.body:
-        if type(node) is ast.Import:
-            for name in node.names:
-                parts = imp.find_module(name.name.split('.')[0])
-                try:
-                    if 'site-package' in parts[1]:
-                        rv = name.name.split('.')[0]
-                        deps.append(rv)
-                        logger.info("Found dependency: %s", rv)
-                except TypeError:
-                    # Sometimes parts is None and throws a TyoeError
-                    # I think this is from __future__ imports, but
-                    # this fixes it from crashing anyways
-                    pass
-
-        if type(node) is ast.ImportFrom:
-            parts = imp.find_module(node.module.split('.')[0])
-            try:
-                if 'site-package' in parts[1]:
-                    rv = node.module.split('.')[0]
-                    deps.append(rv)
-                    logger.info("Found dependency: %s", rv)
-            except TypeError:
-                # This is passed for the same reason as above
-                pass
-    parsed_deps = []
-
-    # Some dependencies go by a different name than their PyPi
-    # counterparts. This is an easy way to convert known cases
-    # until something proves to work better.
-    conversions = dict(yaml='pyyaml')
-    for dep in deps:
-        converted = conversions.get(dep, None)
-        if converted is not None:
-            dep = converted
-        parsed_deps.append(dep)
-    if parsed_deps:
-        logger.info("Parsed dependencies. (%s)", ", ".join(parsed_deps))
-    return parsed_deps
+    for name in _imported_names(module):
+        if name == '__future__' or index.is_stdlib(name):
+            continue
+        rv = index.distribution(name)
+        if rv is None:
+            if os.path.exists(os.path.join(target_dir, name + '.py')) or \
+                    os.path.isdir(os.path.join(target_dir, name)):
+                continue
+            logger.warning("Dependency (%s) isn't installed, "
+                           "assuming it's PyPi name is the same.", name)
+            rv = name
+        if rv not in deps:
+            deps.append(rv)
+            logger.info("Found dependency: %s", rv)
+    if deps:
+        logger.info("Parsed dependencies. (%s)", ", ".join(deps))
+    return deps
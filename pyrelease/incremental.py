@@ -0,0 +1,99 @@
+# coding=utf-8
+from __future__ import print_function, absolute_import
+import os
+import json
+import hashlib
+import threading
+import logging
+
+from pyrelease.helpers import write_atomic
+
+logger = logging.getLogger('pyrelease')
+logger.setLevel(logging.DEBUG)
+
+# Kept in the build directory.
+RECORD_NAME = '.pyrelease-build.json'
+
+
+def text_digest(text):
+    """Returns the sha256 hex digest of a rendered file."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def stat_signature(path):
+    """Returns a (size, mtime) pair that changes whenever the file does,
+     without reading it. None if it doesn't exist."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_size, getattr(st, 'st_mtime_ns', st.st_mtime)]
+
+
+def tree_digest(paths):
+    """Returns a digest of the stat signatures of the given files and
+     of every file in the given directories."""
+    h = hashlib.sha256()
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    full = os.path.join(root, name)
+                    h.update(("%s=%r\0" % (full, stat_signature(full))).encode('utf-8'))
+        else:
+            h.update(("%s=%r\0" % (path, stat_signature(path))).encode('utf-8'))
+    return h.hexdigest()
+
+
+class BuildRecord(object):
+    """A manifest of what went into and came out of each build stage,
+     saved in the build directory.
+
+     For each stage it keeps a digest of the stage's inputs and the stat
+     signature of each file it wrote. A stage is fresh, and can be
+     skipped, when its inputs digest matches and its outputs are still
+     there, untouched.
+     """
+
+    def __init__(self, build_dir):
+        self.build_dir = build_dir
+        self.path = os.path.join(build_dir, RECORD_NAME)
+        self._lock = threading.Lock()
+        self.stages = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r') as f:
+                    self.stages = json.load(f)
+            except (IOError, OSError, ValueError):
+                logger.warning("Build record may be corrupted, rebuilding everything.")
+
+    def is_fresh(self, stage, inputs):
+        entry = self.stages.get(stage)
+        if entry is None or entry['inputs'] != inputs:
+            return False
+        for rel_path, signature in entry['outputs'].items():
+            if stat_signature(os.path.join(self.build_dir, rel_path)) != signature:
+                return False
+        return True
+
+    def outputs(self, stage):
+        """The paths of the files stage wrote last time it was recorded."""
+        entry = self.stages.get(stage)
+        if entry is None:
+            return []
+        return [os.path.join(self.build_dir, rel_path) for rel_path in entry['outputs']]
+
+    def record(self, stage, inputs, outputs):
+        """Saves the inputs digest of stage and the current signature of
+         each of its output files."""
+        entry = dict(inputs=inputs, outputs=dict(
+            (os.path.relpath(path, self.build_dir), stat_signature(path))
+            for path in outputs))
+        with self._lock:
+            self.stages[stage] = entry
+            write_atomic(self.path, json.dumps(self.stages, indent=1, sort_keys=True))
+
+    def forget(self, stage):
+        with self._lock:
+            self.stages.pop(stage, None)
@@ -0,0 +1,262 @@
+# coding=utf-8
+from __future__ import print_function, absolute_import
+import os
+import re
+import json
+import base64
+import hashlib
+import threading
+import logging
+from email import policy
+from email.parser import BytesParser
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from pyrelease.upload import normalize
+
+logger = logging.getLogger('pyrelease')
+logger.setLevel(logging.DEBUG)
+
+JSON_PATH = re.compile(r'^/pypi/([^/]+)/(?:([^/]+)/)?json$')
+SIMPLE_PATH = re.compile(r'^/simple/([^/]+)/$')
+FILE_PATH = re.compile(r'^/files/([^/]+)/([^/]+)$')
+
+
+class IndexRequestHandler(BaseHTTPRequestHandler):
+    """Handles legacy uploads to `/legacy/` and serves the json api,
+     the simple api and the uploaded files."""
+
+    server_version = 'pyrelease-index/1'
+    # Keep connections alive between requests, like a real index.
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        with self.server.lock:
+            self.server.connections += 1
+
+    def _send(self, status, body=b'', content_type='text/plain'):
+        if not isinstance(body, bytes):
+            body = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def _fail(self, status, reason):
+        # Reasons go in the status line, like PyPi's.
+        body = reason.encode('utf-8')
+        self.send_response(status, reason)
+        self.send_header('Content-Type', 'text/plain')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_HEAD(self):
+        self.do_GET()
+
+    def do_GET(self):
+        match = JSON_PATH.match(self.path)
+        if match is not None and self.server.json_api:
+            info = self.server.project_json(match.group(1), match.group(2))
+            if info is None:
+                self._send(404, 'Not Found')
+            else:
+                self._send(200, json.dumps(info), 'application/json')
+            return
+        match = SIMPLE_PATH.match(self.path)
+        if match is not None:
+            page = self.server.simple_page(match.group(1))
+            if page is None:
+                self._send(404, 'Not Found')
+            else:
+                self._send(200, page, 'text/html')
+            return
+        match = FILE_PATH.match(self.path)
+        if match is not None:
+            path = os.path.join(self.server.root, normalize(match.group(1)),
+                                os.path.basename(match.group(2)))
+            if os.path.isfile(path):
+                with open(path, 'rb') as f:
+                    self._send(200, f.read(), 'application/octet-stream')
+                return
+        self._send(404, 'Not Found')
+
+    def do_POST(self):
+        length = self.headers.get('Content-Length')
+        if length is None:
+            self._fail(411, 'Length Required')
+            return
+        data = self.rfile.read(int(length))
+        if self.path != '/legacy/':
+            self._fail(404, 'Not Found')
+            return
+        error = self._check_auth()
+        if error is not None:
+            self._fail(*error)
+            return
+        fields, upload = self._parse_form(data)
+        if fields.get(':action') != 'file_upload' or upload is None:
+            self._fail(400, 'Bad Request')
+            return
+        fault = self.server.next_fault()
+        if fault is not None and not fault[1]:
+            self._fail(fault[0], 'Service Unavailable')
+            return
+        status, reason = self.server.add_file(fields, upload[0], upload[1])
+        if fault is not None:
+            # Stored, but the client is told it failed.
+            self._fail(fault[0], 'Service Unavailable')
+        elif status == 200:
+            self._send(200, 'OK')
+        else:
+            self._fail(status, reason)
+
+    def _check_auth(self):
+        if self.server.users is None:
+            return None
+        header = self.headers.get('Authorization', '')
+        if not header.startswith('Basic '):
+            return 401, 'Unauthorized'
+        try:
+            user, _, password = base64.b64decode(
+                header[6:]).decode('utf-8').partition(':')
+        except ValueError:
+            return 401, 'Unauthorized'
+        if self.server.users.get(user) != password:
+            return 403, 'Invalid or non-existent authentication information.'
+        return None
+
+    def _parse_form(self, data):
+        message = BytesParser(policy=policy.HTTP).parsebytes(
+            b'Content-Type: ' + self.headers['Content-Type'].encode('latin-1') +
+            b'\r\n\r\n' + data)
+        fields = {}
+        upload = None
+        if not message.is_multipart():
+            return fields, upload
+        for part in message.iter_parts():
+            name = part.get_param('name', header='content-disposition')
+            filename = part.get_filename()
+            payload = part.get_payload(decode=True)
+            if filename is not None:
+                upload = (filename, payload)
+            else:
+                fields.setdefault(name, payload.decode('utf-8'))
+        return fields, upload
+
+    def log_message(self, format, *args):
+        logger.debug("index server: " + format, *args)
+
+
+class IndexServer(ThreadingHTTPServer):
+    """A small stand-in for PyPi, to test uploads against without
+     touching a real index. It takes legacy uploads at `/legacy/`,
+     refusing files it already has with a 400 like PyPi does, and serves
+     `/pypi/<name>/json`, `/pypi/<name>/<version>/json` and
+     `/simple/<name>/` for what's been uploaded.
+
+     Files are kept in root. If users, a dict of username to password,
+     is given uploads must log in as one of them. Without json_api it
+     only has the simple api.
+     """
+
+    daemon_threads = True
+
+    def __init__(self, address, root, users=None, json_api=True):
+        self.root = os.path.abspath(root)
+        self.users = users
+        # Turned off to act like an index with only the simple api.
+        self.json_api = json_api
+        self.lock = threading.Lock()
+        # Uploaded files by normalized project name, then version.
+        self.projects = {}
+        # How many connections and successful uploads there have been.
+        self.connections = 0
+        self.uploads = 0
+        # Failures to answer the next uploads with, see `fail_uploads`.
+        self.faults = []
+        if not os.path.isdir(self.root):
+            os.makedirs(self.root)
+        ThreadingHTTPServer.__init__(self, address, IndexRequestHandler)
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return "http://%s:%s" % (host, port)
+
+    @property
+    def upload_url(self):
+        return self.url + '/legacy/'
+
+    def fail_uploads(self, count, status=503, after_store=False):
+        """Makes the next count uploads fail with status, to test
+         retries. With after_store the files are kept anyway, like when
+         the response to a successful upload is lost."""
+        with self.lock:
+            self.faults.extend([(status, after_store)] * count)
+
+    def next_fault(self):
+        with self.lock:
+            return self.faults.pop(0) if self.faults else None
+
+    def add_file(self, fields, filename, content):
+        """Stores an uploaded file. Returns the `(status, reason)` to
+         reply with."""
+        name = fields.get('name')
+        version = fields.get('version')
+        if not name or not version or os.path.basename(filename) != filename:
+            return 400, 'Invalid upload.'
+        sha256 = hashlib.sha256(content).hexdigest()
+        if fields.get('sha256_digest', sha256) != sha256:
+            return 400, 'The digest supplied does not match a digest calculated from the uploaded file.'
+        project = normalize(name)
+        with self.lock:
+            releases = self.projects.setdefault(project, OrderedDict())
+            for files in releases.values():
+                if any(f['filename'] == filename for f in files):
+                    return 400, 'File already exists.'
+            folder = os.path.join(self.root, project)
+            if not os.path.isdir(folder):
+                os.makedirs(folder)
+            with open(os.path.join(folder, filename), 'wb') as f:
+                f.write(content)
+            releases.setdefault(version, []).append(OrderedDict([
+                ('filename', filename),
+                ('packagetype', fields.get('filetype')),
+                ('python_version', fields.get('pyversion')),
+                ('digests', OrderedDict([('md5', hashlib.md5(content).hexdigest()),
+                                         ('sha256', sha256)])),
+                ('size', len(content)),
+                ('url', '%s/files/%s/%s' % (self.url, project, filename)),
+            ]))
+            self.uploads += 1
+        return 200, 'OK'
+
+    def project_json(self, name, version=None):
+        """What the json api says about a project, or a version of it.
+         None if there is no such thing."""
+        with self.lock:
+            releases = self.projects.get(normalize(name))
+            if not releases or (version is not None and version not in releases):
+                return None
+            version = version or list(releases)[-1]
+            return OrderedDict([
+                ('info', OrderedDict([('name', name), ('version', version)])),
+                ('releases', OrderedDict((v, list(f)) for v, f in releases.items())),
+                ('urls', list(releases[version])),
+            ])
+
+    def simple_page(self, name):
+        """The simple api page of a project, or None."""
+        with self.lock:
+            releases = self.projects.get(normalize(name))
+            if not releases:
+                return None
+            links = ['<a href="%s#sha256=%s">%s</a><br/>' % (
+                f['url'], f['digests']['sha256'], f['filename'])
+                for files in releases.values() for f in files]
+        return ("<!DOCTYPE html>\n<html><body>\n%s\n</body></html>\n"
+                % "\n".join(links))
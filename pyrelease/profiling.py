@@ -0,0 +1,125 @@
+# coding=utf-8
+from __future__ import print_function, absolute_import
+import os
+import io
+import re
+import pstats
+import cProfile
+import threading
+import contextlib
+import tracemalloc
+import logging
+
+from pyrelease.tracing import Tracer
+
+logger = logging.getLogger('pyrelease')
+logger.setLevel(logging.DEBUG)
+
+# Allocations made by these don't tell us anything.
+SNAPSHOT_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>'),
+]
+
+
+def _file_name(name):
+    return re.sub(r'[^\w.-]+', '_', name).strip('_') or 'stage'
+
+
+class Profiler(Tracer):
+    """A `Tracer` that also runs each stage of a release under cProfile
+     and tracemalloc. Use it with `tracing.start_tracing`.
+
+     A stage is the outermost span on a thread, so a build stage run on
+     the stage pool is profiled on its own even though cProfile only
+     sees the thread it was started on. `finish` writes a `.prof` file
+     (open with pstats or snakeviz) and a tracemalloc `.snapshot` file
+     for each stage into `folder`.
+
+     tracemalloc is process wide, so the allocations of stages running
+     at the same time show up in each other's snapshots.
+     """
+
+    def __init__(self, folder, frames=1):
+        Tracer.__init__(self)
+        self.folder = folder
+        self.stats = {}
+        self.snapshots = {}
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        if not os.path.isdir(folder):
+            os.makedirs(folder)
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        self.first_snapshot = tracemalloc.take_snapshot()
+
+    @contextlib.contextmanager
+    def span(self, name, category='pyrelease', **args):
+        depth = getattr(self._local, 'depth', 0)
+        self._local.depth = depth + 1
+        profile = None
+        if depth == 0:
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:
+                # Python 3.12+ allows one profiler at a time.
+                logger.warning("Couldn't profile %s, another stage is profiled.", name)
+                profile = None
+        try:
+            with Tracer.span(self, name, category, **args):
+                yield
+        finally:
+            self._local.depth = depth
+            if profile is not None:
+                profile.disable()
+                self._add(name, profile)
+
+    def _add(self, name, profile):
+        snapshot = tracemalloc.take_snapshot()
+        with self._stats_lock:
+            if name in self.stats:
+                self.stats[name].add(profile)
+            else:
+                self.stats[name] = pstats.Stats(profile)
+            self.snapshots[name] = snapshot
+
+    def finish(self):
+        """Stops tracemalloc and writes the `.prof` and `.snapshot` file
+         of each stage. Returns the paths written."""
+        written = []
+        last = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        self.last_snapshot = last
+        with self._stats_lock:
+            for name, stats in sorted(self.stats.items()):
+                base = os.path.join(self.folder, _file_name(name))
+                stats.dump_stats(base + '.prof')
+                self.snapshots[name].filter_traces(SNAPSHOT_FILTERS).dump(
+                    base + '.snapshot')
+                written.extend([base + '.prof', base + '.snapshot'])
+        logger.info("Wrote %d profile files to - %s -", len(written), self.folder)
+        return written
+
+    def report(self, top=15):
+        """Returns the slowest functions by cumulative time over every
+         stage and the lines that allocated the most memory, as text.
+         Call after `finish`."""
+        out = io.StringIO()
+        with self._stats_lock:
+            stages = list(self.stats.values())
+        if stages:
+            total = pstats.Stats(stream=out)
+            for stats in stages:
+                total.add(stats)
+            out.write("Top %d functions by cumulative time\n" % top)
+            total.strip_dirs().sort_stats('cumulative').print_stats(top)
+
+        out.write("Top %d allocation sites\n" % top)
+        diffs = self.last_snapshot.filter_traces(SNAPSHOT_FILTERS).compare_to(
+            self.first_snapshot.filter_traces(SNAPSHOT_FILTERS), 'lineno')
+        for diff in diffs[:top]:
+            out.write("    %s\n" % diff)
+        return out.getvalue()
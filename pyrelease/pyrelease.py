@@ -1,17 +1,30 @@
 #!/usr/bin/env
 from __future__ import print_function, absolute_import
 import os
+import copy
 import json
+import atexit
+import weakref
 import logging
 
 from pyrelease.userdata import PyPiRc, GitConfig
 from pyrelease.helpers import find_package, \
     get_dependencies, get_name, import_target_package, \
-    has_main_func, InvalidPackage
+    parse_target_package, has_main_func, cached_property, InvalidPackage
+from pyrelease.tracing import span
 
 logger = logging.getLogger('pyrelease')
 logger.setLevel(logging.DEBUG)
 
+# Packages with cache records that haven't been saved yet.
+_UNSAVED = weakref.WeakSet()
+
+
+@atexit.register
+def _save_caches():
+    for package in list(_UNSAVED):
+        package.save_cache()
+
 
 class PyPackage(object):
     """ Given a source path and a build directory, this class will fetch
@@ -26,54 +39,142 @@ class PyPackage(object):
      Currently .gitconfig, .hgrc, and .pypirc files are
      the supported config files, but more can be added
      easily.
-     """
 
-    PACKAGE_FILES = {}
+     Package info is read from the source without running it. Set
+     `use_import` to import the target module instead, for packages
+     that build their metadata at import time.
+     """
 
-    def __init__(self, path, verbose=False):
+    def __init__(self, path, verbose=False, use_import=False, cache=None):
 
         # The relative path to the target file
-        self.target_file = find_package(path)
+        with span('find_package', category='analysis', path=path):
+            self.target_file = find_package(path)
         if self.target_file is None:
             raise InvalidPackage("Not a valid target.")
 
-        # The imported file.
-        self.module = import_target_package(self.resolved_path)
-        if self.module is None:
-            raise ImportError("Couldn't import the module.")
-
-        # The name of the package to be released
-        self.name = get_name(self.target_file)
+        # Import the target instead of parsing it.
+        self.use_import = use_import
 
-        # The version number as set in the __version__ variable
-        self.version = self.get_version()
+        # A `cache.MetadataCache` used to skip reading unchanged targets.
+        self.cache = cache
 
-        # The license the package will be released under.
-        self.license = self.get_license()
-
-        # The package description as taken from package info.
-        self.description = self.get_description()
-
-        # Returns a dict containing config file data, such as
-        # the .pypirc and .gitconfig data
-        self.user_info = self.get_user_info()
+        # Turns on third party library console messages
+        self.verbose = verbose
 
-        # The name of the developer or author of the release
-        self.author = self.get_author()
+        self.errors = None
 
-        # The authors email
-        self.author_email = self.get_author_email()
+        # The rendered package files, by name, as the builder makes them.
+        self.PACKAGE_FILES = {}
 
-        # A list of dependencies to to be added to requirements.txt
-        self.requirements = get_dependencies(self.target_file)
+    # The package info below is worked out the first time it's asked
+    # for, so callers only pay for what they use.
 
-        # Returns True if the target has a `main` function
-        self.is_script = has_main_func(self.target_file)
+    @cached_property
+    def module(self):
+        """The parsed (or imported) target module."""
+        rv = self.load_module()
+        if rv is None:
+            raise ImportError("Couldn't load the module.")
+        return rv
 
-        # Turns on third party library console messages
-        self.verbose = verbose
+    @cached_property
+    def name(self):
+        """The name of the package to be released"""
+        return self._cached('name', lambda: get_name(self.target_file))
+
+    @cached_property
+    def version(self):
+        """The version number as set in the __version__ variable"""
+        return self._cached('version', self.get_version)
+
+    @cached_property
+    def license(self):
+        """The license the package will be released under."""
+        return self._cached('license', self.get_license)
+
+    @cached_property
+    def description(self):
+        """The package description as taken from package info."""
+        return self._cached('description', self.get_description)
+
+    @cached_property
+    def user_info(self):
+        """A dict containing config file data, such as the .pypirc
+         and .gitconfig data"""
+        return self.get_user_info()
+
+    @cached_property
+    def author(self):
+        """The name of the developer or author of the release"""
+        return self._cached('author', self.get_author)
+
+    @cached_property
+    def author_email(self):
+        """The authors email"""
+        return self.get_author_email()
+
+    @cached_property
+    def requirements(self):
+        """A list of dependencies to to be added to requirements.txt"""
+        return self._cached(
+            'requirements', lambda: get_dependencies(self.target_file))
+
+    @cached_property
+    def is_script(self):
+        """True if the target has a `main` function"""
+        return self._cached(
+            'is_script', lambda: has_main_func(self.target_file))
+
+    @cached_property
+    def _cache_record(self):
+        """Package info saved by previous runs on the same source, or
+         None if there's no cache."""
+        if self.cache is None:
+            return None
+        with span('metadata cache', category='analysis'):
+            self._cache_key = self.cache.key(self.target_file, self.use_import)
+            rv = self.cache.get(self._cache_key)
+        if rv is not None:
+            logger.info("Loaded package info from cache.")
+        return rv or {}
+
+    def load_all(self):
+        """Works out all of the package info now, so threads sharing the
+         package later only read it."""
+        for field in ('module', 'name', 'version', 'license', 'description',
+                      'user_info', 'author', 'author_email', 'requirements',
+                      'is_script'):
+            getattr(self, field)
+
+    def _cached(self, field, compute):
+        """Returns field from the cache record, or computes it and adds
+         it to the record."""
+        record = self._cache_record
+        if record is not None and field in record:
+            return copy.deepcopy(record[field])
+        with span('analyse ' + field, category='analysis'):
+            rv = compute()
+        if record is not None:
+            record[field] = copy.deepcopy(rv)
+            # Saved once, when the last field is known or at exit,
+            # rather than rewriting the entry for every field.
+            self._cache_dirty = True
+            if all(f in record for f in self.cache.FIELDS):
+                self.save_cache()
+            else:
+                _UNSAVED.add(self)
+        return rv
 
-        self.errors = None
+    def save_cache(self):
+        """Writes the cache record if fields were added to it since it
+         was loaded. Done by itself once every field is known, and at
+         exit for the fields worked out so far."""
+        if not self.__dict__.get('_cache_dirty'):
+            return
+        self._cache_dirty = False
+        _UNSAVED.discard(self)
+        self.cache.set(self._cache_key, self._cache_record)
 
     def get_author(self):
         try:
@@ -132,6 +233,15 @@ class PyPackage(object):
         logger.info("Got user info (%s)", str(rv))
         return rv
 
+    def load_module(self):
+        """Returns the target module, statically parsed unless
+         `use_import` is set."""
+        if self.use_import:
+            with span('import module', category='analysis'):
+                return import_target_package(self.resolved_path)
+        with span('parse module', category='analysis'):
+            return parse_target_package(self.resolved_path)
+
     def get_version(self):
         try:
             ver = self.module.__version__
@@ -159,9 +269,14 @@ class PyPackage(object):
 
     @property
     def is_data_files(self):
-        """Returns True if there is a data folder in the resolved path
+        """Returns True if there is a data folder in the package dir
          """
-        return os.path.exists(os.path.join(self.resolved_path, 'data'))
+        return os.path.isdir(os.path.join(self.package_dir, 'data'))
+
+    @property
+    def package_dir(self):
+        """The directory the target file is in."""
+        return os.path.dirname(self.resolved_path)
 
     @property
     def is_single_file(self):
@@ -204,7 +319,7 @@ class PyPackage(object):
         self.user_info = self.get_user_info()
 
     def _update(self):
-        self.module = import_target_package(self.resolved_path)
+        self.module = self.load_module()
         self.update_user_info()
 
     def jsonize(self):
@@ -220,6 +335,8 @@ class PyPackage(object):
             author_email=self.author_email,
             requirements=self.requirements,
         )
+        # Everything that's usually needed is known by now.
+        self.save_cache()
         return rv
 
     def __str__(self):
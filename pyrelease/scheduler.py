@@ -0,0 +1,118 @@
+# coding=utf-8
+from __future__ import print_function, absolute_import
+import os
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+from pyrelease.graph import run_graph, toposort, SkippedError
+from pyrelease.helpers import normalize_name
+
+logger = logging.getLogger('pyrelease')
+logger.setLevel(logging.DEBUG)
+
+
+def build_release(target, info, build_dir, use_import=False, suppress=True,
+                  use_cache=True, remote_cache=None, commands=None):
+    """Builds a single release, the work done for each package by
+     `BuildScheduler`. `info` is the `PyPackage.jsonize` data of the
+     package in the parent process, so edits made there carry over.
+     `commands` replaces the Builder's default build commands if given.
+
+     This runs in the worker processes so it only returns plain data.
+     Raises RuntimeError if the build had errors.
+     """
+    from pyrelease.pyrelease import PyPackage
+    from pyrelease.builder import Builder
+    from pyrelease.cache import ArtifactCache, RemoteArtifactCache
+
+    package = PyPackage(target, use_import=use_import)
+    package.__dict__.update(info)
+    artifact_cache = None
+    if use_cache:
+        remote = RemoteArtifactCache(remote_cache) if remote_cache else None
+        artifact_cache = ArtifactCache(remote=remote)
+    builder = Builder(package, build_dir=build_dir, artifact_cache=artifact_cache)
+    if commands is not None:
+        builder.default_commands = dict(builds=list(commands))
+    builder.make_all()
+    builder.build_distros(suppress=suppress)
+    if builder.errors:
+        raise RuntimeError("; ".join(builder.errors))
+    return dict(name=package.name, build_dir=builder.build_dir)
+
+
+class BuildScheduler(object):
+    """Builds many `PyPackage` releases at once.
+
+     A package that requires another package in the set is built after
+     it, everything else is built at the same time on a pool of
+     `workers` processes (one per core by default). If a build fails the
+     packages requiring it are skipped.
+
+     Each release is built in `build_root` (the current directory by
+     default) in the usual `name.version` folder. Distributions are
+     reused from the artifact cache unless `use_cache` is False, and
+     shared through the `remote_cache` URL if given. `commands` replaces
+     the default build commands, it's passed to the workers rather than
+     set on `Builder` so it works however they are started.
+     """
+
+    def __init__(self, packages, workers=None, build_root=None, use_cache=True,
+                 remote_cache=None, commands=None):
+        self.packages = dict((normalize_name(p.name), p) for p in packages)
+        self.workers = workers
+        self.use_cache = use_cache
+        self.remote_cache = remote_cache
+        self.commands = commands
+        self.build_root = os.path.abspath(build_root or os.getcwd())
+
+    def dependencies(self):
+        """Returns a dict mapping each package to the packages in the set
+         it requires."""
+        rv = {}
+        for key, package in self.packages.items():
+            requires = set(normalize_name(r) for r in package.requirements)
+            rv[key] = sorted((requires & set(self.packages)) - {key})
+        return rv
+
+    def order(self):
+        """Returns the package names in an order they could be built in
+         one at a time. Raises `graph.CycleError` if packages require
+         each other in a loop."""
+        return [self.packages[k].name for k in toposort(self.dependencies())]
+
+    def build_dir(self, package):
+        return os.path.join(
+            self.build_root, "%s.%s" % (package.name, package.version))
+
+    def run(self, suppress=True, on_done=None):
+        """Builds every package and returns a dict mapping each package
+         name to its result, a dict with `build_dir` and `error` (None
+         if it was built)."""
+        if not os.path.isdir(self.build_root):
+            os.makedirs(self.build_root)
+
+        tasks = {}
+        for key, package in self.packages.items():
+            tasks[key] = (build_release, (
+                package.resolved_path, package.jsonize(),
+                self.build_dir(package), package.use_import, suppress,
+                self.use_cache, self.remote_cache, self.commands))
+
+        report = {}
+
+        def done(key, result, error):
+            package = self.packages[key]
+            if isinstance(error, SkippedError):
+                error = "Skipped, requires %s which failed." % error
+            elif error is not None:
+                error = str(error)
+            report[package.name] = dict(
+                build_dir=self.build_dir(package), error=error)
+            logger.info("Finished building %s - %s", package.name, error or "ok")
+            if on_done is not None:
+                on_done(package.name, error)
+
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            run_graph(pool, tasks, self.dependencies(), on_done=done)
+        return report
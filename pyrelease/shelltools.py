@@ -48,27 +48,29 @@ def ignore_stderr():
         os.close(old_stderr)
 
 
-def execute_shell_command(cmd, suppress=True, shell=True):
+def execute_shell_command(cmd, suppress=True, shell=True, cwd=None):
     """ Call subprocess on cmd and silence any exceptions to
      be sent to log for postmortem error handling
      """
     null_file = open(os.devnull, 'w')
     try:
         if suppress:
-            with ignore_stdout():
-                rv = subprocess.call(
-                    cmd,
-                    shell=shell,
-                    stdout=null_file,
-                    stderr=subprocess.STDOUT)
+            rv = subprocess.call(
+                cmd,
+                shell=shell,
+                cwd=cwd,
+                stdout=null_file,
+                stderr=subprocess.STDOUT)
         else:
-            rv = subprocess.call(cmd, shell=True)
+            rv = subprocess.call(cmd, shell=shell, cwd=cwd)
     except Exception as e:
         print("Error processing", str(cmd))
         print(e)
         return False
     else:
         return rv
+    finally:
+        null_file.close()
 
 
 # find('*.py', 'some/path/')
@@ -0,0 +1,136 @@
+# coding=utf-8
+from __future__ import print_function, absolute_import
+import os
+import io
+import ast
+import stat
+import tokenize
+import tempfile
+import logging
+
+
+logger = logging.getLogger('pyrelease')
+logger.setLevel(logging.DEBUG)
+
+# Parsed sources for this run, keyed on absolute path.
+_SOURCES = {}
+
+
+class SourceFile(object):
+    """The text of a python source file along with its syntax tree,
+     tokens and line offsets. The file is read once and everything
+     else is worked out from the text the first time it's needed.
+
+     Use `get_source` rather than creating these directly so that every
+     helper shares the same instance.
+     """
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        with open(self.path, 'r') as f:
+            text = f.read()
+        self._set_text(text)
+
+    def _set_text(self, text):
+        self.text = text
+        self._tree = None
+        self._syntax_error = None
+        self._tokens = None
+        self._line_offsets = None
+        self._stamp = _stamp(self.path)
+
+    @property
+    def lines(self):
+        """The source lines, line endings included."""
+        return self.text.splitlines(True)
+
+    @property
+    def tree(self):
+        """The parsed `ast.Module`, raises SyntaxError if the source
+         can't be parsed."""
+        if self._tree is None and self._syntax_error is None:
+            try:
+                self._tree = ast.parse(self.text, self.path)
+            except (SyntaxError, ValueError) as e:
+                self._syntax_error = e
+        if self._syntax_error is not None:
+            raise self._syntax_error
+        return self._tree
+
+    @property
+    def tokens(self):
+        """A list of `tokenize` tokens with their start and end positions."""
+        if self._tokens is None:
+            readline = io.StringIO(self.text).readline
+            self._tokens = list(tokenize.generate_tokens(readline))
+        return self._tokens
+
+    @property
+    def line_offsets(self):
+        """The character offset at which each line starts, so that
+         `line_offsets[row - 1] + col` of a tokenize position indexes
+         into `text`. For ast positions use `offset`."""
+        if self._line_offsets is None:
+            offsets = [0]
+            for line in self.lines:
+                offsets.append(offsets[-1] + len(line))
+            self._line_offsets = offsets
+        return self._line_offsets
+
+    def offset(self, lineno, col_offset=0):
+        """Converts an ast position into an offset into `text`. The ast
+         counts columns in utf-8 bytes, not characters."""
+        start = self.line_offsets[lineno - 1]
+        line = self.text[start:start + col_offset]
+        if line.isascii():
+            return start + col_offset
+        prefix = line.encode('utf-8')[:col_offset].decode('utf-8', 'ignore')
+        return start + len(prefix)
+
+    def is_stale(self):
+        """Returns True if the file changed on disk since it was read."""
+        return self._stamp != _stamp(self.path)
+
+    def write(self, text):
+        """Writes new text to the file and refreshes the parsed state.
+
+         The file is replaced rather than written in place, so if it's a
+         hard link the file it's linked to is left alone.
+         """
+        mode = stat.S_IMODE(os.stat(self.path).st_mode)
+        fd, tmp_path = tempfile.mkstemp(
+            prefix=os.path.basename(self.path), suffix='.tmp',
+            dir=os.path.dirname(self.path))
+        try:
+            with os.fdopen(fd, 'w') as f:
+                f.write(text)
+            os.chmod(tmp_path, mode)
+            os.replace(tmp_path, self.path)
+        except Exception:
+            os.remove(tmp_path)
+            raise
+        self._set_text(text)
+
+    def __repr__(self):
+        return "<SourceFile(%s)>" % self.path
+
+
+def _stamp(path):
+    st = os.stat(path)
+    return st.st_size, st.st_mtime
+
+
+def get_source(path):
+    """Returns the shared `SourceFile` for path, reading it only if
+     it hasn't been read yet this run or has changed since."""
+    key = os.path.abspath(path)
+    source = _SOURCES.get(key)
+    if source is None or source.is_stale():
+        logger.info("Reading source - %s -", key)
+        source = _SOURCES[key] = SourceFile(key)
+    return source
+
+
+def clear_sources():
+    """Forgets every source read so far."""
+    _SOURCES.clear()
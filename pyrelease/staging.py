@@ -0,0 +1,128 @@
+# coding=utf-8
+from __future__ import print_function, absolute_import
+import os
+import shutil
+import logging
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+
+logger = logging.getLogger('pyrelease')
+logger.setLevel(logging.DEBUG)
+
+# How files are put into the build dir, cheapest first.
+#  link: hard link, falling back to reflink.
+#  reflink: a copy on write clone or an in kernel copy, never shares the file.
+#  copy: a plain copy.
+STAGING_MODES = ('link', 'reflink', 'copy')
+
+# ioctl number of FICLONE on Linux.
+FICLONE = 0x40049409
+
+CHUNK_SIZE = 1 << 24
+
+
+def stage_file(src, dest, mode='link'):
+    """Puts a copy of src at dest as cheaply as `mode` allows (see
+     `STAGING_MODES`), replacing dest if it exists. Returns how it was
+     done: 'link', 'reflink', 'copy_file_range', 'sendfile' or 'copy',
+     or None if dest is src itself, like when building in the project
+     folder, in which case it's left alone.
+
+     A linked file is the same file as its source, so it must only ever
+     be replaced, never written to in place.
+     """
+    if mode not in STAGING_MODES:
+        raise ValueError("Unknown staging mode %r" % mode)
+    if os.path.lexists(dest):
+        if os.path.exists(dest) and os.path.samefile(src, dest) and \
+                os.path.realpath(src) == os.path.realpath(dest):
+            return None
+        # Writing into an earlier hard link would change the source.
+        os.remove(dest)
+
+    if mode == 'link':
+        try:
+            os.link(src, dest)
+            return 'link'
+        except (OSError, AttributeError):
+            pass
+
+    if mode == 'copy':
+        shutil.copy2(src, dest)
+        return 'copy'
+
+    with open(src, 'rb') as fsrc, open(dest, 'wb') as fdest:
+        how = _clone(fsrc, fdest) or _kernel_copy(fsrc, fdest)
+        if how is None:
+            shutil.copyfileobj(fsrc, fdest, CHUNK_SIZE)
+            how = 'copy'
+    shutil.copystat(src, dest)
+    return how
+
+
+def _clone(fsrc, fdest):
+    """Reflinks fsrc into fdest on filesystems that support it (btrfs,
+     xfs, ...). Returns 'reflink' or None."""
+    if fcntl is None:
+        return None
+    try:
+        fcntl.ioctl(fdest.fileno(), FICLONE, fsrc.fileno())
+    except (OSError, IOError):
+        return None
+    return 'reflink'
+
+
+def _kernel_copy(fsrc, fdest):
+    """Copies fsrc into fdest without passing the data through user
+     space. Returns the syscall used, or None if neither works here, in
+     which case nothing was written."""
+    size = os.fstat(fsrc.fileno()).st_size
+    for name in ('copy_file_range', 'sendfile'):
+        func = getattr(os, name, None)
+        if func is None:
+            continue
+        offset = 0
+        try:
+            while offset < size:
+                if name == 'copy_file_range':
+                    sent = func(fsrc.fileno(), fdest.fileno(), CHUNK_SIZE,
+                                offset, offset)
+                else:
+                    sent = func(fdest.fileno(), fsrc.fileno(), offset, CHUNK_SIZE)
+                if not sent:
+                    break
+                offset += sent
+        except OSError:
+            if offset:
+                # Part way through, start over with the next method.
+                fdest.truncate(0)
+                fdest.seek(0)
+            continue
+        return name
+    return None
+
+
+def stage_tree(src, dest, mode='link'):
+    """Stages every file under the src folder into dest, like
+     `shutil.copytree(src, dest, dirs_exist_ok=True)`. Returns the paths
+     of the staged files, leaving out any that are the source file."""
+    staged = []
+    counts = {}
+    for root, dirs, files in os.walk(src):
+        dirs.sort()
+        target_root = os.path.join(dest, os.path.relpath(root, src))
+        if not os.path.isdir(target_root):
+            os.makedirs(target_root)
+        for name in sorted(files):
+            target = os.path.join(target_root, name)
+            how = stage_file(os.path.join(root, name), target, mode)
+            if how is None:
+                continue
+            counts[how] = counts.get(how, 0) + 1
+            staged.append(target)
+    logger.info("Staged %s into %s - %s", src, dest, counts)
+    return staged
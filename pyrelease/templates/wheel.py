@@ -0,0 +1,12 @@
+TEMPLATE = """\
+Wheel-Version: 1.0
+Generator: pyrelease
+Root-Is-Purelib: true
+Tag: py2-none-any
+Tag: py3-none-any
+"""
+
+ENTRY_POINTS = """\
+[console_scripts]
+{name} = {module}:main
+"""
@@ -0,0 +1,140 @@
+# coding=utf-8
+from __future__ import print_function, absolute_import
+import os
+import json
+import time
+import functools
+import threading
+import contextlib
+import logging
+
+logger = logging.getLogger('pyrelease')
+logger.setLevel(logging.DEBUG)
+
+# The tracer spans are recorded into, None when tracing is off.
+_TRACER = None
+
+
+class Tracer(object):
+    """Records timed spans of a release, like each build stage, and
+     turns them into Chrome trace-event json (open it in
+     chrome://tracing or ui.perfetto.dev) or a summary table.
+
+     Spans can be recorded from any thread, each shows up on its own
+     track in the trace.
+     """
+
+    def __init__(self):
+        self.events = []
+        self.pid = os.getpid()
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def span(self, name, category='pyrelease', **args):
+        """Context manager timing its body as a span called name. Extra
+         keyword arguments are shown with the span in the trace."""
+        start = time.perf_counter()
+        error = None
+        try:
+            yield
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            end = time.perf_counter()
+            if error is not None:
+                args['error'] = repr(error)
+            event = dict(
+                name=name, cat=category, ph='X', pid=self.pid,
+                tid=threading.current_thread().ident,
+                ts=(start - self._origin) * 1e6, dur=(end - start) * 1e6,
+                args=dict((k, str(v)) for k, v in args.items()))
+            with self._lock:
+                self.events.append(event)
+
+    def chrome_trace(self):
+        """Returns the spans as a Chrome trace-event dict."""
+        with self._lock:
+            events = sorted(self.events, key=lambda e: e['ts'])
+        threads = sorted(set(e['tid'] for e in events))
+        meta = [dict(name='thread_name', ph='M', pid=self.pid, tid=tid,
+                     args=dict(name="thread %d" % i))
+                for i, tid in enumerate(threads)]
+        return dict(traceEvents=meta + events, displayTimeUnit='ms')
+
+    def write(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.chrome_trace(), f)
+        logger.info("Wrote trace - %s -", path)
+
+    def summary(self):
+        """Returns a list of `(name, count, total, longest)` rows, times
+         in seconds, slowest total first."""
+        rows = {}
+        with self._lock:
+            for e in self.events:
+                count, total, longest = rows.get(e['name'], (0, 0.0, 0.0))
+                dur = e['dur'] / 1e6
+                rows[e['name']] = (count + 1, total + dur, max(longest, dur))
+        return sorted(((name,) + row for name, row in rows.items()),
+                      key=lambda r: -r[2])
+
+    def summary_text(self):
+        """Returns the summary as a table to print."""
+        rows = self.summary()
+        width = max([len(r[0]) for r in rows] + [4])
+        lines = ["%-*s %6s %10s %10s" % (width, "span", "count", "total s", "max s")]
+        for name, count, total, longest in rows:
+            lines.append("%-*s %6d %10.3f %10.3f" % (width, name, count, total, longest))
+        return "\n".join(lines)
+
+
+def start_tracing(tracer=None):
+    """Starts recording spans into tracer, a new `Tracer` by default.
+     Returns the tracer."""
+    global _TRACER
+    _TRACER = tracer or Tracer()
+    return _TRACER
+
+
+def stop_tracing():
+    """Stops recording spans. Returns the `Tracer`, or None."""
+    global _TRACER
+    rv, _TRACER = _TRACER, None
+    return rv
+
+
+def span(name, category='pyrelease', **args):
+    """Times its body as a span in the current trace. Does nothing when
+     tracing is off.
+
+        with span('build_readme', category='stage'):
+            ...
+     """
+    if _TRACER is None:
+        return _NO_SPAN
+    return _TRACER.span(name, category, **args)
+
+
+def traced(name=None, category='pyrelease'):
+    """Decorator timing each call of a function as a span, named after
+     the function unless name is given."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name or func.__name__, category):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class _NoSpan(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NO_SPAN = _NoSpan()
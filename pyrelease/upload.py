@@ -0,0 +1,484 @@
+# coding=utf-8
+from __future__ import print_function, absolute_import
+import os
+import re
+import json
+import time
+import uuid
+import random
+import base64
+import hashlib
+import threading
+import logging
+from collections import namedtuple
+
+import http.client
+from urllib.parse import urlsplit, unquote
+
+from pyrelease.compat import configparser, urlopen, HTTPError, URLError
+from pyrelease.helpers import write_atomic
+from pyrelease.templates import pkg_info
+
+logger = logging.getLogger('pyrelease')
+logger.setLevel(logging.DEBUG)
+
+CHUNK_SIZE = 1 << 16
+
+# The upload endpoints of the indexes, used when .pypirc doesn't say.
+DEFAULT_REPOSITORIES = {
+    'pypi': 'https://upload.pypi.org/legacy/',
+    'testpypi': 'https://test.pypi.org/legacy/',
+}
+
+# Where the json api of the indexes is, by upload url. Other indexes are
+# assumed to have it next to their upload url, see `index_url`.
+INDEX_URLS = {
+    DEFAULT_REPOSITORIES['pypi']: 'https://pypi.org',
+    DEFAULT_REPOSITORIES['testpypi']: 'https://test.pypi.org',
+}
+
+# Old upload urls, as written by the .pypirc template, which the indexes
+# have since moved away from.
+LEGACY_REPOSITORIES = {
+    'https://pypi.python.org/pypi': DEFAULT_REPOSITORIES['pypi'],
+    'https://testpypi.python.org/pypi': DEFAULT_REPOSITORIES['testpypi'],
+}
+
+# Raised by a kept alive connection the server has since closed.
+STALE_CONNECTION_ERRORS = (
+    http.client.BadStatusLine, http.client.CannotSendRequest, IOError, OSError)
+
+# Responses worth trying again, the index or a proxy in front of it was
+# briefly unavailable.
+RETRY_STATUSES = (408, 429, 500, 502, 503, 504)
+
+# Kept in the build directory, see `UploadJournal`.
+JOURNAL_NAME = '.pyrelease-uploads.json'
+
+HREF = re.compile(r'href="([^"#]+)')
+
+# What `version_exists` found out, kept for the rest of the session.
+_VERSIONS = {}
+_VERSIONS_LOCK = threading.Lock()
+
+
+class UploadResult(namedtuple('UploadResult', 'path status reason skipped')):
+    """The outcome of uploading one file. `status` is the HTTP status
+     code, or None when the request failed before one came back, in
+     which case reason holds the error. `skipped` is set when the index
+     already had the file."""
+
+    __slots__ = ()
+
+    def __new__(cls, path, status, reason, skipped=False):
+        return super(UploadResult, cls).__new__(cls, path, status, reason, skipped)
+
+    @property
+    def ok(self):
+        return self.skipped or (self.status is not None and 200 <= self.status < 300)
+
+
+def backoff_delay(attempt, base=0.5, cap=30.0, rng=random):
+    """Returns how long to wait before retry number attempt (from 0), a
+     random time up to `base * 2 ** attempt` seconds, but no more than
+     cap. The randomness keeps clients that failed together from
+     retrying together."""
+    return rng.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def dist_type(path):
+    """Returns the `(filetype, pyversion)` the index wants for a
+     distribution file."""
+    name = os.path.basename(path)
+    if name.endswith('.whl'):
+        # name-version(-build)-python-abi-platform.whl
+        return 'bdist_wheel', name[:-4].split('-')[-3]
+    if name.endswith(('.tar.gz', '.zip')):
+        return 'sdist', 'source'
+    raise ValueError("Don't know how to upload %s" % name)
+
+
+def repository_config(name, path='~/.pypirc'):
+    """Returns the upload `url`, `username` and `password` of a
+     repository section of a .pypirc, None for whatever isn't set. The
+     url of pypi and testpypi defaults to theirs."""
+    parser = configparser.RawConfigParser()
+    parser.read(os.path.expanduser(path))
+
+    def get(option):
+        if parser.has_option(name, option):
+            return parser.get(name, option).strip() or None
+        return None
+
+    url = get('repository') or DEFAULT_REPOSITORIES.get(name)
+    url = LEGACY_REPOSITORIES.get((url or '').rstrip('/'), url)
+    return dict(url=url, username=get('username'), password=get('password'))
+
+
+def pypirc_repositories(path='~/.pypirc'):
+    """Returns the names of the repositories listed under index-servers
+     in the [distutils] section of a .pypirc."""
+    parser = configparser.RawConfigParser()
+    parser.read(os.path.expanduser(path))
+    if not parser.has_option('distutils', 'index-servers'):
+        return []
+    return parser.get('distutils', 'index-servers').split()
+
+
+def index_url(upload_url):
+    """Returns the base url of the json api of the index an upload url
+     belongs to."""
+    if upload_url in INDEX_URLS:
+        return INDEX_URLS[upload_url]
+    url = upload_url.rstrip('/')
+    if url.endswith('/legacy'):
+        url = url[:-len('/legacy')]
+    return url
+
+
+def uploaded_files(index, name, version, timeout=10):
+    """Asks the json api of an index which files a version of a project
+     has. Returns a dict mapping their file names to sha256 digests,
+     empty if there's no such version, or None if the index couldn't
+     say."""
+    url = "%s/pypi/%s/%s/json" % (index.rstrip('/'), name, version)
+    try:
+        response = urlopen(url, timeout=timeout)
+        try:
+            info = json.loads(response.read().decode('utf-8'))
+        finally:
+            response.close()
+    except HTTPError as e:
+        if e.code == 404:
+            return {}
+        logger.warning("Couldn't list the files of %s %s - %s", name, version, e)
+        return None
+    except (URLError, IOError, OSError, ValueError) as e:
+        logger.warning("Couldn't list the files of %s %s - %s", name, version, e)
+        return None
+    return dict((f['filename'], f.get('digests', {}).get('sha256'))
+                for f in info.get('urls', []))
+
+
+def normalize(name):
+    """The PEP 503 normalized form of a project name."""
+    return re.sub(r'[-_.]+', '-', name).lower()
+
+
+def file_version(filename):
+    """Returns the version in a distribution file name, or None."""
+    for ext in ('.whl', '.tar.gz', '.zip'):
+        if filename.endswith(ext):
+            stem = filename[:-len(ext)]
+            if ext == '.whl':
+                parts = stem.split('-')
+                return parts[1] if len(parts) >= 5 else None
+            return stem.rpartition('-')[2] or None
+    return None
+
+
+def simple_files(index, name, timeout=10):
+    """Returns the file names the simple api of an index lists for a
+     project, empty if there's no such project, or None if the index
+     couldn't say."""
+    url = "%s/simple/%s/" % (index.rstrip('/'), normalize(name))
+    try:
+        response = urlopen(url, timeout=timeout)
+        try:
+            page = response.read().decode('utf-8')
+        finally:
+            response.close()
+    except HTTPError as e:
+        if e.code == 404:
+            return []
+        logger.warning("Couldn't list the files of %s - %s", name, e)
+        return None
+    except (URLError, IOError, OSError, ValueError) as e:
+        logger.warning("Couldn't list the files of %s - %s", name, e)
+        return None
+    return [unquote(href.rstrip('/').rsplit('/', 1)[-1]) for href in HREF.findall(page)]
+
+
+def version_exists(index, name, version, timeout=10):
+    """Asks an index whether it already has a version of a project,
+     through the json api, or the simple api for indexes without one.
+     Returns True or False, or None if the index couldn't be reached.
+
+     Answers are kept for the rest of the session, see
+     `clear_version_cache`.
+     """
+    key = (index.rstrip('/'), normalize(name), str(version))
+    with _VERSIONS_LOCK:
+        if key in _VERSIONS:
+            return _VERSIONS[key]
+    files = uploaded_files(index, name, version, timeout)
+    if files:
+        exists = True
+    else:
+        # Not found by the json api, or there isn't one.
+        listing = simple_files(index, name, timeout)
+        if listing is None:
+            exists = False if files is not None else None
+        else:
+            exists = any(file_version(f) == str(version) for f in listing)
+    if exists is not None:
+        with _VERSIONS_LOCK:
+            _VERSIONS[key] = exists
+    return exists
+
+
+def clear_version_cache():
+    """Forgets what `version_exists` found out, say after an upload."""
+    with _VERSIONS_LOCK:
+        _VERSIONS.clear()
+
+
+def file_digests(path):
+    """Returns the md5 and sha256 hex digests of a file, read in chunks."""
+    md5 = hashlib.md5()
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            md5.update(chunk)
+            sha256.update(chunk)
+    return md5.hexdigest(), sha256.hexdigest()
+
+
+def metadata_fields(package, long_description=""):
+    """Returns the core metadata of a package as the `(name, value)`
+     form fields of an upload, the same metadata as `metadata_text`."""
+    fields = [
+        ('metadata_version', '2.1'),
+        ('name', package.name),
+        ('version', str(package.version)),
+        ('summary', " ".join((package.description or "").split())),
+        ('home_page', package.url or ""),
+        ('author', package.author or ""),
+        ('author_email', package.author_email or ""),
+        ('license', package.license or ""),
+        ('description', long_description),
+        ('description_content_type', 'text/x-rst'),
+    ]
+    fields.extend(('classifiers', c) for c in pkg_info.CLASSIFIERS)
+    fields.extend(('requires_dist', r) for r in package.requirements)
+    return fields
+
+
+class MultipartBody(object):
+    """A multipart/form-data body of form fields and one file, which is
+     read from disk in chunks as the body is sent rather than loaded up
+     front. Its length is known in advance so it can be sent with a
+     Content-Length."""
+
+    def __init__(self, fields, file_field, path, boundary=None):
+        self.boundary = boundary or uuid.uuid4().hex
+        self.path = path
+        parts = []
+        for name, value in fields:
+            parts.append(self._part_header(name) + value.encode('utf-8') + b'\r\n')
+        self.head = b''.join(parts) + self._part_header(
+            file_field, os.path.basename(path))
+        self.tail = ('\r\n--%s--\r\n' % self.boundary).encode('ascii')
+
+    def _part_header(self, name, filename=None):
+        disposition = 'form-data; name="%s"' % name
+        if filename is not None:
+            disposition += '; filename="%s"' % filename
+        header = '--%s\r\nContent-Disposition: %s\r\n' % (self.boundary, disposition)
+        if filename is not None:
+            header += 'Content-Type: application/octet-stream\r\n'
+        return (header + '\r\n').encode('utf-8')
+
+    @property
+    def content_type(self):
+        return 'multipart/form-data; boundary=%s' % self.boundary
+
+    def __len__(self):
+        return len(self.head) + os.path.getsize(self.path) + len(self.tail)
+
+    def __iter__(self):
+        yield self.head
+        with open(self.path, 'rb') as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                yield chunk
+        yield self.tail
+
+
+class Uploader(object):
+    """Uploads distribution files to a package index with the legacy
+     upload API that PyPi and twine use.
+
+     Every file goes over the same kept alive connection, so there's one
+     TCP and TLS handshake per upload run however many files there are.
+     Call `close` when done, or use it as a context manager.
+     """
+
+    def __init__(self, url, username=None, password=None, timeout=60,
+                 retries=3, backoff=0.5, max_backoff=30.0):
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https'):
+            raise ValueError("Can only upload to http(s) urls, not %r" % url)
+        self.url = url
+        self.scheme = parts.scheme
+        self.host = parts.hostname
+        self.port = parts.port
+        self.path = parts.path or '/'
+        self.username = username
+        self.password = password
+        self.timeout = timeout
+        # Failed requests and `RETRY_STATUSES` are tried again up to
+        # retries times, waiting `backoff_delay` in between.
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.connection = None
+        # How many connections were opened, to check reuse.
+        self.connects = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+    def connect(self):
+        if self.connection is None:
+            cls = (http.client.HTTPSConnection if self.scheme == 'https'
+                   else http.client.HTTPConnection)
+            self.connection = cls(self.host, self.port, timeout=self.timeout)
+            self.connects += 1
+        return self.connection
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def headers(self, body):
+        headers = {
+            'Content-Type': body.content_type,
+            'Content-Length': str(len(body)),
+            'User-Agent': 'pyrelease',
+        }
+        if self.username is not None:
+            token = ('%s:%s' % (self.username, self.password or '')).encode('utf-8')
+            headers['Authorization'] = 'Basic ' + base64.b64encode(token).decode('ascii')
+        return headers
+
+    def upload_file(self, path, metadata, digests=None):
+        """Uploads one distribution file with the `metadata_fields` of
+         its package, retrying if the index is briefly unavailable.
+         digests are the file's `file_digests`, if already known.
+         Returns an `UploadResult`."""
+        filetype, pyversion = dist_type(path)
+        md5, sha256 = digests or file_digests(path)
+        fields = [(':action', 'file_upload'), ('protocol_version', '1')]
+        fields.extend(metadata)
+        fields.extend([('filetype', filetype), ('pyversion', pyversion),
+                       ('md5_digest', md5), ('sha256_digest', sha256)])
+        body = MultipartBody(fields, 'content', path)
+
+        attempt = 0
+        while True:
+            status, reason, retry_after = self._send(body, path)
+            if attempt >= self.retries or \
+                    (status is not None and status not in RETRY_STATUSES):
+                break
+            delay = backoff_delay(attempt, self.backoff, self.max_backoff)
+            if retry_after is not None:
+                delay = min(max(delay, retry_after), self.max_backoff)
+            attempt += 1
+            logger.warning("Uploading %s failed (%s %s), retry %d of %d in %.1fs",
+                           os.path.basename(path), status, reason, attempt,
+                           self.retries, delay)
+            time.sleep(delay)
+        logger.info("Upload of %s - %s %s", os.path.basename(path), status, reason)
+        return UploadResult(path, status, reason)
+
+    def _send(self, body, path):
+        """Posts body once. Returns the status, reason and Retry-After
+         seconds of the response, or None, the error and None."""
+        reused = self.connection is not None
+        try:
+            try:
+                return self._post(body)
+            except STALE_CONNECTION_ERRORS:
+                if not reused:
+                    raise
+                # The server may have dropped the kept alive connection
+                # between files, try once more on a fresh one.
+                self.close()
+                return self._post(body)
+        except STALE_CONNECTION_ERRORS as e:
+            self.close()
+            logger.error("Uploading %s failed - %s", path, e)
+            return None, str(e), None
+
+    def _post(self, body):
+        connection = self.connect()
+        connection.putrequest('POST', self.path, skip_accept_encoding=True)
+        for key, value in self.headers(body).items():
+            connection.putheader(key, value)
+        connection.endheaders()
+        for chunk in body:
+            connection.send(chunk)
+        response = connection.getresponse()
+        # The body has to be read before the connection can be reused.
+        response.read()
+        if response.will_close:
+            self.close()
+        retry_after = response.getheader('Retry-After')
+        try:
+            retry_after = float(retry_after) if retry_after else None
+        except ValueError:
+            # An http date, just use the backoff.
+            retry_after = None
+        return response.status, response.reason, retry_after
+
+    def upload(self, paths, metadata):
+        """Uploads each file in paths in turn, returning a list of
+         `UploadResult`."""
+        return [self.upload_file(path, metadata) for path in paths]
+
+
+class UploadJournal(object):
+    """Remembers which files have been uploaded to which repository, in
+     a json file, so an upload that was interrupted can carry on with
+     just the files that are missing.
+
+     Files are matched on their sha256, so a file rebuilt with different
+     contents counts as not uploaded.
+     """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        # {repository url: {file name: sha256}}
+        self.uploads = {}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r') as f:
+                    self.uploads = json.load(f)
+            except (IOError, OSError, ValueError):
+                logger.warning("Upload journal may be corrupted, ignoring it.")
+
+    def is_uploaded(self, url, path, sha256):
+        return self.uploads.get(url, {}).get(os.path.basename(path)) == sha256
+
+    def record(self, url, path, sha256):
+        with self._lock:
+            self.uploads.setdefault(url, {})[os.path.basename(path)] = sha256
+            write_atomic(self.path, json.dumps(self.uploads, indent=1, sort_keys=True))
+
+
+def dist_files(dist_dir):
+    """Returns the uploadable files in a dist folder, sdists first."""
+    rv = []
+    for name in sorted(os.listdir(dist_dir)):
+        try:
+            filetype = dist_type(name)[0]
+        except ValueError:
+            continue
+        rv.append((filetype != 'sdist', os.path.join(dist_dir, name)))
+    return [path for _, path in sorted(rv)]
@@ -30,10 +30,15 @@ setup(
               'pyrelease.licenses',
               'pyrelease.templates'],
     install_requires=install_requires,
+    python_requires='>=3.8',
     entry_points={
         'console_scripts': [
             'pyrelease=pyrelease.cli:main',
             'pyrelease-cli=pyrelease.cli:main',
+            'pyrelease-batch=pyrelease.cli:batch',
+            'pyrelease-cache-server=pyrelease.cli:cache_server',
+            'pyrelease-index-server=pyrelease.cli:index_server',
+            'pyrelease-bench=pyrelease.cli:bench',
         ],
     },
 )
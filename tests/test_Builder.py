@@ -1,10 +1,12 @@
 from __future__ import print_function
 import os
+import sys
 import unittest
 import shutil
 
 from pyrelease.builder import Builder
 from pyrelease.pyrelease import PyPackage
+from tmpcache import setUpModule, tearDownModule
 
 
 class TestBuilder(unittest.TestCase):
@@ -84,3 +86,49 @@ class TestBuilder(unittest.TestCase):
         self.assertTrue(os.path.isfile(os.path.join(path, 'LICENSE.md')))
         self.assertTrue(os.path.isfile(os.path.join(path, 'requirements.txt')))
         self.assertTrue(os.path.isfile(os.path.join(path, 'base_test.py')))
+
+    def test_stage_errors(self):
+        def broken():
+            raise ValueError("broken readme")
+        self.builder.build_readme = broken
+        self.builder.make_all()
+        path = self.builder.build_dir
+        self.assertEqual(sorted(self.builder.stage_errors), ['readme', 'setup'])
+        self.assertEqual(len(self.builder.errors), 2)
+        self.assertFalse(os.path.isfile(os.path.join(path, 'setup.py')))
+        self.assertTrue(os.path.isfile(os.path.join(path, 'LICENSE.md')))
+        self.assertTrue(os.path.isfile(os.path.join(path, 'base_test.py')))
+
+    def test_concurrent_distros(self):
+        # Both commands write build/out, which would collide if they ran
+        # in the same folder.
+        script = ("import os, time; os.makedirs('build'); os.makedirs('dist'); "
+                  "open('build/out', 'x').close(); time.sleep(0.2); "
+                  "open(os.path.join('dist', '{0}'), 'w').write(open('setup.py').read())")
+        self.builder.default_commands = dict(builds=[
+            '"%s" -c "%s"' % (sys.executable, script.format(name))
+            for name in ('one', 'two')])
+        self.builder.make_all()
+        self.builder.build_distros(suppress=True)
+        self.assertEqual(self.builder.errors, [])
+        self.assertEqual(sorted(os.listdir(self.builder.dist_dir)), ['one', 'two'])
+        leftovers = [n for n in os.listdir(self.builder.build_dir)
+                     if n.startswith('.scratch-') or n == 'build']
+        self.assertEqual(leftovers, [])
+
+    def test_incremental(self):
+        self.builder.make_all()
+        readme = os.path.join(self.builder.build_dir, 'README.rst')
+        license_md = os.path.join(self.builder.build_dir, 'LICENSE.md')
+        mtime = os.stat(readme).st_mtime_ns
+
+        builder = Builder(package=self.package, incremental=True)
+        builder.make_all()
+        self.assertEqual(os.stat(readme).st_mtime_ns, mtime)
+
+        self.package.description = "A new description"
+        os.remove(license_md)
+        builder.make_all()
+        self.assertTrue(os.path.isfile(license_md))
+        with open(readme) as f:
+            self.assertIn("A new description", f.read())
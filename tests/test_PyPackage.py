@@ -4,6 +4,7 @@ import unittest
 
 
 from pyrelease.pyrelease import PyPackage
+from tmpcache import setUpModule, tearDownModule
 
 
 class TestPyPackageWithMeta(unittest.TestCase):
@@ -84,3 +85,52 @@ class TestPyPackageNoMeta(unittest.TestCase):
 
     def test_requirements(self):
         self.assertEqual(self.package_no_meta.requirements, [])
+
+
+class TestPyPackageUseImport(unittest.TestCase):
+    def setUp(self):
+        self.scriptDir = os.path.abspath(os.path.dirname(__file__))
+        self.testDataDir = os.path.join(self.scriptDir, 'testcases')
+        self.target = os.path.join(self.testDataDir, "base_test.py")
+
+    def test_static_by_default(self):
+        package = PyPackage(self.target)
+        self.assertFalse(package.use_import)
+        self.assertEqual(type(package.module).__name__, "StaticModule")
+
+    def test_matches_static(self):
+        imported = PyPackage(self.target, use_import=True)
+        parsed = PyPackage(self.target)
+        self.assertEqual(imported.jsonize(), parsed.jsonize())
+
+
+class TestPyPackageLazy(unittest.TestCase):
+    def setUp(self):
+        self.scriptDir = os.path.abspath(os.path.dirname(__file__))
+        self.testDataDir = os.path.join(self.scriptDir, 'testcases')
+        self.package = PyPackage(os.path.join(self.testDataDir, "base_test.py"))
+
+    def test_nothing_computed(self):
+        for name in ('module', 'version', 'user_info', 'requirements'):
+            self.assertNotIn(name, self.package.__dict__)
+
+    def test_only_what_is_used(self):
+        self.assertEqual(self.package.version, "0.1.1")
+        self.assertIn('module', self.package.__dict__)
+        self.assertNotIn('user_info', self.package.__dict__)
+        self.assertNotIn('requirements', self.package.__dict__)
+
+    def test_assignment(self):
+        self.package.version = "2.0.0"
+        self.assertEqual(self.package.version, "2.0.0")
+        self.assertNotIn('module', self.package.__dict__)
+
+    def test_load_all(self):
+        self.package.load_all()
+        for name in ('module', 'version', 'user_info', 'requirements', 'is_script'):
+            self.assertIn(name, self.package.__dict__)
+
+    def test_package_files_not_shared(self):
+        self.package.PACKAGE_FILES['readme_rst'] = "Readme"
+        other = PyPackage(os.path.join(self.testDataDir, "no_meta.py"))
+        self.assertEqual(other.PACKAGE_FILES, {})
@@ -0,0 +1,124 @@
+from __future__ import print_function
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from pyrelease.asyncupload import UploadScheduler
+from pyrelease.builder import Builder
+from pyrelease.indexserver import IndexServer
+from pyrelease.pyrelease import PyPackage
+from pyrelease.upload import (UploadJournal, dist_files, metadata_fields,
+                              pypirc_repositories)
+from tmpcache import setUpModule, tearDownModule
+
+
+class TestUploadScheduler(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.servers = []
+        for name in ('one', 'two'):
+            server = IndexServer(('127.0.0.1', 0), os.path.join(self.tmp_dir, name))
+            thread = threading.Thread(target=server.serve_forever)
+            thread.daemon = True
+            thread.start()
+            self.servers.append(server)
+        self.repositories = dict(
+            one=dict(url=self.servers[0].upload_url),
+            two=dict(url=self.servers[1].upload_url))
+
+        test_dir = os.path.abspath(os.path.dirname(__file__))
+        package = PyPackage(os.path.join(test_dir, 'testcases', 'base_test.py'))
+        self.builder = Builder(package, build_dir=os.path.join(self.tmp_dir, 'release'))
+        self.builder.make_all()
+        self.builder.build_distros(suppress=True)
+        self.metadata = metadata_fields(package)
+        # A couple more files to have more uploads than connections.
+        for tag in ('py2', 'py3'):
+            shutil.copyfile(
+                os.path.join(self.builder.dist_dir, 'base_test-0.1.1-py2.py3-none-any.whl'),
+                os.path.join(self.builder.dist_dir, 'base_test-0.1.1-%s-none-any.whl' % tag))
+        self.paths = dist_files(self.builder.dist_dir)
+
+    def tearDown(self):
+        for server in self.servers:
+            server.shutdown()
+            server.server_close()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_many_repositories(self):
+        scheduler = UploadScheduler(self.repositories, concurrency=2)
+        results = scheduler.run(self.paths, self.metadata)
+        self.assertEqual(sorted(results), ['one', 'two'])
+        for name, server in zip(('one', 'two'), self.servers):
+            self.assertEqual([r.path for r in results[name]], self.paths)
+            self.assertEqual([r.status for r in results[name]], [200] * 4)
+            self.assertEqual(server.uploads, 4)
+            # Two pooled connections shared by the four files, and one
+            # to see what the index already has.
+            self.assertEqual(server.connections, 3)
+        self.assertEqual(len(scheduler.uploaders), 4)
+        self.assertTrue(all(u.connection is None for u in scheduler.uploaders))
+
+    def test_one_at_a_time(self):
+        results = UploadScheduler(self.repositories, concurrency=1).run(
+            self.paths, self.metadata)
+        self.assertEqual([r.status for r in results['one']], [200] * 4)
+        self.assertEqual(self.servers[0].connections, 2)
+
+    def test_resume(self):
+        journal = UploadJournal(os.path.join(self.tmp_dir, 'journal.json'))
+        one = dict(one=self.repositories['one'])
+        self.servers[0].fail_uploads(2)
+        results = UploadScheduler(one, retries=0, journal=journal).run(
+            self.paths, self.metadata)
+        self.assertEqual(sorted(r.status for r in results['one']), [200, 200, 503, 503])
+
+        # Carries on with just the two that failed.
+        journal = UploadJournal(journal.path)
+        results = UploadScheduler(one, retries=0, journal=journal).run(
+            self.paths, self.metadata)
+        self.assertTrue(all(r.ok for r in results['one']))
+        self.assertEqual(
+            sorted(r.reason for r in results['one']),
+            ['Already uploaded', 'Already uploaded', 'OK', 'OK'])
+        self.assertEqual(self.servers[0].uploads, 4)
+
+    def test_lost_response(self):
+        self.servers[0].fail_uploads(1, after_store=True)
+        results = UploadScheduler(self.repositories, concurrency=1, backoff=0.01).run(
+            self.paths[:1], self.metadata)
+        result = results['one'][0]
+        # The retry was refused, but the index has the same file.
+        self.assertEqual(result.status, 400)
+        self.assertTrue(result.skipped)
+        self.assertTrue(result.ok)
+
+    def test_builder(self):
+        with open(os.path.join(self.tmp_dir, '.pypirc'), 'w') as f:
+            f.write("[one]\nrepository = %s\n\n[two]\nrepository = %s\n" % (
+                self.servers[0].upload_url, self.servers[1].upload_url))
+        home = os.environ.get('HOME')
+        os.environ['HOME'] = self.tmp_dir
+        try:
+            # Only used for one repository, each of these has its own.
+            self.builder.repository_url = 'http://127.0.0.1:1/legacy/'
+            results = self.builder.upload_to_repositories(['one', 'two'])
+        finally:
+            if home is None:
+                del os.environ['HOME']
+            else:
+                os.environ['HOME'] = home
+        self.assertEqual(list(results), ['one', 'two'])
+        self.assertTrue(all(r.ok for r in self.builder.upload_results))
+        self.assertEqual([s.uploads for s in self.servers], [4, 4])
+        self.assertEqual(self.builder.errors, [])
+        self.assertTrue(self.builder.uploaded)
+
+    def test_pypirc_repositories(self):
+        path = os.path.join(self.tmp_dir, 'pypirc')
+        with open(path, 'w') as f:
+            f.write("[distutils]\nindex-servers=\n    pypi\n    testpypi\n    local\n")
+        self.assertEqual(pypirc_repositories(path), ['pypi', 'testpypi', 'local'])
+        self.assertEqual(pypirc_repositories(os.path.join(self.tmp_dir, 'none')), [])
@@ -0,0 +1,44 @@
+from __future__ import print_function
+import os
+import shutil
+import tempfile
+import unittest
+
+from pyrelease.batch import discover_targets, batch_report
+from tmpcache import setUpModule, tearDownModule
+
+
+def write(path, text=""):
+    if not os.path.isdir(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+    with open(path, 'w') as f:
+        f.write(text)
+
+
+class TestBatch(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        write(os.path.join(self.root, 'alpha', 'alpha.py'),
+              "__version__ = '1.0.0'\n")
+        write(os.path.join(self.root, 'beta', '__init__.py'),
+              "__version__ = '2.0.0'\n")
+        write(os.path.join(self.root, 'beta', 'inner', 'inner.py'))
+        write(os.path.join(self.root, '.hidden', 'hidden.py'))
+        write(os.path.join(self.root, 'broken', 'broken.py'), "def (:\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_discover_targets(self):
+        found = [os.path.relpath(t, self.root)
+                 for t in discover_targets(self.root)]
+        self.assertEqual(found, [os.path.join('alpha', 'alpha.py'),
+                                 os.path.join('beta', '__init__.py'),
+                                 os.path.join('broken', 'broken.py')])
+
+    def test_batch_report(self):
+        report = batch_report(self.root, workers=2, use_cache=False)
+        versions = dict((p['name'], p['version'])
+                        for p in report['packages'] if not p['error'])
+        self.assertEqual(versions, {'alpha': '1.0.0', 'beta': '2.0.0'})
+        self.assertEqual(report['errors'], 1)
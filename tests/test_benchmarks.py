@@ -0,0 +1,112 @@
+from __future__ import print_function
+import os
+import json
+import shutil
+import tempfile
+import unittest
+
+from click.testing import CliRunner
+
+from pyrelease.benchmarks import (BENCHMARKS, FORMAT_VERSION, run_benchmarks, summarize,
+                                  rerun, compare_reports, format_comparison)
+from pyrelease.cli import bench
+from pyrelease.corpus import generate_corpus
+from tmpcache import setUpModule, tearDownModule
+
+
+class TestBenchmarks(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_summarize(self):
+        stats = summarize([5.0, 1.0, 2.0, 4.0, 3.0])
+        self.assertEqual(stats['median'], 3.0)
+        self.assertEqual(stats['iqr'], 2.0)
+        self.assertEqual(stats['min'], 1.0)
+        self.assertEqual(summarize([2.0])['iqr'], 0)
+
+    def test_run_all(self):
+        targets = generate_corpus(self.tmp_dir, packages=1, imports=50, functions=10,
+                                  data_files=2, data_size=1000)
+        report = run_benchmarks(targets, runs=2, warmup=0)
+        self.assertEqual(report['runs'], 2)
+        self.assertEqual(list(report['results']),
+                         ['%s/corpus_pkg_0000' % name for name in BENCHMARKS])
+        for key, result in report['results'].items():
+            self.assertNotIn('error', result, key)
+            self.assertEqual(len(result['times']), 2)
+
+    def test_unknown(self):
+        self.assertRaises(ValueError, run_benchmarks, [], names=['nope'])
+
+
+def report(**medians):
+    results = dict((key.replace('__', '/'), summarize(times))
+                   for key, times in medians.items())
+    return dict(format=FORMAT_VERSION, runs=3, warmup=0, results=results)
+
+
+class TestCompare(unittest.TestCase):
+    def test_compare_reports(self):
+        baseline = report(a__x=[1.0, 1.0, 1.1], b__x=[1.0, 1.0, 1.1],
+                          c__x=[1.0, 1.1, 1.2], d__x=[1.0, 1.0, 1.0])
+        current = report(a__x=[1.5, 1.5, 1.6], b__x=[0.5, 0.5, 0.5],
+                         c__x=[0.9, 1.3, 2.0], e__x=[1.0, 1.0, 1.0])
+        rows = dict((r['key'], r) for r in compare_reports(baseline, current, 0.1))
+        self.assertEqual(rows['a/x']['status'], 'regressed')
+        self.assertAlmostEqual(rows['a/x']['change'], 0.5)
+        self.assertEqual(rows['b/x']['status'], 'improved')
+        # Slower median but the spread overlaps, so it's noise.
+        self.assertEqual(rows['c/x']['status'], 'ok')
+        self.assertEqual(rows['d/x']['status'], 'missing')
+        self.assertEqual(rows['e/x']['status'], 'new')
+        self.assertIn('regressed', format_comparison(list(rows.values())))
+
+    def test_compare_exit_status(self):
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            baseline = report(a__x=[1.0, 1.0, 1.0], b__x=[1.0, 1.0, 1.0])
+            baseline['results']['c/x'] = dict(error="broken before")
+            for name, data in (
+                    ('base.json', baseline),
+                    ('ok.json', report(a__x=[1.0, 1.0, 1.0], b__x=[1.0, 1.0, 1.0])),
+                    ('gone.json', report(a__x=[1.0, 1.0, 1.0]))):
+                with open(os.path.join(tmp_dir, name), 'w') as f:
+                    json.dump(data, f)
+            failed = report(a__x=[1.0, 1.0, 1.0])
+            failed['results']['b/x'] = dict(error="broken")
+            with open(os.path.join(tmp_dir, 'failed.json'), 'w') as f:
+                json.dump(failed, f)
+
+            def compare(against):
+                return CliRunner().invoke(bench, [
+                    'compare', os.path.join(tmp_dir, 'base.json'),
+                    '--against', os.path.join(tmp_dir, against)])
+            # c/x failed in the baseline too, so it doesn't count.
+            self.assertEqual(compare('ok.json').exit_code, 0)
+            for against in ('gone.json', 'failed.json'):
+                result = compare(against)
+                self.assertEqual(result.exit_code, 1)
+                self.assertIn("1 failed or missing: b/x", result.output)
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def test_rerun(self):
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            targets = generate_corpus(tmp_dir, packages=1, imports=10, functions=2)
+            baseline = run_benchmarks(targets, names=['has_main_func'], runs=2,
+                                      warmup=0, synthetic=True)
+            current = rerun(baseline)
+            for data in (baseline, current):
+                results = data['results']
+                self.assertFalse(results['has_main_func/corpus_pkg_0000'].get('synthetic'))
+                self.assertTrue(results['has_main_func/synthetic_pkg_0000'].get('synthetic'))
+            self.assertEqual(list(current['results']), list(baseline['results']))
+            statuses = set(r['status'] for r in compare_reports(baseline, current, 100))
+            self.assertEqual(statuses, {'ok'})
+        finally:
+            shutil.rmtree(tmp_dir)
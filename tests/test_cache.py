@@ -0,0 +1,131 @@
+from __future__ import print_function
+import os
+import shutil
+import tempfile
+import unittest
+
+from pyrelease.builder import Builder
+from pyrelease.cache import MetadataCache, ArtifactCache, evict
+from pyrelease.pyrelease import PyPackage
+from tmpcache import setUpModule, tearDownModule
+
+
+class TestMetadataCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.cache = MetadataCache(os.path.join(self.tmp_dir, 'cache'))
+        self.target = os.path.join(self.tmp_dir, 'thing.py')
+        with open(self.target, 'w') as f:
+            f.write('"""Thing"""\n__version__ = "0.1.0"\n'
+                    '__all__ = ["main"]\n\ndef main():\n    """Does things"""\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_key_follows_content(self):
+        key = self.cache.key(self.target)
+        self.assertEqual(key, self.cache.key(self.target))
+        with open(self.target, 'a') as f:
+            f.write("# changed\n")
+        self.assertNotEqual(key, self.cache.key(self.target))
+
+    def test_hit_skips_analysis(self):
+        first = PyPackage(self.target, cache=self.cache)
+        self.assertEqual(first.version, "0.1.0")
+        self.assertEqual(first.description, "Does things")
+
+        second = PyPackage(self.target, cache=self.cache)
+        self.assertNotIn("module", second.__dict__)
+        self.assertEqual(second.jsonize(), first.jsonize())
+        self.assertTrue(second.is_script)
+
+    def test_saved_once(self):
+        writes = []
+        original = self.cache.set
+        self.cache.set = lambda key, record: writes.append(key) or original(key, record)
+        package = PyPackage(self.target, cache=self.cache)
+        package.version
+        self.assertEqual(writes, [])
+        package.jsonize()
+        self.assertEqual(len(writes), 1)
+        package.save_cache()
+        self.assertEqual(len(writes), 1)
+
+    def test_saved_at_exit(self):
+        from pyrelease.pyrelease import _save_caches
+
+        first = PyPackage(self.target, cache=self.cache)
+        self.assertEqual(first.version, "0.1.0")
+        _save_caches()
+        second = PyPackage(self.target, cache=self.cache)
+        self.assertEqual(second._cache_record['version'], "0.1.0")
+
+    def test_evict(self):
+        folder = os.path.join(self.tmp_dir, 'entries')
+        os.mkdir(folder)
+        for i in range(4):
+            path = os.path.join(folder, str(i))
+            with open(path, 'w') as f:
+                f.write('x' * 10)
+            os.utime(path, (i, i))
+        self.assertEqual(evict(folder, 25), 2)
+        self.assertEqual(sorted(os.listdir(folder)), ['2', '3'])
+
+
+class TestArtifactCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.cache = ArtifactCache(os.path.join(self.tmp_dir, 'cache'))
+        test_dir = os.path.abspath(os.path.dirname(__file__))
+        self.package = PyPackage(os.path.join(test_dir, 'testcases', 'base_test.py'))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def builder(self, name):
+        builder = Builder(self.package, build_dir=os.path.join(self.tmp_dir, name),
+                          artifact_cache=self.cache)
+        builder.make_all()
+        return builder
+
+    def test_set_and_restore(self):
+        dist = os.path.join(self.tmp_dir, 'thing-1.0.tar.gz')
+        with open(dist, 'w') as f:
+            f.write('archive')
+        self.assertIsNone(self.cache.restore('abc', self.tmp_dir))
+        self.cache.set('abc', [dist])
+        dest = os.path.join(self.tmp_dir, 'dest')
+        restored = self.cache.restore('abc', dest)
+        self.assertEqual(restored, [os.path.join(dest, 'thing-1.0.tar.gz')])
+        with open(restored[0]) as f:
+            self.assertEqual(f.read(), 'archive')
+
+    def test_empty_entry(self):
+        self.cache.set('abc', [])
+        self.assertIsNone(self.cache.get('abc'))
+        os.makedirs(os.path.join(self.cache.path, 'abc'))
+        self.assertIsNone(self.cache.restore('abc', self.tmp_dir))
+
+    def test_reused_across_build_dirs(self):
+        first = self.builder('one')
+        first.build_distros()
+        self.assertEqual(first.errors, [])
+        built = sorted(os.listdir(first.dist_dir))
+        self.assertEqual(len(built), 2)
+
+        second = self.builder('two')
+        self.assertEqual(second.artifact_key(), first.artifact_key())
+
+        def broken():
+            raise AssertionError("should come from the cache")
+        second.build_sdist = second.build_wheel = broken
+        second.build_distros()
+        self.assertEqual(second.errors, [])
+        self.assertEqual(sorted(os.listdir(second.dist_dir)), built)
+
+    def test_key_follows_inputs(self):
+        builder = self.builder('one')
+        key = builder.artifact_key()
+        with open(os.path.join(builder.build_dir, 'setup.py'), 'a') as f:
+            f.write("# changed\n")
+        self.assertNotEqual(builder.artifact_key(), key)
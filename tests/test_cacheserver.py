@@ -0,0 +1,81 @@
+from __future__ import print_function
+import os
+import shutil
+import tarfile
+import tempfile
+import threading
+import unittest
+
+from pyrelease.cache import ArtifactCache, RemoteArtifactCache
+from pyrelease.cacheserver import CacheServer
+from pyrelease.compat import Request, urlopen
+
+KEY = 'ab' * 32
+
+
+class TestCacheServer(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.server = CacheServer(('127.0.0.1', 0), os.path.join(self.tmp_dir, 'server'))
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        self.remote = RemoteArtifactCache(self.server.url)
+
+        self.dist = os.path.join(self.tmp_dir, 'thing-1.0.tar.gz')
+        with open(self.dist, 'wb') as f:
+            f.write(b'archive' * 1000)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_miss(self):
+        dest = tempfile.mkdtemp(dir=self.tmp_dir)
+        self.assertFalse(self.remote.fetch(KEY, dest))
+        self.assertFalse(self.remote.fetch('not-a-key', dest))
+        self.assertEqual(os.listdir(dest), [])
+
+    def test_push_and_fetch(self):
+        self.assertTrue(self.remote.push(KEY, [self.dist]))
+        dest = tempfile.mkdtemp(dir=self.tmp_dir)
+        self.assertTrue(self.remote.fetch(KEY, dest))
+        self.assertEqual(os.listdir(dest), ['thing-1.0.tar.gz'])
+        with open(os.path.join(dest, 'thing-1.0.tar.gz'), 'rb') as f:
+            self.assertEqual(f.read(), b'archive' * 1000)
+
+    def test_empty_entry(self):
+        # Only a member the client won't extract, so nothing to restore.
+        member = os.path.join(self.tmp_dir, 'dist')
+        os.makedirs(member)
+        shutil.copy(self.dist, member)
+        tar_path = os.path.join(self.tmp_dir, 'entry.tar')
+        with tarfile.open(tar_path, 'w') as tar:
+            tar.add(os.path.join(member, 'thing-1.0.tar.gz'), arcname='dist/x.whl')
+        with open(tar_path, 'rb') as f:
+            request = Request(self.remote._url(KEY), data=f.read())
+        request.get_method = lambda: 'PUT'
+        urlopen(request).close()
+
+        dest = tempfile.mkdtemp(dir=self.tmp_dir)
+        self.assertFalse(self.remote.fetch(KEY, dest))
+        cache = ArtifactCache(os.path.join(self.tmp_dir, 'one'), remote=self.remote)
+        self.assertIsNone(cache.restore(KEY, os.path.join(self.tmp_dir, 'out')))
+
+    def test_shared_between_local_caches(self):
+        one = ArtifactCache(os.path.join(self.tmp_dir, 'one'), remote=self.remote)
+        two = ArtifactCache(os.path.join(self.tmp_dir, 'two'), remote=self.remote)
+        one.set(KEY, [self.dist])
+        restored = two.restore(KEY, os.path.join(self.tmp_dir, 'dist'))
+        self.assertEqual([os.path.basename(p) for p in restored], ['thing-1.0.tar.gz'])
+        # Now kept locally too.
+        self.assertTrue(os.path.isdir(os.path.join(two.path, KEY)))
+
+    def test_server_down(self):
+        self.server.shutdown()
+        self.server.server_close()
+        cache = ArtifactCache(os.path.join(self.tmp_dir, 'one'), remote=self.remote)
+        self.assertIsNone(cache.get(KEY))
+        cache.set(KEY, [self.dist])
+        self.assertIsNotNone(cache.get(KEY))
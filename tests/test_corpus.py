@@ -0,0 +1,80 @@
+from __future__ import print_function
+import os
+import json
+import shutil
+import tempfile
+import unittest
+
+from pyrelease.batch import discover_targets
+from pyrelease.cache import file_digest
+from pyrelease.corpus import generate_corpus
+from pyrelease.helpers import get_dependencies
+from pyrelease.pyrelease import PyPackage
+from pyrelease.scheduler import BuildScheduler
+from tmpcache import setUpModule, tearDownModule
+
+
+def tree_contents(root):
+    rv = {}
+    for dirpath, _, files in os.walk(root):
+        for name in files:
+            path = os.path.join(dirpath, name)
+            rv[os.path.relpath(path, root)] = file_digest(path)
+    return rv
+
+
+class TestCorpus(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_deterministic(self):
+        one, two, three = [os.path.join(self.tmp_dir, n) for n in ('one', 'two', 'three')]
+        for root, seed in ((one, 1), (two, 1), (three, 2)):
+            generate_corpus(root, packages=4, imports=20, functions=5, data_files=3,
+                            data_size=5000, shape='random', seed=seed)
+        self.assertEqual(tree_contents(one), tree_contents(two))
+        self.assertNotEqual(tree_contents(one), tree_contents(three))
+
+    def test_layout_and_data(self):
+        root = os.path.join(self.tmp_dir, 'corpus')
+        targets = generate_corpus(root, packages=3, imports=10, functions=2,
+                                  data_files=12, data_size=3000, layout='package')
+        self.assertEqual(sorted(discover_targets(root)), sorted(targets))
+        self.assertTrue(all(t.endswith('__init__.py') for t in targets))
+        data = os.path.join(root, 'corpus_pkg_0001', 'data')
+        sizes = [os.path.getsize(os.path.join(d, f))
+                 for d, _, files in os.walk(data) for f in files]
+        self.assertEqual(sizes, [3000] * 12)
+        with open(os.path.join(root, 'corpus.json')) as f:
+            self.assertEqual(json.load(f)['layout'], 'package')
+
+    def test_imports(self):
+        targets = generate_corpus(self.tmp_dir, packages=2, imports=40, functions=3)
+        requirements = get_dependencies(targets[1])
+        self.assertIn('corpus_pkg_0000', requirements)
+        self.assertIn('corpus_pkg_0001_dep_0', requirements)
+        self.assertEqual(len(requirements), 21)
+
+    def test_prefix(self):
+        targets = generate_corpus(self.tmp_dir, packages=2, imports=2, functions=1,
+                                  prefix='other_pkg')
+        self.assertEqual([PyPackage(t).name for t in targets],
+                         ['other_pkg_0000', 'other_pkg_0001'])
+        self.assertIn('other_pkg_0000', get_dependencies(targets[1]))
+
+    def test_shapes(self):
+        for shape, expected in (('chain', ['corpus_pkg_0000', 'corpus_pkg_0001',
+                                           'corpus_pkg_0002', 'corpus_pkg_0003']),
+                                ('tree', None)):
+            root = os.path.join(self.tmp_dir, shape)
+            targets = generate_corpus(root, packages=4, imports=2, functions=1,
+                                      shape=shape)
+            packages = [PyPackage(t) for t in targets]
+            order = BuildScheduler(packages).order()
+            if expected:
+                self.assertEqual(order, expected)
+            self.assertEqual(order[0], 'corpus_pkg_0000')
+        self.assertRaises(ValueError, generate_corpus, self.tmp_dir, shape='blob')
@@ -0,0 +1,56 @@
+from __future__ import print_function
+import os
+import shutil
+import tempfile
+import unittest
+
+from pyrelease.depindex import DistributionIndex, build_index, load_index
+from pyrelease.helpers import get_dependencies
+
+
+SOURCE = '''\
+from __future__ import print_function
+import os
+import os.path
+import yaml
+from yaml import load
+import sibling
+import not_installed_anywhere
+from . import relative
+'''
+
+
+class TestDistributionIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_build_index(self):
+        index = build_index()
+        self.assertEqual(index.distribution('click'), 'click')
+        self.assertTrue(index.is_stdlib('os'))
+        self.assertFalse(index.is_stdlib('click'))
+
+    def test_saved_index(self):
+        path = os.path.join(self.tmp_dir, 'index.json')
+        index = load_index(path)
+        self.assertTrue(os.path.isfile(path))
+        self.assertEqual(load_index(path).modules, index.modules)
+
+    def test_stale(self):
+        index = DistributionIndex({}, [], {self.tmp_dir: 0})
+        self.assertTrue(index.is_stale())
+        index.sites[self.tmp_dir] = os.stat(self.tmp_dir).st_mtime
+        self.assertFalse(index.is_stale())
+
+    def test_get_dependencies(self):
+        target = os.path.join(self.tmp_dir, 'thing.py')
+        with open(target, 'w') as f:
+            f.write(SOURCE)
+        with open(os.path.join(self.tmp_dir, 'sibling.py'), 'w') as f:
+            f.write("")
+        index = DistributionIndex({'yaml': 'PyYAML'}, ['os'], {})
+        self.assertEqual(get_dependencies(target, index=index),
+                         ['PyYAML', 'not_installed_anywhere'])
@@ -0,0 +1,100 @@
+from __future__ import print_function
+import os
+import shutil
+import base64
+import hashlib
+import tarfile
+import zipfile
+import unittest
+
+from pyrelease.builder import Builder
+from pyrelease.pyrelease import PyPackage
+from tmpcache import setUpModule, tearDownModule
+
+
+class TestSdist(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = os.path.abspath(os.path.dirname(__file__))
+        target = os.path.join(self.test_dir, 'testcases', 'base_test.py')
+        self.package = PyPackage(target)
+        self.builder = Builder(package=self.package)
+        self.builder.make_all()
+
+    def tearDown(self):
+        shutil.rmtree(self.builder.build_dir, ignore_errors=True)
+
+    def test_build_sdist(self):
+        path = self.builder.build_sdist()
+        self.assertEqual(os.path.basename(path), 'base_test-0.1.1.tar.gz')
+        with tarfile.open(path) as tar:
+            names = tar.getnames()
+            pkg_info = tar.extractfile('base_test-0.1.1/PKG-INFO').read().decode('utf-8')
+        for name in ('PKG-INFO', 'setup.py', 'README.rst', 'LICENSE.md', 'base_test.py'):
+            self.assertIn('base_test-0.1.1/' + name, names)
+        self.assertIn('Name: base_test\n', pkg_info)
+        self.assertIn('Version: 0.1.1\n', pkg_info)
+        self.assertIn('Requires-Dist: click\n', pkg_info)
+        self.assertIn('Summary: MyMainClass docstring Description\n', pkg_info)
+
+    def test_reproducible(self):
+        with open(self.builder.build_sdist(), 'rb') as f:
+            first = f.read()
+        with open(self.builder.build_sdist(), 'rb') as f:
+            self.assertEqual(first, f.read())
+
+    def test_build_distros_native(self):
+        self.builder.default_commands = dict(builds=["python setup.py sdist"])
+        self.builder.build_distros()
+        self.assertEqual(self.builder.errors, [])
+        self.assertEqual(os.listdir(self.builder.dist_dir), ['base_test-0.1.1.tar.gz'])
+
+
+class TestWheel(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = os.path.abspath(os.path.dirname(__file__))
+        target = os.path.join(self.test_dir, 'testcases', 'base_test.py')
+        self.package = PyPackage(target)
+        self.builder = Builder(package=self.package)
+        self.builder.make_all()
+
+    def tearDown(self):
+        shutil.rmtree(self.builder.build_dir, ignore_errors=True)
+
+    def test_build_wheel(self):
+        path = self.builder.build_wheel()
+        self.assertEqual(os.path.basename(path), 'base_test-0.1.1-py2.py3-none-any.whl')
+        dist_info = 'base_test-0.1.1.dist-info/'
+        with zipfile.ZipFile(path) as zf:
+            names = zf.namelist()
+            metadata = zf.read(dist_info + 'METADATA').decode('utf-8')
+            wheel = zf.read(dist_info + 'WHEEL').decode('utf-8')
+            record = zf.read(dist_info + 'RECORD').decode('utf-8').splitlines()
+            contents = dict((n, zf.read(n)) for n in names)
+        self.assertIn('base_test.py', names)
+        self.assertNotIn('setup.py', names)
+        self.assertIn('Name: base_test\n', metadata)
+        self.assertIn('Tag: py2-none-any\n', wheel)
+        self.assertIn('Tag: py3-none-any\n', wheel)
+
+        self.assertEqual(sorted(r.split(',')[0] for r in record), sorted(names))
+        for line in record:
+            arcname, digest, size = line.split(',')
+            if arcname.endswith('RECORD'):
+                continue
+            data = contents[arcname]
+            expected = base64.urlsafe_b64encode(
+                hashlib.sha256(data).digest()).rstrip(b'=').decode('ascii')
+            self.assertEqual(digest, 'sha256=' + expected)
+            self.assertEqual(int(size), len(data))
+
+    def test_entry_points(self):
+        self.package.is_script = True
+        with zipfile.ZipFile(self.builder.build_wheel()) as zf:
+            entry_points = zf.read('base_test-0.1.1.dist-info/entry_points.txt').decode('utf-8')
+        self.assertIn('base_test = base_test:main', entry_points)
+
+    def test_reproducible(self):
+        with open(self.builder.build_wheel(), 'rb') as f:
+            first = f.read()
+        with open(self.builder.build_wheel(), 'rb') as f:
+            self.assertEqual(first, f.read())
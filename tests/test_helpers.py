@@ -0,0 +1,121 @@
+from __future__ import print_function
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+from pyrelease.helpers import parse_target_package, has_main_func, \
+    migrate_version, import_target_package
+
+
+SOURCE = '''\
+"""Module docstring"""
+import this_module_does_not_exist
+
+VERSION = '2.0.1'
+__version__ = VERSION
+__license__ = 'MIT'
+__author__ = "Someone " + "Else"
+__all__ = ['Thing']
+
+
+class Thing(object):
+    """Thing docstring"""
+
+
+raise SystemExit("Should never run")
+'''
+
+
+class TestParseTargetPackage(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.target = os.path.join(self.tmp_dir, 'thing.py')
+        with open(self.target, 'w') as f:
+            f.write(SOURCE)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_does_not_execute(self):
+        module = parse_target_package(self.target)
+        self.assertEqual(module.__name__, 'thing')
+        self.assertEqual(module.__doc__, 'Module docstring')
+
+    def test_dunder_attributes(self):
+        module = parse_target_package(self.target)
+        self.assertEqual(module.__version__, '2.0.1')
+        self.assertEqual(module.__license__, 'MIT')
+        self.assertEqual(module.__all__, ['Thing'])
+
+    def test_non_literal_is_skipped(self):
+        module = parse_target_package(self.target)
+        self.assertFalse(hasattr(module, '__author__'))
+
+    def test_definition_docstring(self):
+        module = parse_target_package(self.target)
+        entry = module.__dict__[module.__all__[0]]
+        self.assertEqual(entry.__doc__, 'Thing docstring')
+
+    def test_syntax_error(self):
+        with open(self.target, 'w') as f:
+            f.write('def broken(:\n')
+        self.assertIsNone(parse_target_package(self.target))
+
+
+class TestImportTargetPackage(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = list(sys.path)
+
+    def tearDown(self):
+        sys.path[:] = self.path
+        for name in ('broken_thing', 'thing_pkg', 'thing_pkg.helper'):
+            sys.modules.pop(name, None)
+        shutil.rmtree(self.tmp_dir)
+
+    def write(self, rel_path, text):
+        path = os.path.join(self.tmp_dir, rel_path)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, 'w') as f:
+            f.write(text)
+        return path
+
+    def test_error_is_not_left_in_sys_modules(self):
+        target = self.write('broken_thing.py', 'raise RuntimeError("nope")\n')
+        with self.assertRaises(RuntimeError):
+            import_target_package(target)
+        self.assertNotIn('broken_thing', sys.modules)
+
+    def test_package(self):
+        self.write('thing_pkg/helper.py', 'VALUE = 3\n')
+        target = self.write('thing_pkg/__init__.py',
+                            'from .helper import VALUE\n__version__ = "1.0"\n')
+        module = import_target_package(target)
+        self.assertEqual(module.__name__, 'thing_pkg')
+        self.assertEqual(module.VALUE, 3)
+        self.assertEqual(module.__path__, [os.path.dirname(target)])
+        self.assertNotIn('__init__', sys.modules)
+
+
+class TestMigrate(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.target = os.path.join(self.tmp_dir, 'thing.py')
+        with open(self.target, 'w') as f:
+            f.write("__version__ = '0.1.0'\n__license__ = 'MIT'\n\n"
+                    "def main_loop():\n    pass\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_migrate_version(self):
+        migrate_version(self.target, '0.2.0')
+        module = parse_target_package(self.target)
+        self.assertEqual(module.__version__, '0.2.0')
+        self.assertEqual(module.__license__, 'MIT')
+
+    def test_has_main_func(self):
+        self.assertFalse(has_main_func(self.target))
@@ -0,0 +1,49 @@
+from __future__ import print_function
+import os
+import pstats
+import shutil
+import tempfile
+import tracemalloc
+import unittest
+
+from pyrelease.builder import Builder
+from pyrelease.profiling import Profiler
+from pyrelease.pyrelease import PyPackage
+from pyrelease.tracing import start_tracing, stop_tracing
+from tmpcache import setUpModule, tearDownModule
+
+
+class TestProfiler(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.folder = os.path.join(self.tmp_dir, 'profile')
+
+    def tearDown(self):
+        stop_tracing()
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_release_stages(self):
+        profiler = start_tracing(Profiler(self.folder))
+        test_dir = os.path.abspath(os.path.dirname(__file__))
+        package = PyPackage(os.path.join(test_dir, 'testcases', 'base_test.py'))
+        builder = Builder(package, build_dir=os.path.join(self.tmp_dir, 'release'))
+        builder.make_all()
+        builder.build_distros()
+        stop_tracing()
+
+        written = profiler.finish()
+        self.assertFalse(tracemalloc.is_tracing())
+        names = os.listdir(self.folder)
+        for name in ('find_package', 'build_readme', 'build_setup', 'build_distros'):
+            self.assertIn(name + '.prof', names)
+            self.assertIn(name + '.snapshot', names)
+        self.assertEqual(len(written), len(names))
+        stats = pstats.Stats(os.path.join(self.folder, 'build_readme.prof'))
+        self.assertTrue(any(func[2] == 'render_readme' for func in stats.stats))
+        tracemalloc.Snapshot.load(os.path.join(self.folder, 'build_setup.snapshot'))
+
+        report = profiler.report(top=5)
+        self.assertIn('cumulative', report)
+        self.assertIn('allocation sites', report)
@@ -0,0 +1,72 @@
+from __future__ import print_function
+import os
+import shutil
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from pyrelease.graph import run_graph, toposort, CycleError, SkippedError
+from pyrelease.pyrelease import PyPackage
+from pyrelease.scheduler import BuildScheduler
+from tmpcache import setUpModule, tearDownModule
+
+
+def fail():
+    raise ValueError("failed")
+
+
+class TestGraph(unittest.TestCase):
+    def test_toposort(self):
+        order = toposort({'c': ['b'], 'b': ['a'], 'a': []})
+        self.assertEqual(order, ['a', 'b', 'c'])
+
+    def test_cycle(self):
+        self.assertRaises(CycleError, toposort, {'a': ['b'], 'b': ['a']})
+
+    def test_run_graph(self):
+        done = []
+        tasks = dict(a=(done.append, ('a',)), b=(done.append, ('b',)),
+                     bad=(fail, ()), after_bad=(done.append, ('x',)),
+                     after_after=(done.append, ('y',)))
+        deps = dict(b=['a'], after_bad=['bad'], after_after=['after_bad'])
+        with ThreadPoolExecutor(4) as pool:
+            results, errors = run_graph(pool, tasks, deps)
+        self.assertEqual(sorted(done), ['a', 'b'])
+        self.assertEqual(done.index('a') < done.index('b'), True)
+        self.assertEqual(sorted(results), ['a', 'b'])
+        self.assertIsInstance(errors['bad'], ValueError)
+        self.assertIsInstance(errors['after_bad'], SkippedError)
+        self.assertIsInstance(errors['after_after'], SkippedError)
+
+
+class TestBuildScheduler(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.packages = []
+        for name, imports in (('appone', 'import libone\n'), ('libone', '')):
+            folder = os.path.join(self.root, name)
+            os.mkdir(folder)
+            target = os.path.join(folder, name + '.py')
+            with open(target, 'w') as f:
+                f.write(imports + "__version__ = '1.0.0'\n")
+            self.packages.append(PyPackage(target))
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_order(self):
+        scheduler = BuildScheduler(self.packages)
+        self.assertEqual(scheduler.dependencies(),
+                         {'appone': ['libone'], 'libone': []})
+        self.assertEqual(scheduler.order(), ['libone', 'appone'])
+
+    def test_run(self):
+        build_root = os.path.join(self.root, 'releases')
+        # No distributions, so the workers don't run setup.py.
+        scheduler = BuildScheduler(self.packages, workers=2, build_root=build_root,
+                                   use_cache=False, commands=[])
+        report = scheduler.run()
+        self.assertEqual(report['libone']['error'], None)
+        self.assertEqual(report['appone']['error'], None)
+        self.assertTrue(os.path.isfile(os.path.join(
+            build_root, 'appone.1.0.0', 'setup.py')))
@@ -0,0 +1,54 @@
+from __future__ import print_function
+import os
+import shutil
+import tempfile
+import unittest
+
+from pyrelease.source import get_source, clear_sources
+
+
+class TestSourceFile(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.target = os.path.join(self.tmp_dir, 'thing.py')
+        with open(self.target, 'w') as f:
+            f.write("import os\n__version__ = '0.1.0'\n")
+
+    def tearDown(self):
+        clear_sources()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_shared_instance(self):
+        source = get_source(self.target)
+        self.assertIs(source, get_source(os.path.relpath(self.target)))
+        self.assertIs(source.tree, get_source(self.target).tree)
+
+    def test_line_offsets(self):
+        source = get_source(self.target)
+        node = source.tree.body[1]
+        start = source.offset(node.lineno, node.col_offset)
+        self.assertTrue(source.text[start:].startswith('__version__'))
+
+    def test_offset_non_ascii(self):
+        source = get_source(self.target)
+        source.write(u'x = "\xe9"; y = 1\n')
+        node = source.tree.body[1]
+        start = source.offset(node.lineno, node.col_offset)
+        self.assertTrue(source.text[start:].startswith('y = 1'))
+
+    def test_tokens(self):
+        source = get_source(self.target)
+        strings = [t[1] for t in source.tokens if t[1].startswith("'")]
+        self.assertEqual(strings, ["'0.1.0'"])
+
+    def test_write_refreshes(self):
+        source = get_source(self.target)
+        source.write("x = 1\n")
+        self.assertIs(source, get_source(self.target))
+        self.assertEqual(len(source.tree.body), 1)
+
+    def test_stale_file_is_reread(self):
+        source = get_source(self.target)
+        with open(self.target, 'w') as f:
+            f.write("# changed and longer than before\n")
+        self.assertIsNot(source, get_source(self.target))
@@ -0,0 +1,156 @@
+from __future__ import print_function
+import os
+import shutil
+import tarfile
+import tempfile
+import zipfile
+import unittest
+
+from pyrelease.builder import Builder
+from pyrelease.pyrelease import PyPackage
+from pyrelease.source import get_source
+from pyrelease.staging import stage_file, stage_tree
+from tmpcache import setUpModule, tearDownModule
+
+
+class TestStaging(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.src = os.path.join(self.tmp_dir, 'src.txt')
+        with open(self.src, 'w') as f:
+            f.write('data' * 10000)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def read(self, path):
+        with open(path) as f:
+            return f.read()
+
+    def test_modes(self):
+        for mode in ('link', 'reflink', 'copy'):
+            dest = os.path.join(self.tmp_dir, mode)
+            how = stage_file(self.src, dest, mode)
+            self.assertEqual(self.read(dest), 'data' * 10000)
+            same_file = os.path.samefile(self.src, dest)
+            self.assertEqual(same_file, how == 'link')
+            if mode != 'link':
+                self.assertFalse(same_file)
+        self.assertRaises(ValueError, stage_file, self.src, self.src + '.x', 'move')
+
+    def test_replaces_link(self):
+        dest = os.path.join(self.tmp_dir, 'dest')
+        stage_file(self.src, dest, 'link')
+        other = os.path.join(self.tmp_dir, 'other')
+        with open(other, 'w') as f:
+            f.write('other')
+        stage_file(other, dest, 'copy')
+        self.assertEqual(self.read(dest), 'other')
+        self.assertEqual(self.read(self.src), 'data' * 10000)
+
+    def test_source_write_breaks_link(self):
+        src = os.path.join(self.tmp_dir, 'mod.py')
+        with open(src, 'w') as f:
+            f.write('__version__ = "0.1.0"\n')
+        dest = os.path.join(self.tmp_dir, 'staged.py')
+        stage_file(src, dest, 'link')
+        get_source(dest).write('__version__ = "0.2.0"\n')
+        self.assertEqual(self.read(src), '__version__ = "0.1.0"\n')
+        self.assertEqual(self.read(dest), '__version__ = "0.2.0"\n')
+
+    def test_same_file(self):
+        for mode in ('link', 'copy'):
+            self.assertIsNone(stage_file(self.src, self.src, mode))
+            self.assertEqual(self.read(self.src), 'data' * 10000)
+        src = os.path.join(self.tmp_dir, 'data')
+        os.makedirs(src)
+        shutil.copy(self.src, src)
+        self.assertEqual(stage_tree(src, src), [])
+        self.assertTrue(os.path.isfile(os.path.join(src, 'src.txt')))
+
+    def test_stage_tree(self):
+        src = os.path.join(self.tmp_dir, 'data')
+        os.makedirs(os.path.join(src, 'sub'))
+        for name in ('a.txt', os.path.join('sub', 'b.txt')):
+            with open(os.path.join(src, name), 'w') as f:
+                f.write(name)
+        dest = os.path.join(self.tmp_dir, 'out')
+        staged = stage_tree(src, dest)
+        self.assertEqual(sorted(os.path.relpath(p, dest) for p in staged),
+                         ['a.txt', os.path.join('sub', 'b.txt')])
+        self.assertEqual(self.read(os.path.join(dest, 'sub', 'b.txt')),
+                         os.path.join('sub', 'b.txt'))
+
+
+class TestBuilderStaging(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        project = os.path.join(self.tmp_dir, 'thing')
+        os.makedirs(os.path.join(project, 'data'))
+        self.target = os.path.join(project, 'thing.py')
+        with open(self.target, 'w') as f:
+            f.write('"""Thing"""\n__version__ = "0.1.0"\n__author__ = "Someone"\n')
+        self.data_file = os.path.join(project, 'data', 'big.bin')
+        with open(self.data_file, 'wb') as f:
+            f.write(b'\0' * 100000)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_linked_release_leaves_sources(self):
+        builder = Builder(PyPackage(self.target),
+                          build_dir=os.path.join(self.tmp_dir, 'release'))
+        builder.make_all()
+        self.assertEqual(builder.errors, [])
+        staged = os.path.join(builder.build_dir, 'data', 'big.bin')
+        self.assertTrue(os.path.samefile(staged, self.data_file))
+
+        builder.package.author = "Someone Else"
+        builder.migrate_source_attributes()
+        with open(self.target) as f:
+            self.assertIn('"Someone"', f.read())
+        self.assertFalse(os.path.samefile(
+            os.path.join(builder.build_dir, 'thing.py'), self.target))
+
+    def test_removed_data_file(self):
+        gone = os.path.join(os.path.dirname(self.data_file), 'gone.txt')
+        with open(gone, 'w') as f:
+            f.write('gone')
+        builder = Builder(PyPackage(self.target), incremental=True,
+                          build_dir=os.path.join(self.tmp_dir, 'release'))
+        builder.make_all()
+        staged = os.path.join(builder.build_dir, 'data', 'gone.txt')
+        self.assertTrue(os.path.isfile(staged))
+        os.remove(gone)
+        builder.make_all()
+        self.assertEqual(builder.errors, [])
+        self.assertFalse(os.path.exists(staged))
+        self.assertTrue(os.path.isfile(os.path.join(builder.build_dir, 'data', 'big.bin')))
+
+    def test_build_in_project(self):
+        project = os.path.dirname(self.target)
+        builder = Builder(PyPackage(self.target), build_dir=project)
+        builder.make_all()
+        builder.make_all()
+        self.assertEqual(builder.errors, [])
+        with open(self.target) as f:
+            self.assertIn('__version__', f.read())
+        self.assertEqual(os.path.getsize(self.data_file), 100000)
+
+    def test_archive_direct(self):
+        builder = Builder(PyPackage(self.target), archive_direct=True,
+                          build_dir=os.path.join(self.tmp_dir, 'release'))
+        builder.make_all()
+        builder.build_distros()
+        self.assertEqual(builder.errors, [])
+        self.assertFalse(os.path.exists(os.path.join(builder.build_dir, 'data')))
+        self.assertFalse(os.path.exists(os.path.join(builder.build_dir, 'thing.py')))
+
+        with tarfile.open(os.path.join(builder.dist_dir, 'thing-0.1.0.tar.gz')) as tar:
+            names = tar.getnames()
+            self.assertEqual(len(tar.extractfile('thing-0.1.0/data/big.bin').read()), 100000)
+        self.assertIn('thing-0.1.0/thing.py', names)
+        self.assertIn('thing-0.1.0/setup.py', names)
+        with zipfile.ZipFile(os.path.join(
+                builder.dist_dir, 'thing-0.1.0-py2.py3-none-any.whl')) as zf:
+            self.assertIn('thing.py', zf.namelist())
@@ -0,0 +1,66 @@
+from __future__ import print_function
+import os
+import json
+import shutil
+import tempfile
+import unittest
+
+from pyrelease.builder import Builder
+from pyrelease.pyrelease import PyPackage
+from pyrelease.tracing import Tracer, span, start_tracing, stop_tracing
+from tmpcache import setUpModule, tearDownModule
+
+
+class TestTracer(unittest.TestCase):
+    def test_span(self):
+        tracer = Tracer()
+        with tracer.span('outer', size=3):
+            with tracer.span('inner'):
+                pass
+        try:
+            with tracer.span('inner'):
+                raise ValueError("nope")
+        except ValueError:
+            pass
+        outer = [e for e in tracer.events if e['name'] == 'outer'][0]
+        self.assertEqual(outer['ph'], 'X')
+        self.assertEqual(outer['args'], {'size': '3'})
+        self.assertIn('nope', tracer.events[-1]['args']['error'])
+
+        rows = dict((r[0], r[1:]) for r in tracer.summary())
+        self.assertEqual(rows['inner'][0], 2)
+        self.assertIn('outer', tracer.summary_text())
+
+        trace = json.loads(json.dumps(tracer.chrome_trace()))
+        self.assertEqual(len([e for e in trace['traceEvents'] if e['ph'] == 'X']), 3)
+
+    def test_off(self):
+        stop_tracing()
+        with span('nothing'):
+            pass
+
+
+class TestReleaseTrace(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.tracer = start_tracing()
+
+    def tearDown(self):
+        stop_tracing()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_stages_traced(self):
+        test_dir = os.path.abspath(os.path.dirname(__file__))
+        package = PyPackage(os.path.join(test_dir, 'testcases', 'base_test.py'))
+        builder = Builder(package, build_dir=os.path.join(self.tmp_dir, 'release'))
+        builder.make_all()
+        builder.build_distros()
+        names = set(e['name'] for e in self.tracer.events)
+        for name in ('find_package', 'analyse version', 'build_readme',
+                     'build_package', 'build_distros', 'python setup.py sdist'):
+            self.assertIn(name, names)
+
+        path = os.path.join(self.tmp_dir, 'trace.json')
+        self.tracer.write(path)
+        with open(path) as f:
+            self.assertIn('traceEvents', json.load(f))
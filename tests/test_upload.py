@@ -0,0 +1,238 @@
+from __future__ import print_function
+import os
+import json
+import shutil
+import tempfile
+import threading
+import unittest
+
+from pyrelease.builder import Builder
+from pyrelease.compat import urlopen
+from pyrelease.indexserver import IndexServer
+from pyrelease.pyrelease import PyPackage
+from pyrelease.upload import (Uploader, MultipartBody, dist_type, dist_files,
+                              metadata_fields, repository_config, backoff_delay,
+                              version_exists, clear_version_cache, file_version,
+                              DEFAULT_REPOSITORIES)
+from tmpcache import setUpModule, tearDownModule
+
+
+class Package(object):
+    name = 'thing'
+    version = '1.0'
+    description = 'A thing.'
+    url = 'https://example.com'
+    author = 'Some One'
+    author_email = 'some@example.com'
+    license = 'MIT'
+    requirements = ['requests']
+
+
+class IndexTestCase(unittest.TestCase):
+    users = {'someone': 'secret'}
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.server = IndexServer(('127.0.0.1', 0), os.path.join(self.tmp_dir, 'index'),
+                                  users=self.users)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+
+        self.dist_dir = os.path.join(self.tmp_dir, 'dist')
+        os.makedirs(self.dist_dir)
+        self.sdist = self.write('thing-1.0.tar.gz', b'sdist' * 50000)
+        self.wheel = self.write('thing-1.0-py2.py3-none-any.whl', b'wheel' * 1000)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.tmp_dir)
+
+    def write(self, name, data):
+        path = os.path.join(self.dist_dir, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+
+class TestUploader(IndexTestCase):
+    def upload(self, password='secret'):
+        with Uploader(self.server.upload_url, 'someone', password) as uploader:
+            results = uploader.upload(dist_files(self.dist_dir),
+                                      metadata_fields(Package, "Long text."))
+        return uploader, results
+
+    def test_dist_files(self):
+        self.write('notes.txt', b'')
+        self.assertEqual(dist_files(self.dist_dir), [self.sdist, self.wheel])
+        self.assertEqual(dist_type(self.wheel), ('bdist_wheel', 'py2.py3'))
+        self.assertEqual(dist_type(self.sdist), ('sdist', 'source'))
+
+    def test_body_length(self):
+        body = MultipartBody([('name', 'thing'), ('summary', u'caf\xe9')],
+                             'content', self.sdist)
+        self.assertEqual(len(body), len(b''.join(body)))
+        self.assertIn(b'filename="thing-1.0.tar.gz"', body.head)
+
+    def test_upload(self):
+        uploader, results = self.upload()
+        self.assertEqual([r.status for r in results], [200, 200])
+        # Both files went over the one connection.
+        self.assertEqual(uploader.connects, 1)
+        self.assertEqual(self.server.connections, 1)
+
+        info = json.loads(urlopen(self.server.url + '/pypi/thing/1.0/json').read().decode('utf-8'))
+        self.assertEqual(sorted(f['filename'] for f in info['urls']),
+                         ['thing-1.0-py2.py3-none-any.whl', 'thing-1.0.tar.gz'])
+        with open(os.path.join(self.server.root, 'thing', 'thing-1.0.tar.gz'), 'rb') as f:
+            self.assertEqual(f.read(), b'sdist' * 50000)
+
+    def test_already_exists(self):
+        self.upload()
+        uploader, results = self.upload()
+        self.assertEqual([r.status for r in results], [400, 400])
+        self.assertEqual(results[0].reason, 'File already exists.')
+
+    def test_bad_password(self):
+        uploader, results = self.upload(password='wrong')
+        self.assertEqual([r.status for r in results], [403, 403])
+        self.assertEqual(self.server.uploads, 0)
+
+    def test_server_down(self):
+        self.server.shutdown()
+        self.server.server_close()
+        with Uploader(self.server.upload_url, retries=2, backoff=0.01) as uploader:
+            result = uploader.upload_file(self.sdist, metadata_fields(Package))
+        self.assertIsNone(result.status)
+        self.assertFalse(result.ok)
+
+    def test_retry(self):
+        self.server.fail_uploads(2)
+        with Uploader(self.server.upload_url, 'someone', 'secret', backoff=0.01) as uploader:
+            result = uploader.upload_file(self.sdist, metadata_fields(Package))
+        self.assertEqual(result.status, 200)
+        self.assertEqual(self.server.uploads, 1)
+
+    def test_give_up(self):
+        self.server.fail_uploads(3)
+        with Uploader(self.server.upload_url, 'someone', 'secret', retries=2,
+                      backoff=0.01) as uploader:
+            result = uploader.upload_file(self.sdist, metadata_fields(Package))
+        self.assertEqual(result.status, 503)
+        self.assertEqual(self.server.faults, [])
+
+    def test_backoff_delay(self):
+        delays = [backoff_delay(attempt, 1, 10) for attempt in range(6) for _ in range(20)]
+        self.assertTrue(all(0 <= d <= 10 for d in delays))
+        self.assertTrue(all(d <= 2 for d in delays[20:40]))
+        self.assertEqual(len(set(delays)), len(delays))
+
+    def test_repository_config(self):
+        path = os.path.join(self.tmp_dir, 'pypirc')
+        with open(path, 'w') as f:
+            f.write("[pypi]\nrepository = https://pypi.python.org/pypi\n"
+                    "username = someone\n\n[local]\nrepository = %s\n"
+                    "username = me\npassword = 100%%\n" % self.server.upload_url)
+        self.assertEqual(repository_config('pypi', path),
+                         dict(url=DEFAULT_REPOSITORIES['pypi'], username='someone',
+                              password=None))
+        self.assertEqual(repository_config('local', path),
+                         dict(url=self.server.upload_url, username='me', password='100%'))
+        self.assertEqual(repository_config('testpypi', path)['url'],
+                         DEFAULT_REPOSITORIES['testpypi'])
+
+
+class TestVersionExists(IndexTestCase):
+    def setUp(self):
+        IndexTestCase.setUp(self)
+        clear_version_cache()
+
+    def upload(self):
+        with Uploader(self.server.upload_url, 'someone', 'secret') as uploader:
+            uploader.upload(dist_files(self.dist_dir), metadata_fields(Package))
+
+    def test_json_api(self):
+        self.assertFalse(version_exists(self.server.url, 'thing', '1.0'))
+        self.upload()
+        # Still what it was the first time.
+        self.assertFalse(version_exists(self.server.url, 'thing', '1.0'))
+        clear_version_cache()
+        self.assertTrue(version_exists(self.server.url, 'Thing', '1.0'))
+        self.assertFalse(version_exists(self.server.url, 'thing', '2.0'))
+
+    def test_simple_api(self):
+        self.server.json_api = False
+        self.upload()
+        self.assertTrue(version_exists(self.server.url, 'thing', '1.0'))
+        self.assertFalse(version_exists(self.server.url, 'thing', '1.1'))
+        self.assertFalse(version_exists(self.server.url, 'other', '1.0'))
+
+    def test_unreachable(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.assertIsNone(version_exists(self.server.url, 'thing', '1.0'))
+
+    def test_file_version(self):
+        self.assertEqual(file_version('thing-1.0.tar.gz'), '1.0')
+        self.assertEqual(file_version('my-thing-1.0rc1.zip'), '1.0rc1')
+        self.assertEqual(file_version('my_thing-1.0-py2.py3-none-any.whl'), '1.0')
+        self.assertIsNone(file_version('notes.txt'))
+
+
+class TestBuilderUpload(IndexTestCase):
+    def setUp(self):
+        IndexTestCase.setUp(self)
+        test_dir = os.path.abspath(os.path.dirname(__file__))
+        package = PyPackage(os.path.join(test_dir, 'testcases', 'base_test.py'))
+        self.builder = Builder(package, build_dir=os.path.join(self.tmp_dir, 'release'))
+        self.builder.repository_url = self.server.upload_url
+        self.builder.username = 'someone'
+        self.builder.password = 'secret'
+        self.builder.make_all()
+        self.builder.build_distros(suppress=True)
+        clear_version_cache()
+
+    def test_check_version(self):
+        self.assertTrue(self.builder.check_version())
+        self.builder.upload_to_pypi_test_site()
+        self.assertFalse(self.builder.check_version(['testpypi']))
+        self.assertEqual(len(self.builder.errors), 1)
+        # Known for the rest of the session.
+        self.server.shutdown()
+        self.server.server_close()
+        self.assertFalse(self.builder.check_version())
+
+    def test_check_version_warn_only(self):
+        self.builder.upload_to_pypi_test_site()
+        self.assertFalse(self.builder.check_version(['testpypi'], warn_only=True))
+        self.assertEqual(self.builder.errors, [])
+        self.assertTrue(self.builder.success)
+
+    def test_url_for(self):
+        self.assertEqual(self.builder.url_for(['pypi']), self.server.upload_url)
+        # Not one url for several repositories.
+        self.assertIsNone(self.builder.url_for(['pypi', 'testpypi']))
+
+    def test_upload(self):
+        results = self.builder.upload_to_pypi_test_site()
+        self.assertEqual([r.status for r in results], [200, 200])
+        self.assertTrue(self.builder.uploaded)
+        self.assertEqual(self.builder.errors, [])
+        self.assertEqual(len(self.server.project_json('base_test', '0.1.1')['urls']), 2)
+
+    def test_upload_again(self):
+        self.builder.upload_to_pypi()
+        self.builder.upload_to_pypi()
+        # Already there, so nothing is sent.
+        self.assertTrue(all(r.skipped for r in self.builder.upload_results))
+        self.assertEqual(self.server.uploads, 2)
+        self.assertEqual(self.builder.errors, [])
+
+    def test_upload_changed_version(self):
+        self.builder.upload_to_pypi()
+        with open(self.builder.upload_results[0].path, 'ab') as f:
+            f.write(b'changed')
+        self.builder.upload_to_pypi()
+        self.assertEqual([r.status for r in self.builder.upload_results], [400, None])
+        self.assertEqual(self.builder.errors, ["(400) - Needs to upgrade version.."])
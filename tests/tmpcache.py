@@ -0,0 +1,23 @@
+"""Module fixtures that point pyrelease's cache directory at a temporary
+folder, so tests don't write into the user's cache. Import them into a
+test module to use them."""
+import os
+import shutil
+import tempfile
+
+_saved = []
+
+
+def setUpModule():
+    tmp_dir = tempfile.mkdtemp()
+    _saved.append((os.environ.get('PYRELEASE_CACHE_DIR'), tmp_dir))
+    os.environ['PYRELEASE_CACHE_DIR'] = tmp_dir
+
+
+def tearDownModule():
+    old, tmp_dir = _saved.pop()
+    if old is None:
+        del os.environ['PYRELEASE_CACHE_DIR']
+    else:
+        os.environ['PYRELEASE_CACHE_DIR'] = old
+    shutil.rmtree(tmp_dir, ignore_errors=True)